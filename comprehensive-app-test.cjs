@@ -180,7 +180,7 @@ async function testHealthAndMetrics() {
     recordTest('API: Health Endpoint', healthWorking, 
       `Status: ${healthResponse.status}, Environment: ${healthResponse.data?.environment || 'unknown'}`, 'API');
       
-    const metricsResponse = await makeRequest(`${BASE_URL}/metrics`);
+    const metricsResponse = await makeRequest(`${BASE_URL}/metrics?format=json`);
     const metricsWorking = metricsResponse.status === 200 && typeof metricsResponse.data === 'object';
     recordTest('API: Metrics Endpoint', metricsWorking, 
       metricsWorking ? 'Metrics data retrieved' : `Status: ${metricsResponse.status}`, 'API');
@@ -0,0 +1,15 @@
+-- Content-addressed object store: one row per unique uploaded blob
+CREATE TABLE IF NOT EXISTS "object_blobs" (
+	"sha256" text PRIMARY KEY NOT NULL,
+	"path" text NOT NULL,
+	"size" integer NOT NULL,
+	"content_type" text NOT NULL,
+	"ref_count" integer DEFAULT 0 NOT NULL,
+	"created_at" timestamp DEFAULT now() NOT NULL,
+	"updated_at" timestamp DEFAULT now() NOT NULL
+);
+
+--> statement-breakpoint
+
+-- Garbage collection looks up unreferenced blobs
+CREATE INDEX IF NOT EXISTS "object_blobs_ref_count_idx" ON "object_blobs" ("ref_count");
@@ -0,0 +1,8 @@
+-- Claim state for the background sync queue worker
+ALTER TABLE "sync_queue" ADD COLUMN IF NOT EXISTS "status" text DEFAULT 'pending' NOT NULL;
+ALTER TABLE "sync_queue" ADD COLUMN IF NOT EXISTS "locked_at" timestamp;
+
+--> statement-breakpoint
+
+-- Workers claim pending items whose retry time has passed
+CREATE INDEX IF NOT EXISTS "sync_queue_status_next_retry_idx" ON "sync_queue" ("status", "next_retry_at");
@@ -10,6 +10,7 @@
  */
 
 import { logger } from './logger';
+import { runtimeMonitor } from './runtimeMonitor';
 
 interface HealthMetrics {
   timestamp: string;
@@ -19,17 +20,20 @@ interface HealthMetrics {
     memory: boolean;
     responseTime: boolean;
     errorRate: boolean;
+    eventLoop: boolean;
   };
   metrics: {
     memoryUsagePercent: number;
     avgResponseTime: number;
     errorRate: number;
     requestsPerMinute: number;
+    eventLoopDelayP99: number;
+    gcPauseMs: number;
   };
   alerts: Alert[];
 }
 
-interface Alert {
+export interface Alert {
   severity: 'warning' | 'critical';
   message: string;
   timestamp: string;
@@ -58,7 +62,7 @@ class AutomatedMonitoringService {
   private requestStats = {
     total: 0,
     errors: 0,
-    responseTimes: [] as number[],
+    responseTimeSum: 0,
     lastReset: Date.now()
   };
 
@@ -111,14 +115,15 @@ class AutomatedMonitoringService {
     if (isError) {
       this.requestStats.errors++;
     }
-    this.requestStats.responseTimes.push(responseTime);
+    // Running sum rather than a per-request array; distributions live in routeMetrics
+    this.requestStats.responseTimeSum += responseTime;
 
     // Reset stats every minute
     if (Date.now() - this.requestStats.lastReset > 60000) {
       this.requestStats = {
         total: 0,
         errors: 0,
-        responseTimes: [],
+        responseTimeSum: 0,
         lastReset: Date.now()
       };
     }
@@ -200,6 +205,11 @@ class AutomatedMonitoringService {
         });
       }
 
+      // Event-loop delay, GC pauses and heap limit from the runtime monitor
+      const runtimeAlerts = runtimeMonitor.checkAlerts(timestamp);
+      alerts.push(...runtimeAlerts);
+      const runtimeWindow = runtimeMonitor.getLatestWindow();
+
       // Determine overall health status
       const criticalAlerts = alerts.filter(a => a.severity === 'critical');
       const status: HealthMetrics['status'] =
@@ -215,13 +225,16 @@ class AutomatedMonitoringService {
           database: dbHealthy,
           memory: memMetrics.usagePercent < this.thresholds.memoryUsagePercent,
           responseTime: avgResponseTime < this.thresholds.avgResponseTime,
-          errorRate: errorRate < this.thresholds.errorRate
+          errorRate: errorRate < this.thresholds.errorRate,
+          eventLoop: !runtimeAlerts.some(a => a.metric === 'eventLoopDelay')
         },
         metrics: {
           memoryUsagePercent: memMetrics.usagePercent,
           avgResponseTime,
           errorRate,
-          requestsPerMinute: this.requestStats.total
+          requestsPerMinute: this.requestStats.total,
+          eventLoopDelayP99: runtimeWindow?.eventLoop.p99Ms ?? 0,
+          gcPauseMs: runtimeWindow?.gc.totalPauseMs ?? 0
         },
         alerts
       };
@@ -293,12 +306,11 @@ class AutomatedMonitoringService {
    * Calculate average response time
    */
   private calculateAverageResponseTime(): number {
-    if (this.requestStats.responseTimes.length === 0) {
+    if (this.requestStats.total === 0) {
       return 0;
     }
 
-    const sum = this.requestStats.responseTimes.reduce((a, b) => a + b, 0);
-    return Math.round(sum / this.requestStats.responseTimes.length);
+    return Math.round(this.requestStats.responseTimeSum / this.requestStats.total);
   }
 
   /**
@@ -1,38 +1,67 @@
 import { Request, Response, NextFunction } from 'express';
+import type { OutgoingHttpHeaders } from 'http';
+import { createHash } from 'crypto';
+import { promisify } from 'util';
+import { gzip, brotliCompress, constants as zlibConstants } from 'zlib';
 import { logger } from './logger';
+import { LRUCache } from './lruCache';
+import { CACHE } from './config/constants';
+import { cacheAnalytics } from './cacheAnalytics';
+import { CacheManager } from './security';
+import type { CacheNamespace } from './security';
+import { clusterState } from './clusterState';
+
+const gzipAsync = promisify(gzip);
+const brotliCompressAsync = promisify(brotliCompress);
+
+// Matches the compression() threshold in index.ts; smaller bodies are sent as-is
+const PRECOMPRESS_THRESHOLD_BYTES = 1024;
+
+type ContentEncoding = 'br' | 'gzip';
 
 interface CacheEntry {
-  data: any;
+  body: Buffer; // Final serialized response body
+  encoded: Partial<Record<ContentEncoding, Buffer>>; // Pre-compressed variants, filled in asynchronously
   timestamp: number;
   ttl: number;
-  headers?: Record<string, string>;
+  headers: Record<string, string>;
+  namespaces: CacheNamespace[];
+  generations: number[];
+}
+
+// Data namespaces each API path depends on. A cached response is only
+// served while the generations it was built with are still current.
+const ROUTE_NAMESPACES: Array<{ prefix: string; namespaces: CacheNamespace[] }> = [
+  { prefix: '/api/inspections', namespaces: ['inspections', 'roomInspections'] },
+  { prefix: '/api/room-inspections', namespaces: ['roomInspections', 'inspections'] },
+  { prefix: '/api/custodial-notes', namespaces: ['custodialNotes'] },
+  { prefix: '/api/monthly-feedback', namespaces: ['monthlyFeedback'] },
+  { prefix: '/api/scores', namespaces: ['scores', 'inspections', 'custodialNotes'] },
+  { prefix: '/api/photos', namespaces: ['inspectionPhotos'] },
+];
+
+export function getNamespacesForPath(path: string): CacheNamespace[] {
+  const match = ROUTE_NAMESPACES.find(route => path.startsWith(route.prefix));
+  return match ? match.namespaces : [];
 }
 
 class APICache {
-  private cache = new Map<string, CacheEntry>();
-  private maxSize = 1000; // Maximum number of cached entries
-  private cleanupInterval = 60000; // Cleanup expired entries every minute
+  // LRU with byte budget; expired entries are purged via its TTL heap on write
+  private cache = new LRUCache<CacheEntry>({
+    maxEntries: CACHE.API_CACHE_MAX_ENTRIES,
+    maxBytes: CACHE.API_CACHE_MAX_BYTES,
+    onEvict: (key, _entry, reason) => {
+      if (reason === 'evicted') cacheAnalytics.recordEviction(key);
+    },
+    onBytesChange: (key, delta) => cacheAnalytics.recordMemoryBytes(key, delta)
+  });
+  private maxSize = CACHE.API_CACHE_MAX_ENTRIES; // Maximum number of cached entries
 
   constructor() {
-    // Start cleanup interval
-    setInterval(() => this.cleanup(), this.cleanupInterval);
-  }
-
-  private cleanup(): void {
-    const now = Date.now();
-    const keysToDelete: string[] = [];
-
-    for (const [key, entry] of this.cache.entries()) {
-      if (now - entry.timestamp > entry.ttl) {
-        keysToDelete.push(key);
-      }
-    }
-
-    keysToDelete.forEach(key => this.cache.delete(key));
-
-    if (keysToDelete.length > 0) {
-      logger.debug('Cache cleanup completed', { deletedCount: keysToDelete.length, remainingSize: this.cache.size });
-    }
+    // Every cluster worker holds its own copy; explicit invalidations are
+    // replayed everywhere (generation bumps arrive via CacheManager)
+    clusterState.subscribe('api-cache:invalidate', ({ pattern }) => this.invalidateLocal(pattern));
+    clusterState.subscribe('api-cache:clear', () => this.clearLocal());
   }
 
   private getCacheKey(req: Request): string {
@@ -90,34 +119,36 @@ class APICache {
     }
   }
 
-  get(req: Request): any | null {
+  get(req: Request): CacheEntry | null {
     const key = this.getCacheKey(req);
     const entry = this.cache.get(key);
 
-    if (!entry) return null;
+    if (!entry) {
+      if (req.path.startsWith('/api/')) cacheAnalytics.recordMiss(key);
+      return null;
+    }
 
-    const now = Date.now();
-    if (now - entry.timestamp > entry.ttl) {
+    // A write bumped one of the namespaces this response was built from
+    const stale = entry.namespaces.some(
+      (namespace, i) => CacheManager.getLocalGeneration(namespace) !== entry.generations[i]
+    );
+    if (stale) {
       this.cache.delete(key);
+      cacheAnalytics.recordMiss(key);
       return null;
     }
 
+    cacheAnalytics.recordHit(key);
     logger.debug('Cache hit', { key, path: req.path });
-    return entry.data;
+    return entry;
   }
 
-  set(req: Request, res: Response, data: any): void {
+  set(req: Request, res: Response, body: Buffer): void {
     if (!this.shouldCacheRequest(req)) return;
 
     const key = this.getCacheKey(req);
     const ttl = this.getCacheTTL(req);
 
-    // Implement LRU eviction if cache is full
-    if (this.cache.size >= this.maxSize) {
-      const oldestKey = this.cache.keys().next().value;
-      this.cache.delete(oldestKey);
-    }
-
     // Store relevant headers for cache replay
     const headers: Record<string, string> = {};
     const relevantHeaders = ['content-type', 'etag', 'last-modified'];
@@ -128,17 +159,67 @@ class APICache {
       }
     });
 
-    this.cache.set(key, {
-      data,
+    // Compute the ETag once here so hits never re-hash the body
+    if (!headers.etag) {
+      headers.etag = `W/"${body.length.toString(16)}-${createHash('sha1').update(body).digest('base64').substring(0, 27)}"`;
+    }
+
+    const namespaces = getNamespacesForPath(req.path);
+    const entry: CacheEntry = {
+      body,
+      encoded: {},
       timestamp: Date.now(),
       ttl,
-      headers
-    });
+      headers,
+      namespaces,
+      generations: namespaces.map(namespace => CacheManager.getLocalGeneration(namespace))
+    };
+
+    if (!this.cache.set(key, entry, ttl, body.length)) return;
+    cacheAnalytics.recordSet(key, body.length, ttl / 1000);
+
+    if (body.length >= PRECOMPRESS_THRESHOLD_BYTES) {
+      this.precompress(key, entry);
+    }
 
     logger.debug('Cache set', { key, path: req.path, ttl });
   }
 
+  /**
+   * Build gzip and brotli variants off the request path and attach them to the entry
+   */
+  private precompress(key: string, entry: CacheEntry): void {
+    Promise.all([
+      gzipAsync(entry.body, { level: 6 }),
+      brotliCompressAsync(entry.body, {
+        params: {
+          [zlibConstants.BROTLI_PARAM_QUALITY]: 6,
+          [zlibConstants.BROTLI_PARAM_MODE]: zlibConstants.BROTLI_MODE_TEXT,
+          [zlibConstants.BROTLI_PARAM_SIZE_HINT]: entry.body.length,
+        }
+      })
+    ])
+      .then(([gzipped, brotli]) => {
+        // Entry may have been replaced or evicted while compressing
+        if (this.cache.peek(key) !== entry) return;
+        entry.encoded.gzip = gzipped;
+        entry.encoded.br = brotli;
+        this.cache.resize(key, entry.body.length + gzipped.length + brotli.length);
+      })
+      .catch(error => {
+        logger.warn('Cache precompression failed', {
+          key,
+          error: error instanceof Error ? error.message : 'Unknown error'
+        });
+      });
+  }
+
   invalidate(pattern: string): void {
+    this.invalidateLocal(pattern);
+    clusterState.publish('api-cache:invalidate', { pattern });
+  }
+
+  private invalidateLocal(pattern: string): void {
     const keysToDelete: string[] = [];
 
     for (const key of this.cache.keys()) {
@@ -152,22 +233,16 @@ class APICache {
   }
 
   getStats() {
-    const now = Date.now();
-    let expiredCount = 0;
-    let totalSize = 0;
-
-    for (const [key, entry] of this.cache.entries()) {
-      totalSize++;
-      if (now - entry.timestamp > entry.ttl) {
-        expiredCount++;
-      }
-    }
+    const lruStats = this.cache.getStats();
 
     return {
-      size: this.cache.size,
+      size: lruStats.entries,
       maxSize: this.maxSize,
-      expiredCount,
-      totalSize,
+      bytes: lruStats.bytes,
+      maxBytes: lruStats.maxBytes,
+      evictions: lruStats.evictions,
+      expirations: lruStats.expirations,
+      totalSize: lruStats.entries,
       hitRate: this.getHitRate()
     };
   }
@@ -187,7 +262,13 @@ class APICache {
   }
 
   clear(): void {
+    this.clearLocal();
+    clusterState.publish('api-cache:clear');
+  }
+
+  private clearLocal(): void {
     this.cache.clear();
+    this.cache.resetStats();
     this.hits = 0;
     this.totalRequests = 0;
     this.hitRate = 0;
@@ -201,52 +282,84 @@ export const apiCache = new APICache();
 export const cacheMiddleware = (req: Request, res: Response, next: NextFunction): void => {
   // Check cache for GET requests
   if (req.method === 'GET') {
-    const cachedData = apiCache.get(req);
-    if (cachedData !== null) {
+    const entry = apiCache.get(req);
+    if (entry !== null) {
       apiCache.recordRequest(true);
 
       // Set cache headers
       res.set('X-Cache', 'HIT');
       res.set('X-Cache-Hit-Rate', `${apiCache.getHitRate().toFixed(1)}%`);
 
-      // Restore cached headers if available
-      const cacheKey = apiCache.getCacheKey ? apiCache.getCacheKey(req) : null;
-      if (cacheKey) {
-        // This would require modifying the APICache class to expose the cache entry
-        // For now, we'll set basic headers
-        res.set('Content-Type', 'application/json');
+      // Restore cached headers
+      res.set('Content-Type', entry.headers['content-type'] || 'application/json; charset=utf-8');
+      if (entry.headers['last-modified']) res.set('Last-Modified', entry.headers['last-modified']);
+      if (!res.getHeader('ETag')) res.set('ETag', entry.headers.etag);
+
+      // Write pre-serialized (and, when available, pre-compressed) bytes directly.
+      // compression() leaves responses that already carry Content-Encoding alone.
+      let body = entry.body;
+      if (body.length >= PRECOMPRESS_THRESHOLD_BYTES && !req.headers['x-no-compression']) {
+        res.vary('Accept-Encoding');
+        const encoding = req.acceptsEncodings('br', 'gzip');
+        if ((encoding === 'br' || encoding === 'gzip') && entry.encoded[encoding]) {
+          res.set('Content-Encoding', encoding);
+          body = entry.encoded[encoding]!;
+        }
       }
 
-      return res.json(cachedData);
+      res.send(body);
+      return;
     }
   }
 
   apiCache.recordRequest(false);
   res.set('X-Cache', 'MISS');
 
-  // Intercept res.json to cache the response
+  // Intercept res.json to serialize once and cache the bytes that are sent
   const originalJson = res.json;
   res.json = function(data: any) {
-    // Cache the response if applicable
-    if (res.statusCode >= 200 && res.statusCode < 300) {
-      apiCache.set(req, res, data);
+    if (req.method !== 'GET' || res.statusCode < 200 || res.statusCode >= 300) {
+      return originalJson.call(this, data);
     }
 
-    return originalJson.call(this, data);
+    const serialized = JSON.stringify(data);
+    if (serialized === undefined) {
+      return originalJson.call(this, data);
+    }
+
+    if (!res.getHeader('Content-Type')) {
+      res.set('Content-Type', 'application/json; charset=utf-8');
+    }
+    apiCache.set(req, res, Buffer.from(serialized));
+
+    return res.send(serialized);
   };
 
   next();
 };
 
 // Cache invalidation middleware for mutations
-export const invalidateCache = (patterns: string[]) => {
+export const invalidateCache = (namespaces: CacheNamespace[]) => {
   return (req: Request, res: Response, next: NextFunction): void => {
+    // Reads never invalidate
+    if (req.method === 'GET' || req.method === 'HEAD' || req.method === 'OPTIONS') {
+      return next();
+    }
+
+    let invalidated = false;
     const originalSend = res.send;
 
     res.send = function(data: any) {
-      // Invalidate cache patterns after successful mutations
-      if (res.statusCode >= 200 && res.statusCode < 300) {
-        patterns.forEach(pattern => apiCache.invalidate(pattern));
+      // Bump namespace generations after successful mutations (O(1) per namespace)
+      if (!invalidated && res.statusCode >= 200 && res.statusCode < 300) {
+        invalidated = true;
+        Promise.all(namespaces.map(namespace => CacheManager.bumpGeneration(namespace)))
+          .catch(error => {
+            logger.warn('Cache generation bump failed', {
+              namespaces,
+              error: error instanceof Error ? error.message : 'Unknown error'
+            });
+          });
       }
 
       return originalSend.call(this, data);
@@ -256,6 +369,59 @@ export const invalidateCache = (patterns: string[]) => {
   };
 };
 
+// Distinguishes generation-based ETags across restarts, since generations
+// fall back to process-local counters when Redis is unavailable. Cluster
+// workers share the epoch the primary passes them (server/cluster.ts).
+const ETAG_EPOCH = process.env.CACHE_EPOCH || Date.now().toString(36);
+
+function matchesIfNoneMatch(header: string | undefined, etag: string): boolean {
+  if (!header) return false;
+  if (header.trim() === '*') return true;
+  return header.split(',').some(tag => tag.trim().replace(/^W\//, '') === etag);
+}
+
+// Conditional GET middleware: answers If-None-Match with 304 before the route
+// handler runs, using an ETag derived from the namespace generations
+export const conditionalGet = () => {
+  return async (req: Request, res: Response, next: NextFunction): Promise<void> => {
+    if (req.method !== 'GET' && req.method !== 'HEAD') {
+      return next();
+    }
+
+    const namespaces = getNamespacesForPath(req.baseUrl + req.path);
+    if (namespaces.length === 0) {
+      return next();
+    }
+
+    try {
+      const generations = await Promise.all(
+        namespaces.map(namespace => CacheManager.getGeneration(namespace))
+      );
+      const fingerprint = `${req.originalUrl}|${namespaces.join(',')}|${generations.join(',')}|${ETAG_EPOCH}`;
+      const etag = `"${createHash('sha1').update(fingerprint).digest('base64url')}"`;
+
+      res.setHeader('ETag', etag);
+      // Clients may store the body but must revalidate every time
+      res.setHeader('Cache-Control', 'private, no-cache');
+      res.vary('Accept-Encoding');
+
+      if (matchesIfNoneMatch(req.headers['if-none-match'], etag)) {
+        logger.debug('Conditional request not modified', { url: req.originalUrl, etag });
+        res.status(304).end();
+        return;
+      }
+    } catch (error) {
+      // Fall through to a full response
+      logger.warn('Conditional GET check failed', {
+        url: req.originalUrl,
+        error: error instanceof Error ? error.message : 'Unknown error'
+      });
+    }
+
+    next();
+  };
+};
+
 // Performance monitoring middleware
 export const performanceMiddleware = (req: Request, res: Response, next: NextFunction): void => {
   const startTime = process.hrtime.bigint();
@@ -330,60 +496,188 @@ export const memoryMonitoring = (req: Request, res: Response, next: NextFunction
   next();
 };
 
-// Request deduplication middleware
-const pendingRequests = new Map<string, Promise<any>>();
+// In-flight response coalescing: identical concurrent GETs run the handler once
+interface CoalescedResponse {
+  statusCode: number;
+  headers: OutgoingHttpHeaders;
+  body: Buffer;
+}
 
-export const requestDeduplication = (req: Request, res: Response, next: NextFunction): void => {
-  if (req.method !== 'GET') {
-    return next();
-  }
+interface InFlightRequest {
+  followers: Array<(result: CoalescedResponse | null) => void>;
+}
+
+export interface RequestCoalescerOptions {
+  /** Path prefixes eligible for coalescing */
+  routes: string[];
+  /** How long a follower waits before running the handler itself (default 10s) */
+  followerTimeoutMs?: number;
+  /** Responses larger than this are not shared (default 2MB) */
+  maxBodyBytes?: number;
+}
 
-  const key = `${req.method}:${req.originalUrl}`;
-  const existingRequest = pendingRequests.get(key);
+// Headers tied to the leader's own request/connection, never replayed
+const NON_SHARED_HEADERS = new Set(['set-cookie', 'date', 'connection', 'keep-alive', 'transfer-encoding']);
 
-  if (existingRequest) {
-    logger.debug('Request deduplication: merging identical request', { key });
+const inFlightRequests = new Map<string, InFlightRequest>();
+const coalescerStats = {
+  leaders: 0,
+  followers: 0,
+  replayed: 0,
+  fallbacks: 0,
+  timeouts: 0
+};
 
-    existingRequest
-      .then(data => {
-        res.set('X-Deduplicated', 'true');
-        res.json(data);
-      })
-      .catch(error => {
-        next(error);
+function getCoalescingKey(req: Request): string {
+  // Session-aware: requests with different credentials are never joined
+  const identity = `${req.headers.authorization || ''}|${req.headers.cookie || ''}`;
+  const identityHash = identity === '|' ? 'anon' : createHash('sha1').update(identity).digest('base64url');
+  return `${req.method}:${req.originalUrl}:${identityHash}`;
+}
+
+function toBuffer(chunk: any, encoding?: any): Buffer | null {
+  if (chunk === undefined || chunk === null || typeof chunk === 'function') return null;
+  if (Buffer.isBuffer(chunk)) return chunk;
+  if (typeof chunk === 'string') return Buffer.from(chunk, typeof encoding === 'string' ? encoding as BufferEncoding : 'utf8');
+  return Buffer.from(chunk);
+}
+
+export const getCoalescerStats = () => {
+  const total = coalescerStats.leaders + coalescerStats.followers;
+  return {
+    ...coalescerStats,
+    inFlight: inFlightRequests.size,
+    coalescingRatio: total > 0 ? (coalescerStats.replayed / total) * 100 : 0
+  };
+};
+
+export const requestCoalescer = (options: RequestCoalescerOptions) => {
+  const followerTimeoutMs = options.followerTimeoutMs ?? 10000;
+  const maxBodyBytes = options.maxBodyBytes ?? 2 * 1024 * 1024;
+
+  return (req: Request, res: Response, next: NextFunction): void => {
+    if (req.method !== 'GET') {
+      return next();
+    }
+
+    const path = req.baseUrl + req.path;
+    if (!options.routes.some(prefix => path.startsWith(prefix))) {
+      return next();
+    }
+
+    const key = getCoalescingKey(req);
+    const existing = inFlightRequests.get(key);
+
+    if (existing) {
+      // Follower: wait for the leader's response, or run the handler ourselves
+      coalescerStats.followers++;
+      let settled = false;
+
+      const timer = setTimeout(() => {
+        if (settled) return;
+        settled = true;
+        coalescerStats.timeouts++;
+        logger.debug('Request coalescing timed out, running handler', { key });
+        next();
+      }, followerTimeoutMs);
+
+      existing.followers.push(result => {
+        if (settled) return;
+        settled = true;
+        clearTimeout(timer);
+
+        if (!result) {
+          coalescerStats.fallbacks++;
+          return next();
+        }
+
+        coalescerStats.replayed++;
+        res.status(result.statusCode);
+        for (const [name, value] of Object.entries(result.headers)) {
+          if (value !== undefined) res.setHeader(name, value);
+        }
+        res.setHeader('X-Deduplicated', 'true');
+        res.end(result.body);
       });
 
-    return;
-  }
+      return;
+    }
 
-  // Create a promise for this request
-  const requestPromise = new Promise((resolve, reject) => {
-    const originalJson = res.json;
-    const originalSend = res.send;
+    // Leader: capture the response at the write/end level so every response path is covered
+    coalescerStats.leaders++;
+    const inFlight: InFlightRequest = { followers: [] };
+    inFlightRequests.set(key, inFlight);
+
+    // Headers already present were set by earlier per-request middleware
+    const headersAtEntry = new Set(res.getHeaderNames());
+    let capturedHeaders: OutgoingHttpHeaders | null = null;
+    const chunks: Buffer[] = [];
+    let capturedBytes = 0;
+    let overflow = false;
+
+    const captureHeaders = () => {
+      if (capturedHeaders) return;
+      // Snapshot before compression() adds Content-Encoding for this client
+      capturedHeaders = {};
+      for (const name of res.getHeaderNames()) {
+        if (headersAtEntry.has(name) || NON_SHARED_HEADERS.has(name)) continue;
+        capturedHeaders[name] = res.getHeader(name);
+      }
+    };
 
-    res.json = function(data: any) {
-      resolve(data);
-      return originalJson.call(this, data);
+    const captureChunk = (chunk: any, encoding?: any) => {
+      captureHeaders();
+      if (overflow) return;
+      const buffer = toBuffer(chunk, encoding);
+      if (!buffer) return;
+      capturedBytes += buffer.length;
+      if (capturedBytes > maxBodyBytes) {
+        overflow = true;
+        chunks.length = 0;
+        return;
+      }
+      chunks.push(buffer);
     };
 
-    res.send = function(data: any) {
-      resolve(data);
-      return originalSend.call(this, data);
+    const settle = (result: CoalescedResponse | null) => {
+      if (inFlightRequests.get(key) === inFlight) {
+        inFlightRequests.delete(key);
+      }
+      for (const follower of inFlight.followers) {
+        follower(result);
+      }
+      inFlight.followers = [];
     };
 
-    res.on('error', reject);
-  });
+    const originalWrite = res.write;
+    const originalEnd = res.end;
 
-  pendingRequests.set(key, requestPromise);
+    res.write = function(chunk: any, ...args: any[]) {
+      captureChunk(chunk, args[0]);
+      return (originalWrite as any).call(this, chunk, ...args);
+    } as any;
 
-  // Clean up after request completes
-  res.on('finish', () => {
-    pendingRequests.delete(key);
-  });
+    res.end = function(chunk?: any, ...args: any[]) {
+      captureChunk(chunk, args[0]);
+      return (originalEnd as any).call(this, chunk, ...args);
+    } as any;
 
-  res.on('error', () => {
-    pendingRequests.delete(key);
-  });
+    res.on('finish', () => {
+      // Only plain 200s are shared; conditional, error and oversized responses are not
+      if (overflow || res.statusCode !== 200 || !capturedHeaders) {
+        settle(null);
+        return;
+      }
+      settle({ statusCode: res.statusCode, headers: capturedHeaders, body: Buffer.concat(chunks) });
+    });
 
-  next();
-};
\ No newline at end of file
+    res.on('close', () => {
+      // Client went away before the response finished; followers run their own
+      if (!res.writableFinished) {
+        settle(null);
+      }
+    });
+
+    next();
+  };
+};
@@ -0,0 +1,167 @@
+import { LogHistogram } from './utils/histogram';
+
+/**
+ * Per-key-family cache analytics
+ *
+ * Keys are grouped into families by dropping the variable parts, e.g.
+ * "inspections:g12:list:{...}" -> "inspections:list" and
+ * "GET:/api/scores/ASA:" -> "http:/api/scores". Each family tracks hits,
+ * misses, stale serves, bytes written, evictions and miss fetch latency so
+ * TTLs can be tuned from data.
+ *
+ * bytesInMemory is what the family holds right now in this process's LRU
+ * caches (the API response cache and the memory fallback). Values stored in
+ * Redis only count towards the cumulative bytesWritten.
+ */
+
+const MAX_FAMILIES = 100;
+const OVERFLOW_FAMILY = 'other';
+
+interface FamilyStats {
+  hits: number;
+  misses: number;
+  stale: number;
+  sets: number;
+  bytesWritten: number;
+  bytesInMemory: number;
+  evictions: number;
+  ttlSeconds: number | null;
+  missFetchMs: LogHistogram;
+  valueBytes: LogHistogram;
+}
+
+/**
+ * Derive the family for a cache key
+ */
+export function getKeyFamily(key: string): string {
+  // APICache keys: "GET:/api/inspections/12:query"
+  if (key.startsWith('GET:')) {
+    const url = key.slice(4).split(/[?:]/)[0];
+    // Keep /api/<resource>/<subpath>, collapsing numeric ids
+    const segments = url.split('/').filter(Boolean).slice(0, 3)
+      .map(segment => (/^\d+$/.test(segment) ? ':id' : segment));
+    return `http:/${segments.join('/')}`;
+  }
+
+  const parts = key.split(':');
+  // Versioned keys: "<namespace>:g<generation>:<kind>:..."
+  if (parts.length >= 3 && /^g\d+$/.test(parts[1])) {
+    return `${parts[0]}:${parts[2]}`;
+  }
+
+  return parts.length > 1 ? `${parts[0]}:${parts[1]}` : parts[0];
+}
+
+function createFamilyStats(): FamilyStats {
+  return {
+    hits: 0,
+    misses: 0,
+    stale: 0,
+    sets: 0,
+    bytesWritten: 0,
+    bytesInMemory: 0,
+    evictions: 0,
+    ttlSeconds: null,
+    missFetchMs: new LogHistogram(),
+    valueBytes: new LogHistogram(1, 64 * 1024 * 1024),
+  };
+}
+
+class CacheAnalytics {
+  private families = new Map<string, FamilyStats>();
+  private startedAt = Date.now();
+
+  recordHit(key: string): void {
+    this.family(key).hits++;
+  }
+
+  recordMiss(key: string): void {
+    this.family(key).misses++;
+  }
+
+  recordStale(key: string): void {
+    this.family(key).stale++;
+  }
+
+  /** Time spent loading a value after a miss (or background refresh) */
+  recordFetch(key: string, durationMs: number): void {
+    this.family(key).missFetchMs.record(durationMs);
+  }
+
+  recordSet(key: string, bytes: number, ttlSeconds?: number): void {
+    const stats = this.family(key);
+    stats.sets++;
+    stats.bytesWritten += bytes;
+    stats.valueBytes.record(bytes);
+    if (ttlSeconds !== undefined) stats.ttlSeconds = ttlSeconds;
+  }
+
+  /** Change in bytes an in-process cache holds for the key */
+  recordMemoryBytes(key: string, delta: number): void {
+    this.family(key).bytesInMemory += delta;
+  }
+
+  recordEviction(key: string): void {
+    this.family(key).evictions++;
+  }
+
+  getStats() {
+    const families: Record<string, any> = {};
+    const sorted = Array.from(this.families.entries())
+      .sort((a, b) => (b[1].hits + b[1].misses + b[1].stale) - (a[1].hits + a[1].misses + a[1].stale));
+
+    for (const [name, stats] of sorted) {
+      const lookups = stats.hits + stats.misses + stats.stale;
+      const fetch = stats.missFetchMs.snapshot();
+      families[name] = {
+        hits: stats.hits,
+        misses: stats.misses,
+        stale: stats.stale,
+        hitRate: lookups > 0 ? Math.round(((stats.hits + stats.stale) / lookups) * 10000) / 100 : 0,
+        sets: stats.sets,
+        bytesWritten: stats.bytesWritten,
+        bytesInMemory: stats.bytesInMemory,
+        avgValueBytes: stats.sets > 0 ? Math.round(stats.bytesWritten / stats.sets) : 0,
+        p95ValueBytes: Math.round(stats.valueBytes.percentile(95)),
+        evictions: stats.evictions,
+        ttlSeconds: stats.ttlSeconds,
+        missFetchMs: { count: fetch.count, mean: fetch.mean, p50: fetch.p50, p95: fetch.p95, max: fetch.max },
+      };
+    }
+
+    return {
+      since: new Date(this.startedAt).toISOString(),
+      familyCount: this.families.size,
+      families,
+    };
+  }
+
+  reset(): void {
+    // bytesInMemory is a gauge of what the caches hold; it survives a reset
+    const held = Array.from(this.families.entries()).filter(([, stats]) => stats.bytesInMemory !== 0);
+    this.families.clear();
+    for (const [name, stats] of held) {
+      this.families.set(name, { ...createFamilyStats(), bytesInMemory: stats.bytesInMemory });
+    }
+    this.startedAt = Date.now();
+  }
+
+  private family(key: string): FamilyStats {
+    let name = getKeyFamily(key);
+    let stats = this.families.get(name);
+    if (stats) return stats;
+
+    // Bound cardinality in case an unexpected key shape slips through
+    if (this.families.size >= MAX_FAMILIES) {
+      name = OVERFLOW_FAMILY;
+      stats = this.families.get(name);
+      if (stats) return stats;
+    }
+
+    stats = createFamilyStats();
+    this.families.set(name, stats);
+    return stats;
+  }
+}
+
+export const cacheAnalytics = new CacheAnalytics();
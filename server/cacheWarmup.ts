@@ -0,0 +1,370 @@
+import { Request, Response, NextFunction } from 'express';
+import { promises as fs } from 'fs';
+import path from 'path';
+import { createHash } from 'crypto';
+import { logger } from './logger';
+import { clusterState } from './clusterState';
+import { getRedisClient } from './security';
+import { storage } from './storage';
+import { mapWithConcurrency } from './utils/concurrency';
+
+/**
+ * Cache warmup on boot
+ *
+ * Public GET /api URLs are counted in a count-min sketch that is persisted
+ * to Redis (or a local file). After a deploy, the hottest URLs are replayed
+ * against this instance at low concurrency so the API and query caches are
+ * populated before /health reports ready.
+ *
+ * In a cluster only the leader replays; followers report ready once the
+ * leader announces that it finished.
+ */
+
+const WARMUP_ENABLED = process.env.WARMUP_ENABLED !== 'false';
+const WARMUP_TOP_N = parseInt(process.env.WARMUP_TOP_N || '20', 10);
+const WARMUP_CONCURRENCY = parseInt(process.env.WARMUP_CONCURRENCY || '2', 10);
+// Keep well inside the platform health check window
+const WARMUP_MAX_MS = parseInt(process.env.WARMUP_MAX_MS || '20000', 10);
+// Followers stop waiting for a leader that exited mid-run (sketch load plus replay)
+const FOLLOWER_MAX_WAIT_MS = 2 * WARMUP_MAX_MS;
+const PERSIST_INTERVAL_MS = 5 * 60 * 1000;
+const DECAY_INTERVAL_MS = 24 * 60 * 60 * 1000;
+
+const SKETCH_REDIS_KEY = 'app_cache:warmup:sketch';
+const SKETCH_FILE = path.join(process.cwd(), '.cache', 'warmup-sketch.json');
+// Marks replayed requests so they are not counted as real traffic
+export const WARMUP_HEADER = 'x-cache-warmup';
+
+// URLs that should never be replayed
+const EXCLUDED_PREFIXES = ['/api/admin', '/api/csrf', '/api/performance', '/api/export', '/api/notifications'];
+
+// Cluster messages: the warmup is over (run or skipped); a new worker asking whether it is
+const DONE_MESSAGE = 'cache-warmup:done';
+const STATUS_MESSAGE = 'cache-warmup:status';
+
+type WarmupState = 'pending' | 'warming' | 'ready';
+
+interface PersistedSketch {
+  version: 1;
+  width: number;
+  depth: number;
+  counts: string;
+  candidates: Array<[string, number]>;
+  lastDecayAt: number;
+}
+
+/**
+ * Fixed-size frequency sketch; estimates never undercount
+ */
+export class CountMinSketch {
+  readonly width: number;
+  readonly depth: number;
+  private counts: Uint32Array;
+
+  constructor(width = 1024, depth = 4, counts?: Uint32Array) {
+    this.width = width;
+    this.depth = depth;
+    this.counts = counts && counts.length === width * depth ? counts : new Uint32Array(width * depth);
+  }
+
+  /** Increment a key and return its new estimate */
+  add(key: string): number {
+    let estimate = Infinity;
+    for (const [row, column] of this.cells(key)) {
+      const index = row * this.width + column;
+      if (this.counts[index] < 0xffffffff) this.counts[index]++;
+      estimate = Math.min(estimate, this.counts[index]);
+    }
+    return estimate;
+  }
+
+  estimate(key: string): number {
+    let estimate = Infinity;
+    for (const [row, column] of this.cells(key)) {
+      estimate = Math.min(estimate, this.counts[row * this.width + column]);
+    }
+    return estimate === Infinity ? 0 : estimate;
+  }
+
+  /** Halve all counts so old traffic patterns fade out */
+  decay(): void {
+    for (let i = 0; i < this.counts.length; i++) {
+      this.counts[i] >>>= 1;
+    }
+  }
+
+  serialize(): string {
+    return Buffer.from(this.counts.buffer, this.counts.byteOffset, this.counts.byteLength).toString('base64');
+  }
+
+  static deserialize(width: number, depth: number, data: string): CountMinSketch {
+    const buffer = Buffer.from(data, 'base64');
+    const counts = new Uint32Array(width * depth);
+    if (buffer.length === counts.byteLength) {
+      Buffer.from(counts.buffer).set(buffer);
+    }
+    return new CountMinSketch(width, depth, counts);
+  }
+
+  private *cells(key: string): Generator<[number, number]> {
+    // One sha1 provides four independent 32-bit hashes for the default depth
+    const digest = createHash('sha1').update(key).digest();
+    for (let row = 0; row < this.depth; row++) {
+      const offset = (row * 4) % (digest.length - 3);
+      yield [row, (digest.readUInt32BE(offset) + row * 0x9e3779b1) % this.width];
+    }
+  }
+}
+
+class CacheWarmupScheduler {
+  private sketch = new CountMinSketch();
+  // Candidate hot URLs with their latest estimate (bounded)
+  private candidates = new Map<string, number>();
+  private lastDecayAt = Date.now();
+  // Not ready from boot until the warmup finishes or is skipped
+  private state: WarmupState = WARMUP_ENABLED ? 'pending' : 'ready';
+  private dirty = false;
+  private persistTimer: NodeJS.Timeout | null = null;
+  private lastRun: {
+    startedAt: string;
+    durationMs: number;
+    warmed: number;
+    failed: number;
+    skipped: number;
+    timedOut: boolean;
+  } | null = null;
+
+  /**
+   * Middleware that counts successful public API reads
+   */
+  trackAccess = (req: Request, res: Response, next: NextFunction): void => {
+    if (req.method === 'GET' && !req.headers[WARMUP_HEADER] && !req.headers.authorization) {
+      res.on('finish', () => {
+        if (res.statusCode === 200) {
+          this.record(req.originalUrl);
+        }
+      });
+    }
+    next();
+  };
+
+  record(url: string): void {
+    if (!url.startsWith('/api/') || EXCLUDED_PREFIXES.some(prefix => url.startsWith(prefix))) {
+      return;
+    }
+
+    const estimate = this.sketch.add(url);
+    this.candidates.set(url, estimate);
+    this.dirty = true;
+
+    // Keep the candidate set small: drop the coldest half when it grows
+    if (this.candidates.size > WARMUP_TOP_N * 8) {
+      const ranked = Array.from(this.candidates.entries()).sort((a, b) => b[1] - a[1]);
+      this.candidates = new Map(ranked.slice(0, WARMUP_TOP_N * 4));
+    }
+  }
+
+  getTopUrls(limit: number = WARMUP_TOP_N): string[] {
+    return Array.from(this.candidates.keys())
+      .map(url => [url, this.sketch.estimate(url)] as const)
+      .filter(([, count]) => count > 0)
+      .sort((a, b) => b[1] - a[1])
+      .slice(0, limit)
+      .map(([url]) => url);
+  }
+
+  /**
+   * True from boot until the warmup has finished or been skipped
+   */
+  isWarming(): boolean {
+    return this.state !== 'ready';
+  }
+
+  isReady(): boolean {
+    return this.state === 'ready';
+  }
+
+  /**
+   * Report ready and tell waiting followers; also used when the warmup is
+   * skipped (the sketch failed to load, or a worker was promoted after boot)
+   */
+  finish(): void {
+    this.markReady();
+    clusterState.publish(DONE_MESSAGE);
+  }
+
+  /**
+   * Cluster followers: ready once the leader announces its warmup is done,
+   * or after FOLLOWER_MAX_WAIT_MS. A worker started after the warmup asks
+   * the others, and any ready worker answers.
+   */
+  followLeader(): void {
+    if (this.state === 'ready') return;
+    clusterState.publish(STATUS_MESSAGE);
+    setTimeout(() => {
+      if (this.state === 'ready') return;
+      logger.warn('Cache warmup not announced by the leader, reporting ready', { waitedMs: FOLLOWER_MAX_WAIT_MS });
+      this.markReady();
+    }, FOLLOWER_MAX_WAIT_MS).unref();
+  }
+
+  markReady(): void {
+    this.state = 'ready';
+  }
+
+  getStatus() {
+    return {
+      state: this.state,
+      enabled: WARMUP_ENABLED,
+      trackedUrls: this.candidates.size,
+      lastRun: this.lastRun
+    };
+  }
+
+  /**
+   * Load the persisted sketch and start periodic persistence
+   */
+  async initialize(): Promise<void> {
+    await this.load();
+    if (!this.persistTimer) {
+      this.persistTimer = setInterval(() => {
+        this.persist().catch(() => undefined);
+      }, PERSIST_INTERVAL_MS);
+      this.persistTimer.unref();
+    }
+  }
+
+  /**
+   * Replay the hottest URLs against this instance. Resolves within WARMUP_MAX_MS.
+   */
+  async run(port: number): Promise<void> {
+    if (this.state === 'warming') return;
+    if (!WARMUP_ENABLED) {
+      this.finish();
+      return;
+    }
+
+    this.state = 'warming';
+    const startedAt = Date.now();
+    const deadline = startedAt + WARMUP_MAX_MS;
+    let warmed = 0;
+    let failed = 0;
+    let skipped = 0;
+
+    const work = (async () => {
+      // Query-level caches for the dashboard's heaviest reads
+      await storage.warmCache();
+
+      const urls = this.getTopUrls();
+      await mapWithConcurrency(urls, WARMUP_CONCURRENCY, async url => {
+        const remaining = deadline - Date.now();
+        if (remaining <= 0) {
+          skipped++;
+          return;
+        }
+        try {
+          const response = await fetch(`http://127.0.0.1:${port}${url}`, {
+            headers: { [WARMUP_HEADER]: '1', 'accept-encoding': 'br, gzip' },
+            signal: AbortSignal.timeout(remaining)
+          });
+          await response.arrayBuffer();
+          if (response.ok) warmed++;
+          else failed++;
+        } catch {
+          failed++;
+        }
+      });
+    })();
+
+    let timedOut = false;
+    let timer: NodeJS.Timeout | undefined;
+    const timeout = new Promise<void>(resolve => {
+      timer = setTimeout(() => {
+        timedOut = true;
+        resolve();
+      }, WARMUP_MAX_MS);
+    });
+
+    try {
+      await Promise.race([work, timeout]);
+    } catch (error) {
+      logger.warn('Cache warmup failed', { error: error instanceof Error ? error.message : 'Unknown error' });
+    } finally {
+      clearTimeout(timer);
+      this.finish();
+      this.lastRun = {
+        startedAt: new Date(startedAt).toISOString(),
+        durationMs: Date.now() - startedAt,
+        warmed,
+        failed,
+        skipped,
+        timedOut
+      };
+      logger.info('Cache warmup completed', this.lastRun);
+    }
+  }
+
+  async persist(): Promise<void> {
+    if (!this.dirty) return;
+
+    if (Date.now() - this.lastDecayAt > DECAY_INTERVAL_MS) {
+      this.sketch.decay();
+      this.lastDecayAt = Date.now();
+    }
+
+    const payload: PersistedSketch = {
+      version: 1,
+      width: this.sketch.width,
+      depth: this.sketch.depth,
+      counts: this.sketch.serialize(),
+      candidates: Array.from(this.candidates.entries()),
+      lastDecayAt: this.lastDecayAt
+    };
+    const serialized = JSON.stringify(payload);
+
+    try {
+      const redisClient = getRedisClient();
+      if (redisClient) {
+        await redisClient.set(SKETCH_REDIS_KEY, serialized);
+      } else {
+        await fs.mkdir(path.dirname(SKETCH_FILE), { recursive: true });
+        await fs.writeFile(SKETCH_FILE, serialized);
+      }
+      this.dirty = false;
+      logger.debug('Warmup sketch persisted', { trackedUrls: this.candidates.size });
+    } catch (error) {
+      logger.warn('Failed to persist warmup sketch', {
+        error: error instanceof Error ? error.message : 'Unknown error'
+      });
+    }
+  }
+
+  private async load(): Promise<void> {
+    try {
+      const redisClient = getRedisClient();
+      const raw = redisClient
+        ? await redisClient.get(SKETCH_REDIS_KEY)
+        : await fs.readFile(SKETCH_FILE, 'utf-8').catch(() => null);
+      if (!raw) return;
+
+      const payload = JSON.parse(raw) as PersistedSketch;
+      if (payload.version !== 1) return;
+
+      this.sketch = CountMinSketch.deserialize(payload.width, payload.depth, payload.counts);
+      this.candidates = new Map(payload.candidates);
+      this.lastDecayAt = payload.lastDecayAt || Date.now();
+      logger.info('Warmup sketch loaded', { trackedUrls: this.candidates.size });
+    } catch (error) {
+      logger.warn('Failed to load warmup sketch', {
+        error: error instanceof Error ? error.message : 'Unknown error'
+      });
+    }
+  }
+}
+
+export const cacheWarmup = new CacheWarmupScheduler();
+
+clusterState.subscribe(DONE_MESSAGE, () => cacheWarmup.markReady());
+clusterState.subscribe(STATUS_MESSAGE, () => {
+  if (cacheWarmup.isReady()) clusterState.publish(DONE_MESSAGE);
+});
@@ -0,0 +1,220 @@
+import cluster, { type Worker } from 'cluster';
+import { availableParallelism } from 'os';
+import { dirname, extname, join } from 'path';
+import { fileURLToPath, pathToFileURL } from 'url';
+import { logger } from './logger';
+import { CLUSTER_CHANNEL, isClusterMessage, PROMOTE_MESSAGE, type ClusterMessage } from './clusterState';
+
+/**
+ * Multi-process entry point
+ *
+ * With CLUSTER_WORKERS > 1 the primary forks that many copies of the server
+ * (index.ts). They share the listening port; the primary only supervises:
+ * it picks one leader worker, relays cluster messages between workers,
+ * replaces crashed workers and restarts them one at a time on SIGUSR2.
+ * Without Redis, sessions, CSRF tokens and rate-limit counters would differ
+ * per worker, so clustering requires REDIS_URL.
+ *
+ * With CLUSTER_WORKERS unset or 1 the server runs in this process, exactly
+ * as `node dist/index.js` would.
+ */
+
+const currentFile = fileURLToPath(import.meta.url);
+const SERVER_ENTRY = join(dirname(currentFile), `index${extname(currentFile)}`);
+
+// 'auto' uses every available CPU; set it explicitly where the container
+// CPU quota is smaller than the host's CPU count
+const CLUSTER_WORKERS = process.env.CLUSTER_WORKERS === 'auto'
+  ? availableParallelism()
+  : parseInt(process.env.CLUSTER_WORKERS || '1', 10);
+// How long a worker may drain (cache persist, sync batch, open requests) before it is killed
+const CLUSTER_SHUTDOWN_TIMEOUT_MS = parseInt(process.env.CLUSTER_SHUTDOWN_TIMEOUT_MS || '30000', 10);
+// More crashes than this within the window stops the cluster instead of respawning
+const MAX_CRASHES = 5;
+const CRASH_WINDOW_MS = 60 * 1000;
+
+class ClusterSupervisor {
+  private leaderId: number | null = null;
+  // Workers that have loaded the app and can take messages
+  private listening = new Set<number>();
+  // Workers being replaced or shut down; never promoted, never respawned
+  private retiring = new Set<number>();
+  private crashes: number[] = [];
+  // One ETag epoch for every worker, so any of them can answer a conditional request with 304
+  private cacheEpoch = process.env.CACHE_EPOCH || Date.now().toString(36);
+  private shuttingDown = false;
+  private restarting = false;
+
+  start(workers: number): void {
+    cluster.setupPrimary({ exec: SERVER_ENTRY });
+    cluster.on('message', (worker, message) => this.relay(worker, message));
+    cluster.on('exit', (worker, code, signal) => this.handleExit(worker, code, signal));
+    cluster.on('listening', worker => {
+      this.listening.add(worker.id);
+      if (this.leaderId === null && !this.retiring.has(worker.id)) this.promote(worker);
+    });
+
+    logger.info('Starting cluster', { workers, entry: SERVER_ENTRY, pid: process.pid });
+    for (let i = 0; i < workers; i++) {
+      this.fork();
+    }
+
+    process.on('SIGTERM', () => this.shutdown('SIGTERM'));
+    process.on('SIGINT', () => this.shutdown('SIGINT'));
+    process.on('SIGUSR2', () => {
+      this.rollingRestart().catch(error => {
+        logger.error('Rolling restart failed', { error: error instanceof Error ? error.message : 'Unknown error' });
+      });
+    });
+  }
+
+  private fork(): Worker {
+    const leader = this.leaderId === null;
+    const worker = cluster.fork({ CLUSTER_LEADER: leader ? 'true' : 'false', CACHE_EPOCH: this.cacheEpoch });
+    if (leader) this.leaderId = worker.id;
+    logger.info('Cluster worker forked', { workerId: worker.id, pid: worker.process.pid, leader });
+    return worker;
+  }
+
+  /**
+   * Forward a worker's cluster message to every other live worker
+   */
+  private relay(source: Worker, message: unknown): void {
+    if (!isClusterMessage(message)) return;
+    for (const worker of Object.values(cluster.workers ?? {})) {
+      if (!worker || worker.id === source.id || !worker.isConnected()) continue;
+      worker.send(message, undefined, {}, () => undefined);
+    }
+  }
+
+  /**
+   * Hand leadership to the newest worker that is up (during a rolling
+   * restart that is a replacement, so leadership moves once); otherwise the
+   * next worker to start listening (or to be forked) becomes leader
+   */
+  private promoteLeader(): void {
+    const candidate = Object.values(cluster.workers ?? {})
+      .filter((worker): worker is Worker => !!worker && this.listening.has(worker.id) && worker.isConnected() && !this.retiring.has(worker.id))
+      .pop();
+    this.leaderId = null;
+    if (candidate) this.promote(candidate);
+  }
+
+  private promote(worker: Worker): void {
+    this.leaderId = worker.id;
+    const message: ClusterMessage = { channel: CLUSTER_CHANNEL, type: PROMOTE_MESSAGE };
+    worker.send(message, undefined, {}, () => undefined);
+    logger.info('Cluster leader promoted', { workerId: worker.id });
+  }
+
+  private handleExit(worker: Worker, code: number, signal: string): void {
+    this.listening.delete(worker.id);
+    const expected = this.retiring.delete(worker.id);
+    if (this.shuttingDown) return;
+    if (worker.id === this.leaderId) {
+      this.promoteLeader();
+    }
+    if (expected) return;
+
+    logger.error('Cluster worker exited unexpectedly', { workerId: worker.id, code, signal });
+    const now = Date.now();
+    this.crashes = this.crashes.filter(time => now - time < CRASH_WINDOW_MS);
+    this.crashes.push(now);
+    if (this.crashes.length > MAX_CRASHES) {
+      // Crash loop: let the platform restart policy take over
+      logger.error('Cluster workers are crash looping, stopping', { crashes: this.crashes.length, windowMs: CRASH_WINDOW_MS });
+      this.shutdown('crash loop', 1);
+      return;
+    }
+    this.fork();
+  }
+
+  /**
+   * Replace workers one at a time; each old worker drains only after its
+   * replacement is accepting connections
+   */
+  private async rollingRestart(): Promise<void> {
+    if (this.restarting || this.shuttingDown) return;
+    this.restarting = true;
+    // Replacements may run new code that renders responses differently
+    if (!process.env.CACHE_EPOCH) this.cacheEpoch = Date.now().toString(36);
+    const workers = Object.values(cluster.workers ?? {}).filter((worker): worker is Worker => !!worker);
+    logger.info('Rolling restart started', { workers: workers.length });
+
+    try {
+      for (const worker of workers) {
+        if (this.shuttingDown) break;
+        if (worker.isDead()) continue;
+        await this.waitForListening(this.fork());
+        await this.stopWorker(worker);
+      }
+      logger.info('Rolling restart completed');
+    } finally {
+      this.restarting = false;
+    }
+  }
+
+  private waitForListening(worker: Worker): Promise<void> {
+    return new Promise((resolve, reject) => {
+      const onListening = () => {
+        worker.off('exit', onExit);
+        resolve();
+      };
+      const onExit = () => {
+        worker.off('listening', onListening);
+        reject(new Error(`Worker ${worker.id} exited before listening`));
+      };
+      worker.once('listening', onListening);
+      worker.once('exit', onExit);
+    });
+  }
+
+  /**
+   * SIGTERM runs the worker's graceful shutdown; SIGKILL after the timeout
+   */
+  private stopWorker(worker: Worker): Promise<void> {
+    if (worker.isDead()) return Promise.resolve();
+    this.retiring.add(worker.id);
+    return new Promise(resolve => {
+      const timer = setTimeout(() => {
+        logger.warn('Cluster worker did not stop in time, killing', { workerId: worker.id });
+        worker.process.kill('SIGKILL');
+      }, CLUSTER_SHUTDOWN_TIMEOUT_MS);
+      worker.once('exit', () => {
+        clearTimeout(timer);
+        resolve();
+      });
+      worker.process.kill('SIGTERM');
+    });
+  }
+
+  private shutdown(reason: string, exitCode = 0): void {
+    if (this.shuttingDown) return;
+    this.shuttingDown = true;
+    logger.info(`Cluster received ${reason}, stopping workers...`);
+
+    const workers = Object.values(cluster.workers ?? {}).filter((worker): worker is Worker => !!worker);
+    Promise.allSettled(workers.map(worker => this.stopWorker(worker))).finally(() => {
+      logger.info('All cluster workers stopped');
+      process.exit(exitCode);
+    });
+  }
+}
+
+function runInProcess(): void {
+  import(pathToFileURL(SERVER_ENTRY).href).catch(error => {
+    logger.error('Failed to load server', { error: error instanceof Error ? error.message : 'Unknown error' });
+    process.exit(1);
+  });
+}
+
+if (Number.isFinite(CLUSTER_WORKERS) && CLUSTER_WORKERS > 1) {
+  if (process.env.REDIS_URL) {
+    new ClusterSupervisor().start(CLUSTER_WORKERS);
+  } else {
+    logger.warn('CLUSTER_WORKERS ignored: clustering requires REDIS_URL for shared sessions, CSRF tokens and rate limits');
+    runInProcess();
+  }
+} else {
+  runInProcess();
+}
@@ -0,0 +1,138 @@
+import cluster from 'cluster';
+import { logger } from './logger';
+
+/**
+ * Worker-side cluster coordination
+ *
+ * Under server/cluster.ts every worker runs the full app. The primary makes
+ * exactly one worker the leader (notification cron, object garbage
+ * collection, cache warmup and Redis session sweeps) and promotes another
+ * when it exits. publish() reaches every other worker through the primary
+ * and carries state that must not stay process-local: cache generation
+ * bumps, API cache invalidations and circuit breaker transitions.
+ *
+ * Outside a cluster the process is the leader and publish() does nothing.
+ */
+
+export const CLUSTER_CHANNEL = 'custodial:cluster';
+export const PROMOTE_MESSAGE = 'leader:promote';
+
+export interface ClusterMessage {
+  channel: typeof CLUSTER_CHANNEL;
+  type: string;
+  payload?: unknown;
+  origin?: number;
+}
+
+export function isClusterMessage(message: unknown): message is ClusterMessage {
+  return typeof message === 'object' && message !== null && (message as ClusterMessage).channel === CLUSTER_CHANNEL;
+}
+
+type MessageHandler = (payload: any) => void;
+
+class ClusterState {
+  readonly clustered = cluster.isWorker;
+  readonly workerId = cluster.worker?.id ?? 0;
+  private leader = !cluster.isWorker || process.env.CLUSTER_LEADER === 'true';
+  private leaderTasks: Array<{ name: string; task: () => void }> = [];
+  private handlers = new Map<string, Set<MessageHandler>>();
+  private stats = { published: 0, received: 0, dropped: 0 };
+
+  constructor() {
+    if (this.clustered) {
+      process.on('message', message => this.receive(message));
+    }
+  }
+
+  isLeader(): boolean {
+    return this.leader;
+  }
+
+  /**
+   * Run a task on the leader only: now if this process leads, otherwise
+   * when it is promoted
+   */
+  onLeader(name: string, task: () => void): void {
+    if (this.leader) {
+      this.runLeaderTask(name, task);
+    } else {
+      this.leaderTasks.push({ name, task });
+    }
+  }
+
+  /**
+   * Send a message to every other worker (no-op outside a cluster)
+   */
+  publish(type: string, payload?: unknown): void {
+    if (!this.clustered || !process.send || !process.connected) return;
+    const message: ClusterMessage = { channel: CLUSTER_CHANNEL, type, payload, origin: this.workerId };
+    this.stats.published++;
+    // The callback keeps a closing channel from raising an 'error' event
+    process.send(message, undefined, {}, error => {
+      if (error) this.stats.dropped++;
+    });
+  }
+
+  subscribe(type: string, handler: MessageHandler): void {
+    let handlers = this.handlers.get(type);
+    if (!handlers) {
+      handlers = new Set();
+      this.handlers.set(type, handlers);
+    }
+    handlers.add(handler);
+  }
+
+  getStats() {
+    return {
+      clustered: this.clustered,
+      workerId: this.workerId,
+      leader: this.leader,
+      pendingLeaderTasks: this.leaderTasks.map(({ name }) => name),
+      ...this.stats,
+    };
+  }
+
+  private receive(message: unknown): void {
+    if (!isClusterMessage(message)) return;
+    if (message.type === PROMOTE_MESSAGE) {
+      this.promote();
+      return;
+    }
+
+    this.stats.received++;
+    for (const handler of this.handlers.get(message.type) ?? []) {
+      try {
+        handler(message.payload);
+      } catch (error) {
+        logger.warn('Cluster message handler failed', {
+          type: message.type,
+          error: error instanceof Error ? error.message : 'Unknown error',
+        });
+      }
+    }
+  }
+
+  private promote(): void {
+    if (this.leader) return;
+    this.leader = true;
+    logger.info('Promoted to cluster leader', { workerId: this.workerId });
+    const tasks = this.leaderTasks;
+    this.leaderTasks = [];
+    for (const { name, task } of tasks) {
+      this.runLeaderTask(name, task);
+    }
+  }
+
+  private runLeaderTask(name: string, task: () => void): void {
+    try {
+      task();
+    } catch (error) {
+      logger.error('Leader task failed to start', {
+        task: name,
+        error: error instanceof Error ? error.message : 'Unknown error',
+      });
+    }
+  }
+}
+
+export const clusterState = new ClusterState();
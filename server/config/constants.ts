@@ -4,6 +4,20 @@ export const FILE_UPLOAD = {
   MAX_FILES: 5,
   ALLOWED_TYPES: ["image/jpeg", "image/png", "image/gif", "image/webp"],
   PDF_MAX_SIZE: 10 * 1024 * 1024, // 10MB
+  // Files stored at once across all requests
+  UPLOAD_CONCURRENCY: parseInt(process.env.UPLOAD_CONCURRENCY || "4", 10),
+} as const;
+
+// Photos are re-encoded on ingest: auto-oriented, metadata stripped, size capped
+export const IMAGE_INGEST = {
+  ENABLED: process.env.IMAGE_INGEST_ENABLED !== "false",
+  MAX_DIMENSION: 2048, // Longest edge in pixels
+  FORMAT: (process.env.IMAGE_INGEST_FORMAT === "webp" ? "webp" : "jpeg") as "jpeg" | "webp",
+  JPEG_QUALITY: 82,
+  WEBP_QUALITY: 80,
+  KEEP_ORIGINAL: process.env.IMAGE_KEEP_ORIGINAL === "true",
+  // Formats that are re-encoded; GIFs may be animated and are stored as uploaded
+  TYPES: ["image/jpeg", "image/png", "image/webp"],
 } as const;
 
 export const RATE_LIMITS = {
@@ -17,6 +31,10 @@ export const RATE_LIMITS = {
 export const CACHE = {
   DEFAULT_TTL: 5 * 60 * 1000, // 5 minutes
   SESSION_TTL: 24 * 60 * 60, // 24 hours in seconds
+  MEMORY_FALLBACK_MAX_ENTRIES: 500, // CacheManager in-memory fallback
+  MEMORY_FALLBACK_MAX_BYTES: 32 * 1024 * 1024, // 32MB
+  API_CACHE_MAX_ENTRIES: 1000, // APICache response cache
+  API_CACHE_MAX_BYTES: 48 * 1024 * 1024, // 48MB
 } as const;
 
 export const PAGINATION = {
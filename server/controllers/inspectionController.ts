@@ -63,8 +63,15 @@ export async function createInspection(req: Request, res: Response) {
 
     logger.info("[POST] Creating building inspection", { inspectionData });
 
-    const validatedData = insertInspectionSchema.parse(inspectionData);
-    const newInspection = await storage.createInspection(validatedData);
+    let newInspection;
+    try {
+      const validatedData = insertInspectionSchema.parse(inspectionData);
+      newInspection = await storage.createInspection(validatedData);
+    } catch (error) {
+      // The inspection would have owned these blob references
+      await storage.releaseObjectUrls(imageUrls);
+      throw error;
+    }
 
     logger.info("[POST] Building inspection created successfully", {
       id: newInspection.id,
@@ -1,6 +1,7 @@
 import { Request, Response, NextFunction } from "express";
 import { randomBytes, createHash } from "crypto";
 import { logger } from "./logger";
+import { getRedisClient } from "./security";
 
 // CSRF token configuration
 const CSRF_TOKEN_LENGTH = 32;
@@ -9,9 +10,84 @@ const CSRF_HEADER_NAME = "x-csrf-token";
 const CSRF_COOKIE_NAME = "csrf-secret";
 const CSRF_TOKEN_TTL = 24 * 60 * 60 * 1000; // 24 hours
 
-// In-memory token store (use Redis in production for distributed systems)
+// Token hashes per secret live in Redis when it is available, so every
+// cluster worker accepts them; the in-memory store is the fallback
 const MAX_TOKENS_PER_SECRET = 10;
-const tokenStore = new Map<string, { tokens: Set<string>; expires: number }>();
+const CSRF_REDIS_PREFIX = "csrf:";
+
+interface TokenEntry {
+  tokens: Set<string>;
+  expires: number;
+}
+
+const tokenStore = new Map<string, TokenEntry>();
+
+/**
+ * Look up the token hashes issued for a secret
+ */
+async function loadTokens(secret: string): Promise<TokenEntry | undefined> {
+  const redisClient = getRedisClient();
+  if (redisClient) {
+    try {
+      const key = CSRF_REDIS_PREFIX + secret;
+      const [hashes, ttl] = (await redisClient.multi().lRange(key, 0, -1).pTTL(key).exec()) as unknown as [string[], number];
+      if (hashes.length === 0) {
+        // Tokens issued while Redis was unavailable
+        return tokenStore.get(secret);
+      }
+      return { tokens: new Set(hashes), expires: Date.now() + Math.max(Number(ttl), 0) };
+    } catch (error) {
+      logger.warn("Redis CSRF lookup failed, using memory store", {
+        error: error instanceof Error ? error.message : "Unknown error",
+      });
+    }
+  }
+  return tokenStore.get(secret);
+}
+
+/**
+ * Record a new token hash for a secret, keeping the newest MAX_TOKENS_PER_SECRET
+ */
+async function storeToken(secret: string, hashedToken: string, now: number): Promise<void> {
+  const redisClient = getRedisClient();
+  if (redisClient) {
+    try {
+      const key = CSRF_REDIS_PREFIX + secret;
+      await redisClient
+        .multi()
+        .lPush(key, hashedToken)
+        .lTrim(key, 0, MAX_TOKENS_PER_SECRET - 1)
+        .pExpire(key, CSRF_TOKEN_TTL)
+        .exec();
+      return;
+    } catch (error) {
+      logger.warn("Redis CSRF store failed, using memory store", {
+        error: error instanceof Error ? error.message : "Unknown error",
+      });
+    }
+  }
+
+  const existing = tokenStore.get(secret);
+  const tokens = existing && now <= existing.expires
+    ? new Set(existing.tokens)
+    : new Set<string>();
+
+  tokens.add(hashedToken);
+
+  while (tokens.size > MAX_TOKENS_PER_SECRET) {
+    const oldestToken = tokens.values().next().value;
+    if (!oldestToken) {
+      break;
+    }
+    tokens.delete(oldestToken);
+  }
+
+  // Store token set with expiration
+  tokenStore.set(secret, {
+    tokens,
+    expires: now + CSRF_TOKEN_TTL,
+  });
+}
 
 /**
  * Generate a CSRF token and secret pair
@@ -43,7 +119,7 @@ function verifyCsrfToken(token: string, secret: string, storedHashes: Set<string
 /**
  * Middleware to generate and attach CSRF token to request
  */
-export function csrfProtection(req: any, res: Response, next: NextFunction) {
+export async function csrfProtection(req: any, res: Response, next: NextFunction) {
   // Skip CSRF for safe methods
   if (["GET", "HEAD", "OPTIONS"].includes(req.method)) {
     return next();
@@ -94,7 +170,7 @@ export function csrfProtection(req: any, res: Response, next: NextFunction) {
     }
 
     // Verify token
-    const storedData = tokenStore.get(secret);
+    const storedData = await loadTokens(secret);
 
     if (!storedData) {
       logger.warn("CSRF validation failed: Token not found or expired", {
@@ -158,38 +234,17 @@ export function csrfProtection(req: any, res: Response, next: NextFunction) {
 /**
  * Generate a new CSRF token for a session
  */
-export function generateToken(req: Request, res: Response): { token: string; secret: string } {
+export async function generateToken(req: Request, res: Response): Promise<{ token: string; secret: string }> {
   const now = Date.now();
   const existingSecret = req.cookies?.[CSRF_COOKIE_NAME] as string | undefined;
-  const existingEntry = existingSecret ? tokenStore.get(existingSecret) : undefined;
+  const existingEntry = existingSecret ? await loadTokens(existingSecret) : undefined;
 
   const secret = existingSecret && existingEntry && now <= existingEntry.expires
     ? existingSecret
     : randomBytes(CSRF_SECRET_LENGTH).toString("hex");
 
   const token = randomBytes(CSRF_TOKEN_LENGTH).toString("hex");
-  const hashedToken = hashToken(token, secret);
-
-  const existing = tokenStore.get(secret);
-  const tokens = existing && now <= existing.expires
-    ? new Set(existing.tokens)
-    : new Set<string>();
-
-  tokens.add(hashedToken);
-
-  while (tokens.size > MAX_TOKENS_PER_SECRET) {
-    const oldestToken = tokens.values().next().value;
-    if (!oldestToken) {
-      break;
-    }
-    tokens.delete(oldestToken);
-  }
-
-  // Store token set with expiration
-  tokenStore.set(secret, {
-    tokens,
-    expires: now + CSRF_TOKEN_TTL,
-  });
+  await storeToken(secret, hashToken(token, secret), now);
 
   // Set secret as httpOnly cookie
   res.cookie(CSRF_COOKIE_NAME, secret, {
@@ -207,9 +262,9 @@ export function generateToken(req: Request, res: Response): { token: string; sec
 /**
  * Endpoint to get a CSRF token
  */
-export function getCsrfToken(req: Request, res: Response) {
+export async function getCsrfToken(req: Request, res: Response) {
   try {
-    const { token } = generateToken(req, res);
+    const { token } = await generateToken(req, res);
 
     // Prevent caching of CSRF tokens
     res.set('Cache-Control', 'no-store, no-cache, must-revalidate, private');
@@ -253,7 +308,7 @@ export function cleanupExpiredTokens() {
 setInterval(cleanupExpiredTokens, 15 * 60 * 1000);
 
 /**
- * Get current token store stats (for monitoring)
+ * Get current token store stats (for monitoring; counts cover the memory store)
  */
 export function getCsrfStats() {
   const now = Date.now();
@@ -268,6 +323,7 @@ export function getCsrfStats() {
   return {
     activeTokens,
     activeSecrets: tokenStore.size,
+    store: getRedisClient() ? "redis" : "memory",
     headerName: CSRF_HEADER_NAME,
     cookieName: CSRF_COOKIE_NAME,
   };
@@ -4,6 +4,7 @@ import { drizzle } from 'drizzle-orm/node-postgres';
 import pg from 'pg';
 import * as schema from '../shared/schema';
 import { logger } from './logger';
+import { queryProfiler } from './queryProfiler';
 
 const { Pool } = pg;
 
@@ -53,6 +54,9 @@ export const pool = new Pool({
   ssl: useSSL ? true : false,
 });
 
+// Fingerprint, time and (for outliers) EXPLAIN every query on pooled clients
+queryProfiler.instrument(pool);
+
 export const db = drizzle(pool, { schema });
 
 // Connection pool monitoring
@@ -10,19 +10,39 @@ export class DoclingService {
   async extractTextFromPDF(pdfBuffer: Buffer, originalFilename: string): Promise<string | null> {
     const tempDir = path.join(process.cwd(), 'temp');
     const tempPdfPath = path.join(tempDir, `temp-${Date.now()}-${originalFilename}`);
-    const tempMdPath = tempPdfPath.replace('.pdf', '.md');
-    
+
     try {
       // Ensure temp directory exists
       await fs.mkdir(tempDir, { recursive: true });
-      
+
       // Write PDF to temp file
       await fs.writeFile(tempPdfPath, pdfBuffer);
-      
+
+      return await this.extractTextFromPDFFile(tempPdfPath, originalFilename);
+    } catch (error) {
+      logger.error('Docling extraction error:', error);
+      return null;
+    } finally {
+      await fs.unlink(tempPdfPath).catch(() => {});
+    }
+  }
+
+  /**
+   * Extract text from a PDF already on disk (e.g. a streamed upload) without reading it into memory
+   */
+  async extractTextFromPDFFile(pdfPath: string, originalFilename: string): Promise<string | null> {
+    const tempDir = path.join(process.cwd(), 'temp');
+    // Docling names its output after the input file
+    const tempMdPath = path.join(tempDir, path.basename(pdfPath).replace(/\.pdf$/i, '') + '.md');
+
+    try {
+      // Ensure temp directory exists
+      await fs.mkdir(tempDir, { recursive: true });
+
       // Run Docling to extract text as Markdown
       // Adjust command based on how Docling is installed
       const { stdout, stderr } = await execAsync(
-        `docling "${tempPdfPath}" --output "${tempDir}"`,
+        `docling "${pdfPath}" --output "${tempDir}"`,
         { maxBuffer: 10 * 1024 * 1024 } // 10MB buffer
       );
       
@@ -34,7 +54,6 @@ export class DoclingService {
       const markdownContent = await fs.readFile(tempMdPath, 'utf-8');
       
       // Cleanup temp files
-      await fs.unlink(tempPdfPath).catch(e => logger.warn('Cleanup error:', e));
       await fs.unlink(tempMdPath).catch(e => logger.warn('Cleanup error:', e));
       
       // Validate extracted text
@@ -53,7 +72,6 @@ export class DoclingService {
       logger.error('Docling extraction error:', error);
       
       // Cleanup on error
-      await fs.unlink(tempPdfPath).catch(() => {});
       await fs.unlink(tempMdPath).catch(() => {});
       
       return null;
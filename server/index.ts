@@ -20,17 +20,27 @@ import { registerRoutes } from "./routes";
 import { setupVite, serveStatic, log } from "./vite";
 import { securityHeaders, validateRequest, sanitizeInput, apiRateLimit, strictRateLimit, healthCheckRateLimit } from "./security";
 import { logger, requestIdMiddleware } from "./logger";
-import { performanceMonitor, healthCheck, errorHandler, metricsMiddleware, metricsCollector } from "./monitoring";
+import { performanceMonitor, healthCheck, errorHandler, metricsMiddleware, metricsCollector, renderPrometheusMetrics, routeMetrics, withWorkerLabel } from "./monitoring";
 import { automatedMonitoring } from "./automated-monitoring";
 import {
   cacheMiddleware,
   invalidateCache,
+  conditionalGet,
   performanceMiddleware,
   memoryMonitoring,
-  requestDeduplication,
+  requestCoalescer,
+  getCoalescerStats,
   apiCache
 } from "./cache";
 import { storage } from "./storage";
+import { cacheWarmup } from "./cacheWarmup";
+import { imagePool } from "./services/imagePool";
+import { syncQueueWorker } from "./services/syncQueueWorker";
+import { objectGarbageCollector } from "./services/objectGarbageCollector";
+import { runtimeMonitor } from "./runtimeMonitor";
+import { tracer } from "./tracing";
+import { instrumentApp, forPaths, middlewareProfiler } from "./middlewareProfiler";
+import { clusterState } from "./clusterState";
 import {
   performanceErrorHandler,
   asyncErrorHandler,
@@ -48,6 +58,16 @@ import { scheduleNotifications } from "./notificationService.js";
 
 const app = express();
 
+// Event-loop delay, GC and heap windows for /health, /metrics and alerting
+runtimeMonitor.start();
+
+// Per-middleware cost (MIDDLEWARE_PROFILING) and spans (TRACE_EXPORTER) for everything registered below
+instrumentApp(app);
+
+// API-only middleware is scoped to this route group; /objects, /uploads,
+// /health, /metrics and static assets skip it
+const API_ROUTES = ['/api'];
+
 // Core middleware configuration - MUST be before routes
 // Configure trust proxy for Replit environment (but not for rate limiting)
 if (process.env.REPL_SLUG) {
@@ -58,12 +78,13 @@ if (process.env.REPL_SLUG) {
 
 // Performance and monitoring middleware (order matters)
 app.use(requestIdMiddleware);
+app.use(tracer.middleware());
 app.use(performanceMiddleware);
-app.use(memoryMonitoring);
+app.use(forPaths(API_ROUTES, memoryMonitoring));
 app.use(metricsMiddleware);
 
 // Global request timeout (120 seconds for all requests)
-app.use((req: any, res: any, next: any) => {
+app.use(function requestTimeout(req: any, res: any, next: any) {
   // Set timeout for all requests except health checks
   if (!req.path.startsWith('/health')) {
     req.setTimeout(120000, () => {
@@ -80,7 +101,7 @@ app.use((req: any, res: any, next: any) => {
 });
 
 // Track requests for automated monitoring
-app.use((req, res, next) => {
+app.use(function trackRequest(req, res, next) {
   const start = Date.now();
   res.on('finish', () => {
     const duration = Date.now() - start;
@@ -91,11 +112,9 @@ app.use((req, res, next) => {
 });
 
 // Graceful degradation and circuit breaker protection
-app.use(gracefulDegradation);
-app.use(errorRecoveryMiddleware);
+app.use(forPaths(API_ROUTES, gracefulDegradation));
+app.use(forPaths(API_ROUTES, errorRecoveryMiddleware));
 
-// Request deduplication to prevent duplicate requests
-app.use(requestDeduplication);
 app.use(helmet({
   // Content Security Policy - disabled for development to allow inline styles
   contentSecurityPolicy: process.env.NODE_ENV === 'production' ? {
@@ -156,20 +175,24 @@ app.use(compression({
   }
 }));
 app.use(securityHeaders);
-app.use(validateRequest);
+app.use(forPaths(API_ROUTES, validateRequest));
 
 // Body parsing middleware - CRITICAL: Must be before sanitizeInput so req.body is populated
-app.use(express.json({ limit: "10mb" }));
-app.use(express.urlencoded({ extended: false, limit: "10mb" }));
+// Only API routes accept bodies; file and static routes never parse one
+app.use(forPaths(API_ROUTES, express.json({ limit: "10mb" })));
+app.use(forPaths(API_ROUTES, express.urlencoded({ extended: false, limit: "10mb" })));
 
-// Cookie parsing middleware - Required for CSRF protection
-app.use(cookieParser());
+// Cookie parsing middleware - Required for CSRF protection (API only)
+app.use(forPaths(API_ROUTES, cookieParser()));
 
 // Input sanitization - MUST be after body parsers so req.body exists
-app.use(sanitizeInput);
+app.use(forPaths(API_ROUTES, sanitizeInput));
 
 // Performance optimization middleware
-app.use(cacheMiddleware); // Add caching for GET requests
+app.use('/api', cacheWarmup.trackAccess); // Count hot URLs for post-deploy warmup
+// Polled endpoints answer If-None-Match with 304 before touching the cache or database
+app.use(['/api/inspections/pending', '/api/scores', '/api/photos/sync-status'], conditionalGet());
+app.use(forPaths(API_ROUTES, cacheMiddleware)); // Add caching for API GET requests
 
 // Apply rate limiting to API routes with different limits for different endpoints
 app.use('/api/admin/login', strictRateLimit); // Strict rate limiting for auth
@@ -178,10 +201,24 @@ app.use('/api/custodial-notes', apiRateLimit); // Rate limiting for notes with u
 app.use('/api/monthly-feedback', apiRateLimit); // Rate limiting for feedback with uploads
 app.use('/api', apiRateLimit); // Default rate limiting for other API routes
 
+// Coalesce identical concurrent GETs so the handler runs once (after rate limiting, before handlers)
+app.use(requestCoalescer({
+  routes: [
+    '/api/inspections',
+    '/api/room-inspections',
+    '/api/custodial-notes',
+    '/api/monthly-feedback',
+    '/api/scores',
+    '/api/photos'
+  ]
+}));
+
 // Add cache invalidation for mutation routes
-app.use('/api/inspections', invalidateCache(['inspections', 'scores']));
+app.use('/api/inspections', invalidateCache(['inspections', 'roomInspections', 'scores']));
+app.use('/api/room-inspections', invalidateCache(['roomInspections']));
 app.use('/api/custodial-notes', invalidateCache(['custodialNotes', 'scores']));
 app.use('/api/monthly-feedback', invalidateCache(['monthlyFeedback']));
+app.use('/api/photos', invalidateCache(['inspectionPhotos']));
 
 // Add circuit breaker protection to critical routes
 app.use('/api/inspections', circuitBreakerMiddleware(databaseCircuitBreaker, 'inspections'));
@@ -190,7 +227,9 @@ app.use('/api/monthly-feedback', circuitBreakerMiddleware(fileUploadCircuitBreak
 app.use('/api/scores', circuitBreakerMiddleware(cacheCircuitBreaker, 'scores'));
 
 // Debug: Log API requests with headers and body (after parsers)
-app.use('/api', (req: any, res: any, next: any) => {
+app.use('/api', function apiRequestLog(req: any, res: any, next: any) {
+  // Cloning and serializing every body is debug-only work
+  if (!logger.isLevelEnabled('DEBUG')) return next();
   try {
     const contentType = req.headers['content-type'];
     const accept = req.headers['accept'];
@@ -217,7 +256,7 @@ app.use('/api', (req: any, res: any, next: any) => {
   next();
 });
 
-app.use((req, res, next) => {
+app.use(forPaths(API_ROUTES, function apiResponseLog(req, res, next) {
   const start = Date.now();
   const path = req.path;
   let capturedJsonResponse: Record<string, any> | undefined = undefined;
@@ -232,7 +271,8 @@ app.use((req, res, next) => {
     const duration = Date.now() - start;
     if (path.startsWith("/api")) {
       let logLine = `${req.method} ${path} ${res.statusCode} in ${duration}ms`;
-      if (capturedJsonResponse) {
+      // The line is cut to 80 chars; only serialize the body when debugging
+      if (capturedJsonResponse && logger.isLevelEnabled('DEBUG')) {
         logLine += ` :: ${JSON.stringify(capturedJsonResponse)}`;
       }
 
@@ -245,7 +285,7 @@ app.use((req, res, next) => {
   });
 
   next();
-});
+}));
 
 /** ALLOW_IFRAME_FROM_REPLIT (only on Replit) **/
 if (process.env.REPL_SLUG) {
@@ -373,9 +413,19 @@ if (process.env.REPL_SLUG) {
       }
     });
 
+    // Prometheus text by default; ?format=json keeps the previous counter snapshot
     app.get("/metrics", healthCheckRateLimit, (req: any, res: any) => {
       try {
-        const metrics = metricsCollector.getMetrics();
+        // Prometheus text unless JSON is asked for (scrapers send text/plain or */*)
+        const wantsJson = req.query.format === 'json'
+          || (!!req.get('Accept') && req.accepts(['text/plain', 'application/json']) === 'application/json');
+        if (!wantsJson) {
+          res.set('Content-Type', 'text/plain; version=0.0.4; charset=utf-8');
+          res.set('Cache-Control', 'no-store');
+          return res.send(withWorkerLabel(renderPrometheusMetrics() + middlewareProfiler.toPrometheus()));
+        }
+
+        const metrics: any = metricsCollector.getMetrics();
         // Add Railway-specific metadata
         metrics.railway = {
           serviceId: process.env.RAILWAY_SERVICE_ID,
@@ -383,6 +433,8 @@ if (process.env.REPL_SLUG) {
           region: process.env.RAILWAY_REGION,
           projectId: process.env.RAILWAY_PROJECT_ID
         };
+        // Counters are per process; in cluster mode this names the worker that answered
+        metrics.worker = clusterState.workerId;
         res.json(metrics);
       } catch (error) {
         logger.error('Metrics endpoint failed', { error });
@@ -452,6 +504,15 @@ if (process.env.REPL_SLUG) {
           },
           storage: storageMetrics,
           cache: cacheStats,
+          coalescing: getCoalescerStats(),
+          routes: routeMetrics.getSummary().slice(0, 20),
+          imagePool: imagePool.getStats(),
+          syncQueue: await syncQueueWorker.getStats(),
+          runtime: runtimeMonitor.getWindows(30),
+          tracing: tracer.getStats(),
+          middleware: middlewareProfiler.enabled ? middlewareProfiler.getProfile() : undefined,
+          logging: logger.getStats(),
+          cluster: clusterState.getStats(),
           database: {
             connected: true // We'll add more detailed DB stats later
           }
@@ -557,16 +618,46 @@ if (process.env.REPL_SLUG) {
         version: APP_VERSION
       });
 
-      // Initialize notification scheduler
-      scheduleNotifications();
+      // Notification cron, GC and warmup run on one process only (the
+      // cluster leader, or this process when not clustered)
+      const startedAsLeader = clusterState.isLeader();
+      clusterState.onLeader('notifications', scheduleNotifications);
+
+      // Drain offline sync work in the background; claims use SKIP LOCKED,
+      // so every cluster worker can take part
+      syncQueueWorker.start();
+
+      // Remove unreferenced uploads daily
+      clusterState.onLeader('object-gc', () => objectGarbageCollector.schedule());
+
+      // Replay the hottest cached URLs; /health reports 503 on every worker
+      // until this finishes. A worker promoted later only takes over
+      // persisting the hot-URL sketch.
+      if (!startedAsLeader) cacheWarmup.followLeader();
+      clusterState.onLeader('cache-warmup', () => {
+        cacheWarmup.initialize()
+          .then(() => (startedAsLeader ? cacheWarmup.run(PORT) : cacheWarmup.finish()))
+          .catch(error => {
+            logger.warn('Cache warmup did not run', { error: error instanceof Error ? error.message : 'Unknown error' });
+            cacheWarmup.finish();
+          });
+      });
     });
 
-    // Graceful shutdown handling
+    // Graceful shutdown handling; cluster workers can get both a terminal
+    // SIGINT and the primary's SIGTERM
+    let shuttingDown = false;
     const shutdown = (signal: string) => {
+      if (shuttingDown) return;
+      shuttingDown = true;
       logger.info(`Received ${signal}, shutting down gracefully...`);
-      server.close(() => {
-        logger.info('Server closed');
-        process.exit(0);
+      // Only the leader's sketch is persisted; followers would overwrite it with a partial count
+      const persistWarmup = clusterState.isLeader() ? cacheWarmup.persist() : undefined;
+      Promise.allSettled([persistWarmup, syncQueueWorker.stop(), tracer.flush()]).finally(() => {
+        server.close(() => {
+          logger.info('Server closed');
+          process.exit(0);
+        });
       });
     };
 
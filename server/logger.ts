@@ -1,4 +1,6 @@
 import { AsyncLocalStorage } from 'async_hooks';
+import { Worker } from 'worker_threads';
+import { writeSync } from 'fs';
 
 interface LogEntry {
   timestamp: string;
@@ -17,10 +19,197 @@ interface RequestContext {
   ip?: string;
 }
 
+type LogLevel = LogEntry['level'];
+// Context may be passed as a function so it is only built when the entry is written
+type LogContext = Record<string, any> | (() => Record<string, any>);
+
+const LEVEL_ORDER: Record<LogLevel, number> = { DEBUG: 10, INFO: 20, WARN: 30, ERROR: 40 };
+
+// LOG_LEVEL=debug|info|warn|error (default: debug in development, info otherwise)
+const LOG_LEVEL = ((process.env.LOG_LEVEL || (process.env.NODE_ENV === 'development' ? 'debug' : 'info')).toUpperCase()) as LogLevel;
+const MIN_LEVEL = LEVEL_ORDER[LOG_LEVEL] ?? LEVEL_ORDER.INFO;
+// Fraction of INFO entries written; WARN and ERROR are never sampled
+const LOG_INFO_SAMPLE_RATE = Math.min(1, Math.max(0, parseFloat(process.env.LOG_INFO_SAMPLE_RATE || '1')));
+// NDJSON in production, one readable line per entry otherwise
+const LOG_FORMAT = process.env.LOG_FORMAT || (process.env.NODE_ENV === 'production' ? 'json' : 'pretty');
+// buffered: batched async stdout writes; worker: writes happen on a worker thread
+const LOG_TRANSPORT = process.env.LOG_TRANSPORT || 'buffered';
+const LOG_BUFFER_MAX_BYTES = parseInt(process.env.LOG_BUFFER_MAX_BYTES || String(8 * 1024 * 1024), 10);
+const FLUSH_BATCH_BYTES = 64 * 1024;
+
 // AsyncLocalStorage for request context (thread-safe in async operations)
 const asyncLocalStorage = new AsyncLocalStorage<RequestContext>();
 
+/**
+ * JSON replacer that keeps Error details and survives BigInt values
+ */
+function jsonReplacer(_key: string, value: any) {
+  if (value instanceof Error) {
+    return { name: value.name, message: value.message, stack: value.stack };
+  }
+  if (typeof value === 'bigint') {
+    return value.toString();
+  }
+  return value;
+}
+
+function serialize(value: unknown): string {
+  try {
+    return JSON.stringify(value, jsonReplacer);
+  } catch {
+    return JSON.stringify({ unserializable: String(value) });
+  }
+}
+
+/**
+ * Batches log lines and writes them off the request path: one stdout write per
+ * event-loop turn (or per 64KB), or on a worker thread with LOG_TRANSPORT=worker.
+ * While stdout is backed up (write() returned false, or the worker has not
+ * caught up) lines stay in the buffer; once buffered plus pending bytes reach
+ * LOG_BUFFER_MAX_BYTES, new lines are dropped and counted.
+ */
+class LogTransport {
+  private buffer: string[] = [];
+  private bufferedBytes = 0;
+  private scheduled = false;
+  private waitingForDrain = false;
+  private dropped = 0;
+  private worker: Worker | null = null;
+  // Chunks posted to the worker and not yet acknowledged as written
+  private inFlight: Array<{ seq: number; chunk: string }> = [];
+  private inFlightBytes = 0;
+  private seq = 0;
+  // Last chunk sequence claimed for writing, by the worker or by flushSync();
+  // a chunk is written by whichever side claims it, so never twice
+  private claimed = new Int32Array(new SharedArrayBuffer(4));
+
+  constructor() {
+    if (LOG_TRANSPORT === 'worker') {
+      try {
+        this.worker = new Worker(
+          `const { parentPort, workerData } = require('worker_threads');
+           const { writeSync } = require('fs');
+           const claimed = new Int32Array(workerData);
+           parentPort.on('message', ({ seq, chunk }) => {
+             if (Atomics.compareExchange(claimed, 0, seq - 1, seq) === seq - 1) {
+               try { writeSync(1, chunk); } catch {}
+             }
+             parentPort.postMessage(seq);
+           });`,
+          { eval: true, workerData: this.claimed.buffer },
+        );
+        this.worker.on('message', (seq: number) => this.acknowledge(seq));
+        this.worker.unref();
+      } catch {
+        this.worker = null;
+      }
+    }
+    // Whatever is still buffered is written synchronously on the way out
+    process.once('exit', () => this.flushSync());
+  }
+
+  write(line: string): void {
+    if (this.bufferedBytes + this.pendingBytes() + line.length > LOG_BUFFER_MAX_BYTES) {
+      this.dropped++;
+      return;
+    }
+    this.buffer.push(line);
+    this.bufferedBytes += line.length;
+
+    if (this.bufferedBytes >= FLUSH_BATCH_BYTES) {
+      this.flush();
+    } else if (!this.scheduled) {
+      this.scheduled = true;
+      setImmediate(() => this.flush());
+    }
+  }
+
+  flush(): void {
+    this.scheduled = false;
+    // The 'drain' listener flushes once stdout catches up
+    if (this.waitingForDrain) return;
+    const chunk = this.takeChunk();
+    if (!chunk) return;
+
+    if (this.worker) {
+      const seq = ++this.seq;
+      this.inFlight.push({ seq, chunk });
+      this.inFlightBytes += chunk.length;
+      this.worker.postMessage({ seq, chunk });
+    } else if (!process.stdout.write(chunk)) {
+      this.waitingForDrain = true;
+      process.stdout.once('drain', () => {
+        this.waitingForDrain = false;
+        this.flush();
+      });
+    }
+  }
+
+  flushSync(): void {
+    // The worker stops with the process; write the chunks it has not claimed
+    for (const { seq, chunk } of this.inFlight.splice(0)) {
+      if (Atomics.compareExchange(this.claimed, 0, seq - 1, seq) === seq - 1) {
+        this.writeStdoutSync(chunk);
+      }
+    }
+    this.inFlightBytes = 0;
+    const chunk = this.takeChunk();
+    if (chunk) this.writeStdoutSync(chunk);
+  }
+
+  getStats() {
+    return {
+      transport: this.worker ? 'worker' : 'buffered',
+      buffered: this.buffer.length,
+      pendingBytes: this.pendingBytes(),
+      dropped: this.dropped,
+    };
+  }
+
+  /**
+   * Bytes handed to stdout (or the worker) that are not written yet
+   */
+  private pendingBytes(): number {
+    return this.worker ? this.inFlightBytes : process.stdout.writableLength;
+  }
+
+  private acknowledge(seq: number): void {
+    while (this.inFlight.length > 0 && this.inFlight[0].seq <= seq) {
+      this.inFlightBytes -= this.inFlight.shift()!.chunk.length;
+    }
+  }
+
+  private writeStdoutSync(chunk: string): void {
+    try {
+      writeSync(1, chunk);
+    } catch {
+      // stdout closed
+    }
+  }
+
+  private takeChunk(): string | null {
+    if (this.buffer.length === 0 && this.dropped === 0) return null;
+    if (this.dropped > 0) {
+      this.buffer.push(serialize({
+        timestamp: new Date().toISOString(),
+        level: 'WARN',
+        message: 'Log lines dropped: output buffer full',
+        context: { dropped: this.dropped },
+      }));
+      this.dropped = 0;
+    }
+    const chunk = this.buffer.join('\n') + '\n';
+    this.buffer = [];
+    this.bufferedBytes = 0;
+    return chunk;
+  }
+}
+
+const transport = new LogTransport();
+
 class Logger {
+  private sampledOut = 0;
+
   /**
    * Get current request context from AsyncLocalStorage
    */
@@ -28,14 +217,28 @@ class Logger {
     return asyncLocalStorage.getStore();
   }
 
-  private log(level: LogEntry['level'], message: string, context?: Record<string, any>) {
+  /**
+   * Whether entries at this level are written; use to skip building expensive context
+   */
+  isLevelEnabled(level: LogLevel): boolean {
+    return LEVEL_ORDER[level] >= MIN_LEVEL;
+  }
+
+  private log(level: LogLevel, message: string, context?: LogContext) {
+    if (!this.isLevelEnabled(level)) return;
+    if (level === 'INFO' && LOG_INFO_SAMPLE_RATE < 1 && Math.random() >= LOG_INFO_SAMPLE_RATE) {
+      this.sampledOut++;
+      return;
+    }
+
     const requestContext = this.getRequestContext();
+    const resolvedContext = typeof context === 'function' ? context() : context;
 
     const entry: LogEntry = {
       timestamp: new Date().toISOString(),
       level,
       message,
-      context,
+      context: resolvedContext,
       requestId: requestContext?.requestId,
       correlationId: requestContext?.correlationId,
     };
@@ -50,33 +253,47 @@ class Logger {
       };
     }
 
-    // In production, you'd send this to a logging service
-    if (process.env.NODE_ENV === 'production') {
-      console.log(JSON.stringify(entry));
+    if (LOG_FORMAT === 'json') {
+      transport.write(serialize(entry));
     } else {
-      const contextStr = context ? ` ${JSON.stringify(context)}` : '';
+      const contextStr = resolvedContext !== undefined ? ` ${serialize(resolvedContext)}` : '';
       const requestStr = requestContext?.requestId ? ` [${requestContext.requestId}]` : '';
       const correlationStr = requestContext?.correlationId ? ` (${requestContext.correlationId})` : '';
-      console.log(`[${entry.timestamp}] ${level}${requestStr}${correlationStr}: ${message}${contextStr}`);
+      transport.write(`[${entry.timestamp}] ${level}${requestStr}${correlationStr}: ${message}${contextStr}`);
     }
   }
 
-  info(message: string, context?: Record<string, any>) {
+  info(message: string, context?: LogContext) {
     this.log('INFO', message, context);
   }
 
-  warn(message: string, context?: Record<string, any>) {
+  warn(message: string, context?: LogContext) {
     this.log('WARN', message, context);
   }
 
-  error(message: string, context?: Record<string, any>) {
+  error(message: string, context?: LogContext) {
     this.log('ERROR', message, context);
   }
 
-  debug(message: string, context?: Record<string, any>) {
-    if (process.env.NODE_ENV === 'development') {
-      this.log('DEBUG', message, context);
-    }
+  debug(message: string, context?: LogContext) {
+    this.log('DEBUG', message, context);
+  }
+
+  /**
+   * Write buffered lines now (e.g. before exiting)
+   */
+  flush() {
+    transport.flush();
+  }
+
+  getStats() {
+    return {
+      level: LOG_LEVEL,
+      format: LOG_FORMAT,
+      infoSampleRate: LOG_INFO_SAMPLE_RATE,
+      sampledOut: this.sampledOut,
+      ...transport.getStats(),
+    };
   }
 
   /**
@@ -0,0 +1,336 @@
+/**
+ * In-process LRU cache engine
+ *
+ * Shared by the CacheManager memory fallback (when Redis is unavailable) and
+ * the APICache response cache. Provides:
+ * - O(1) get/set/delete with true least-recently-used ordering
+ * - A byte budget based on the serialized size of each value
+ * - TTL expiry driven by a min-heap (no periodic full scans)
+ * - Hit/miss/eviction/expiration counters
+ */
+
+export type LRUEvictionReason = 'evicted' | 'expired';
+
+export interface LRUCacheOptions<V> {
+  /** Maximum number of entries (default 1000) */
+  maxEntries?: number;
+  /** Maximum total size of all entries in bytes (default 32MB) */
+  maxBytes?: number;
+  /** TTL used when set() is called without one (default 5 minutes) */
+  defaultTtlMs?: number;
+  /** Called when an entry is removed to make room or because it expired */
+  onEvict?: (key: string, value: V, reason: LRUEvictionReason) => void;
+  /** Called with the change in accounted bytes whenever an entry is stored, resized or removed */
+  onBytesChange?: (key: string, delta: number) => void;
+}
+
+export interface LRUCacheStats {
+  entries: number;
+  bytes: number;
+  maxEntries: number;
+  maxBytes: number;
+  hits: number;
+  misses: number;
+  evictions: number;
+  expirations: number;
+  hitRate: number;
+}
+
+interface LRUNode<V> {
+  key: string;
+  value: V;
+  size: number;
+  expiresAt: number;
+  prev: LRUNode<V> | null;
+  next: LRUNode<V> | null;
+}
+
+interface HeapEntry<V> {
+  expiresAt: number;
+  node: LRUNode<V>;
+}
+
+/**
+ * Estimate the in-memory cost of a value from its serialized length
+ */
+export function estimateSize(value: unknown): number {
+  if (value === undefined || value === null) return 0;
+  if (Buffer.isBuffer(value)) return value.length;
+  if (typeof value === 'string') return Buffer.byteLength(value);
+  try {
+    const serialized = JSON.stringify(value);
+    return serialized ? Buffer.byteLength(serialized) : 0;
+  } catch {
+    return 0;
+  }
+}
+
+export class LRUCache<V = any> {
+  private readonly map = new Map<string, LRUNode<V>>();
+  // Doubly linked list: head is most recently used, tail is least recently used
+  private head: LRUNode<V> | null = null;
+  private tail: LRUNode<V> | null = null;
+  // Min-heap ordered by expiresAt; stale entries are skipped lazily
+  private heap: HeapEntry<V>[] = [];
+  private totalBytes = 0;
+
+  private readonly maxEntries: number;
+  private readonly maxBytes: number;
+  private readonly defaultTtlMs: number;
+  private readonly onEvict?: (key: string, value: V, reason: LRUEvictionReason) => void;
+  private readonly onBytesChange?: (key: string, delta: number) => void;
+
+  private stats = {
+    hits: 0,
+    misses: 0,
+    evictions: 0,
+    expirations: 0,
+  };
+
+  constructor(options: LRUCacheOptions<V> = {}) {
+    this.maxEntries = options.maxEntries ?? 1000;
+    this.maxBytes = options.maxBytes ?? 32 * 1024 * 1024;
+    this.defaultTtlMs = options.defaultTtlMs ?? 5 * 60 * 1000;
+    this.onEvict = options.onEvict;
+    this.onBytesChange = options.onBytesChange;
+  }
+
+  /**
+   * Get a value, refreshing its recency. Returns undefined on miss or expiry.
+   */
+  get(key: string): V | undefined {
+    const node = this.map.get(key);
+    if (!node) {
+      this.stats.misses++;
+      return undefined;
+    }
+
+    if (node.expiresAt <= Date.now()) {
+      this.removeNode(node);
+      this.stats.expirations++;
+      this.stats.misses++;
+      this.onEvict?.(node.key, node.value, 'expired');
+      return undefined;
+    }
+
+    this.moveToFront(node);
+    this.stats.hits++;
+    return node.value;
+  }
+
+  /**
+   * Get a value without touching recency or hit/miss counters
+   */
+  peek(key: string): V | undefined {
+    const node = this.map.get(key);
+    if (!node || node.expiresAt <= Date.now()) return undefined;
+    return node.value;
+  }
+
+  has(key: string): boolean {
+    return this.peek(key) !== undefined;
+  }
+
+  /**
+   * Store a value. `size` defaults to the serialized length of the value.
+   * Values larger than the whole byte budget are not stored.
+   */
+  set(key: string, value: V, ttlMs: number = this.defaultTtlMs, size?: number): boolean {
+    const entrySize = size ?? estimateSize(value);
+    const existing = this.map.get(key);
+    if (existing) {
+      this.removeNode(existing);
+    }
+
+    if (entrySize > this.maxBytes) {
+      return false;
+    }
+
+    const node: LRUNode<V> = {
+      key,
+      value,
+      size: entrySize,
+      expiresAt: Date.now() + ttlMs,
+      prev: null,
+      next: null,
+    };
+
+    this.map.set(key, node);
+    this.totalBytes += entrySize;
+    this.onBytesChange?.(key, entrySize);
+    this.linkFront(node);
+    this.heapPush({ expiresAt: node.expiresAt, node });
+
+    this.purgeExpired();
+    this.enforceLimits();
+    return this.map.get(key) === node;
+  }
+
+  /**
+   * Update the accounted size of an entry (e.g. after attaching derived data)
+   */
+  resize(key: string, size: number): void {
+    const node = this.map.get(key);
+    if (!node) return;
+    this.totalBytes += size - node.size;
+    this.onBytesChange?.(key, size - node.size);
+    node.size = size;
+    this.enforceLimits();
+  }
+
+  delete(key: string): boolean {
+    const node = this.map.get(key);
+    if (!node) return false;
+    this.removeNode(node);
+    return true;
+  }
+
+  clear(): void {
+    if (this.onBytesChange) {
+      for (const node of this.map.values()) this.onBytesChange(node.key, -node.size);
+    }
+    this.map.clear();
+    this.head = null;
+    this.tail = null;
+    this.heap = [];
+    this.totalBytes = 0;
+  }
+
+  resetStats(): void {
+    this.stats = { hits: 0, misses: 0, evictions: 0, expirations: 0 };
+  }
+
+  keys(): IterableIterator<string> {
+    return this.map.keys();
+  }
+
+  get size(): number {
+    return this.map.size;
+  }
+
+  get bytes(): number {
+    return this.totalBytes;
+  }
+
+  /**
+   * Remove every expired entry. Cost is O(k log n) for k expired entries.
+   */
+  purgeExpired(now: number = Date.now()): number {
+    let purged = 0;
+    while (this.heap.length > 0 && this.heap[0].expiresAt <= now) {
+      const entry = this.heapPop()!;
+      const node = entry.node;
+      // Skip heap entries whose node was replaced or already removed
+      if (this.map.get(node.key) !== node || node.expiresAt !== entry.expiresAt) {
+        continue;
+      }
+      this.removeNode(node);
+      this.stats.expirations++;
+      purged++;
+      this.onEvict?.(node.key, node.value, 'expired');
+    }
+
+    // Compact the heap if lazily-deleted entries dominate it
+    if (this.heap.length > this.map.size * 2 + 64) {
+      this.rebuildHeap();
+    }
+
+    return purged;
+  }
+
+  getStats(): LRUCacheStats {
+    const lookups = this.stats.hits + this.stats.misses;
+    return {
+      entries: this.map.size,
+      bytes: this.totalBytes,
+      maxEntries: this.maxEntries,
+      maxBytes: this.maxBytes,
+      hits: this.stats.hits,
+      misses: this.stats.misses,
+      evictions: this.stats.evictions,
+      expirations: this.stats.expirations,
+      hitRate: lookups > 0 ? (this.stats.hits / lookups) * 100 : 0,
+    };
+  }
+
+  private enforceLimits(): void {
+    while (this.tail && (this.map.size > this.maxEntries || this.totalBytes > this.maxBytes)) {
+      const victim = this.tail;
+      this.removeNode(victim);
+      this.stats.evictions++;
+      this.onEvict?.(victim.key, victim.value, 'evicted');
+    }
+  }
+
+  private removeNode(node: LRUNode<V>): void {
+    this.unlink(node);
+    this.map.delete(node.key);
+    this.totalBytes -= node.size;
+    this.onBytesChange?.(node.key, -node.size);
+  }
+
+  private linkFront(node: LRUNode<V>): void {
+    node.prev = null;
+    node.next = this.head;
+    if (this.head) this.head.prev = node;
+    this.head = node;
+    if (!this.tail) this.tail = node;
+  }
+
+  private unlink(node: LRUNode<V>): void {
+    if (node.prev) node.prev.next = node.next;
+    else this.head = node.next;
+    if (node.next) node.next.prev = node.prev;
+    else this.tail = node.prev;
+    node.prev = null;
+    node.next = null;
+  }
+
+  private moveToFront(node: LRUNode<V>): void {
+    if (this.head === node) return;
+    this.unlink(node);
+    this.linkFront(node);
+  }
+
+  private heapPush(entry: HeapEntry<V>): void {
+    const heap = this.heap;
+    heap.push(entry);
+    let i = heap.length - 1;
+    while (i > 0) {
+      const parent = (i - 1) >> 1;
+      if (heap[parent].expiresAt <= heap[i].expiresAt) break;
+      [heap[parent], heap[i]] = [heap[i], heap[parent]];
+      i = parent;
+    }
+  }
+
+  private heapPop(): HeapEntry<V> | undefined {
+    const heap = this.heap;
+    if (heap.length === 0) return undefined;
+    const top = heap[0];
+    const last = heap.pop()!;
+    if (heap.length > 0) {
+      heap[0] = last;
+      let i = 0;
+      for (;;) {
+        const left = 2 * i + 1;
+        const right = left + 1;
+        let smallest = i;
+        if (left < heap.length && heap[left].expiresAt < heap[smallest].expiresAt) smallest = left;
+        if (right < heap.length && heap[right].expiresAt < heap[smallest].expiresAt) smallest = right;
+        if (smallest === i) break;
+        [heap[smallest], heap[i]] = [heap[i], heap[smallest]];
+        i = smallest;
+      }
+    }
+    return top;
+  }
+
+  private rebuildHeap(): void {
+    const live = Array.from(this.map.values(), node => ({ expiresAt: node.expiresAt, node }));
+    this.heap = [];
+    for (const entry of live) {
+      this.heapPush(entry);
+    }
+  }
+}
@@ -0,0 +1,168 @@
+import type { Request, Response, NextFunction } from 'express';
+import { LogHistogram } from './utils/histogram';
+import { tracer } from './tracing';
+
+/**
+ * Middleware chain instrumentation and route-group scoping
+ *
+ * instrumentApp() wraps every function passed to app.use. With
+ * MIDDLEWARE_PROFILING=true each middleware's cost is recorded per request:
+ * the time from entering it until it calls next(), or until the response
+ * finishes if it answers the request itself. Sampled trace requests get a
+ * span per middleware. With profiling off and tracing off, middleware is
+ * registered unwrapped.
+ *
+ * forPaths() limits a middleware to a route group without mounting it, so
+ * req.path is unchanged and /objects, /uploads, /health and static assets
+ * skip the API-only chain (body parsing, sanitizing, API caching).
+ */
+
+const MIDDLEWARE_PROFILING = process.env.MIDDLEWARE_PROFILING === 'true';
+
+interface MiddlewareStats {
+  name: string;
+  durationMs: LogHistogram;
+  skipped: number;
+}
+
+class MiddlewareProfiler {
+  readonly enabled = MIDDLEWARE_PROFILING;
+  private stats = new Map<string, MiddlewareStats>();
+
+  /**
+   * Time a middleware until it hands off (next) or the response finishes
+   */
+  wrap(name: string, middleware: Function): Function {
+    if (!this.enabled) return middleware;
+    const entry = this.getEntry(name);
+
+    const timed = (args: any[], nextIndex: number) => {
+      const res: Response = args[nextIndex - 1];
+      const next: NextFunction = args[nextIndex];
+      const start = process.hrtime.bigint();
+      let recorded = false;
+      const record = () => {
+        if (recorded) return;
+        recorded = true;
+        res.removeListener('finish', record);
+        entry.durationMs.record(Number(process.hrtime.bigint() - start) / 1e6);
+      };
+      res.once('finish', record);
+
+      args[nextIndex] = (error?: unknown) => {
+        record();
+        next(error as any);
+      };
+      return middleware(...args);
+    };
+
+    if (middleware.length === 4) {
+      return (error: unknown, req: Request, res: Response, next: NextFunction) => timed([error, req, res, next], 3);
+    }
+    return (req: Request, res: Response, next: NextFunction) => timed([req, res, next], 2);
+  }
+
+  /**
+   * Count a request that a route-scoped middleware passed over
+   */
+  recordSkip(name: string): void {
+    if (this.enabled) this.getEntry(name).skipped++;
+  }
+
+  /**
+   * Per-middleware cost, most expensive (by total time) first
+   */
+  getProfile() {
+    return Array.from(this.stats.values())
+      .map(({ name, durationMs, skipped }) => ({ name, skipped, ...durationMs.snapshot() }))
+      .sort((a, b) => b.sum - a.sum);
+  }
+
+  reset(): void {
+    for (const entry of this.stats.values()) {
+      entry.durationMs.reset();
+      entry.skipped = 0;
+    }
+  }
+
+  /**
+   * Prometheus text for /metrics (empty unless profiling is on)
+   */
+  toPrometheus(): string {
+    if (!this.enabled || this.stats.size === 0) return '';
+    const lines = [
+      '# HELP http_middleware_duration_seconds Time each middleware adds per request',
+      '# TYPE http_middleware_duration_seconds summary',
+    ];
+    for (const { name, durationMs } of this.stats.values()) {
+      const snapshot = durationMs.snapshot();
+      const label = name.replace(/\\/g, '\\\\').replace(/"/g, '\\"');
+      for (const [quantile, value] of [['0.5', snapshot.p50], ['0.95', snapshot.p95], ['0.99', snapshot.p99]] as const) {
+        lines.push(`http_middleware_duration_seconds{middleware="${label}",quantile="${quantile}"} ${value / 1000}`);
+      }
+      lines.push(`http_middleware_duration_seconds_sum{middleware="${label}"} ${snapshot.sum / 1000}`);
+      lines.push(`http_middleware_duration_seconds_count{middleware="${label}"} ${snapshot.count}`);
+    }
+    return lines.join('\n') + '\n';
+  }
+
+  private getEntry(name: string): MiddlewareStats {
+    let entry = this.stats.get(name);
+    if (!entry) {
+      // Sub-millisecond resolution: most middleware costs microseconds
+      entry = { name, durationMs: new LogHistogram(0.001, 2 * 60 * 1000), skipped: 0 };
+      this.stats.set(name, entry);
+    }
+    return entry;
+  }
+}
+
+export const middlewareProfiler = new MiddlewareProfiler();
+
+/**
+ * Run a middleware only for requests under one of the path prefixes.
+ * Unlike app.use(path, fn) the request is not re-rooted, so req.path and
+ * req.url are what the middleware expects.
+ */
+export function forPaths(prefixes: readonly string[], middleware: (req: Request, res: Response, next: NextFunction) => unknown) {
+  const name = middleware.name || 'anonymous';
+  const scoped = (req: Request, res: Response, next: NextFunction) => {
+    const matches = prefixes.some(prefix => req.path === prefix || req.path.startsWith(prefix.endsWith('/') ? prefix : `${prefix}/`));
+    if (!matches) {
+      middlewareProfiler.recordSkip(name);
+      return next();
+    }
+    return middleware(req, res, next);
+  };
+  Object.defineProperty(scoped, 'name', { value: name });
+  return scoped;
+}
+
+/**
+ * Profile and trace every function later passed to app.use, labelled by
+ * function name and mount path
+ */
+export function instrumentApp(app: { use: Function }): void {
+  if (!middlewareProfiler.enabled && !tracer.enabled) return;
+  const originalUse = app.use.bind(app);
+  let anonymous = 0;
+
+  const wrap = (handler: unknown, mountPath: string | undefined): unknown => {
+    if (Array.isArray(handler)) return handler.map(item => wrap(item, mountPath));
+    // Sub-apps and routers keep their own identity (mounting relies on it)
+    if (typeof handler !== 'function' || (handler as any).handle || (handler as any).stack) return handler;
+    const baseName = handler.name && handler.name !== 'anonymous' ? handler.name : `anonymous_${++anonymous}`;
+    const name = mountPath ? `${baseName} ${mountPath}` : baseName;
+    return tracer.wrapMiddleware(name, middlewareProfiler.wrap(name, handler));
+  };
+
+  app.use = (...args: unknown[]) => {
+    const first = args[0];
+    const mountPath = typeof first === 'string'
+      ? first
+      : Array.isArray(first) && first.every(item => typeof item === 'string')
+        ? first.join(',')
+        : undefined;
+    return originalUse(...args.map((arg, i) => (mountPath !== undefined && i === 0 ? arg : wrap(arg, mountPath))));
+  };
+}
@@ -1,5 +1,8 @@
 import { Request, Response, NextFunction } from 'express';
 import { logger } from './logger';
+import { LogHistogram } from './utils/histogram';
+import { runtimeMonitor } from './runtimeMonitor';
+import { clusterState } from './clusterState';
 import { readFileSync } from 'fs';
 import { join, dirname } from 'path';
 import { fileURLToPath } from 'url';
@@ -13,7 +16,7 @@ const packageJson = JSON.parse(
 const APP_VERSION = packageJson.version;
 
 interface HealthCheck {
-  status: 'ok' | 'error';
+  status: 'ok' | 'error' | 'warming';
   timestamp: string;
   uptime: number;
   version: string;
@@ -29,6 +32,8 @@ interface HealthCheck {
     total: number;
     percentage: number;
   };
+  warmup?: ReturnType<typeof import('./cacheWarmup').cacheWarmup.getStatus>;
+  runtime?: ReturnType<typeof runtimeMonitor.getSummary>;
 }
 
 // Performance monitoring middleware
@@ -116,21 +121,27 @@ export const healthCheck = async (req: Request, res: Response): Promise<void> =>
       percentage: Math.round((memUsage.heapUsed / memUsage.heapTotal) * 100)
     };
 
+    // Cache warmup after a deploy: report not-ready until it completes (bounded)
+    const { cacheWarmup } = await import('./cacheWarmup');
+    const warming = cacheWarmup.isWarming();
+
     const health: HealthCheck = {
-      status: dbStatus === 'error' ? 'error' : 'ok',
+      status: dbStatus === 'error' ? 'error' : warming ? 'warming' : 'ok',
       timestamp: new Date().toISOString(),
       uptime: Math.floor(process.uptime()),
       version: APP_VERSION,
       environment: process.env.NODE_ENV || 'development',
       database: dbStatus,
       redis: redisHealth,
-      memory
+      memory,
+      warmup: cacheWarmup.getStatus(),
+      runtime: runtimeMonitor.getSummary()
     };
 
     const responseTime = Date.now() - startTime;
     res.setHeader('X-Response-Time', `${responseTime}ms`);
 
-    if (health.status === 'error') {
+    if (health.status !== 'ok') {
       res.status(503).json(health);
     } else {
       res.json(health);
@@ -217,8 +228,146 @@ class MetricsCollector {
 
 export const metricsCollector = new MetricsCollector();
 
+// Prometheus histogram bucket bounds (seconds)
+const LATENCY_BUCKETS_SECONDS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60];
+
+interface RouteSeries {
+  method: string;
+  route: string;
+  statusClass: string;
+  durationMs: LogHistogram;
+}
+
+/**
+ * Request latency histograms keyed by method, route template and status class
+ *
+ * Each series is a fixed-size log-bucketed histogram and the number of series
+ * is capped (overflow goes to route="other"), so memory stays constant no
+ * matter how many requests or distinct URLs are seen. Values are cumulative
+ * for the life of the process, as Prometheus expects.
+ */
+class RouteMetrics {
+  private series = new Map<string, RouteSeries>();
+  private readonly maxSeries = 300;
+
+  record(method: string, route: string, statusCode: number, durationMs: number): void {
+    const statusClass = `${Math.floor(statusCode / 100)}xx`;
+    let key = `${method} ${route} ${statusClass}`;
+    let entry = this.series.get(key);
+    if (!entry) {
+      if (this.series.size >= this.maxSeries) {
+        route = 'other';
+        key = `${method} ${route} ${statusClass}`;
+        entry = this.series.get(key);
+      }
+      if (!entry) {
+        entry = { method, route, statusClass, durationMs: new LogHistogram() };
+        this.series.set(key, entry);
+      }
+    }
+    entry.durationMs.record(durationMs);
+  }
+
+  /**
+   * Percentile summary per series, slowest p95 first
+   */
+  getSummary() {
+    return Array.from(this.series.values())
+      .map(({ method, route, statusClass, durationMs }) => ({
+        method,
+        route,
+        statusClass,
+        ...durationMs.snapshot(),
+      }))
+      .sort((a, b) => b.p95 - a.p95);
+  }
+
+  /**
+   * Prometheus text exposition of the request duration histograms
+   */
+  toPrometheus(): string {
+    const lines = [
+      '# HELP http_request_duration_seconds HTTP request latency by route template and status class',
+      '# TYPE http_request_duration_seconds histogram',
+    ];
+    for (const { method, route, statusClass, durationMs } of this.series.values()) {
+      const labels = `method="${method}",route="${escapeLabel(route)}",status="${statusClass}"`;
+      // Bucket counts are at the log-histogram's resolution (~19% wide buckets)
+      for (const bound of LATENCY_BUCKETS_SECONDS) {
+        lines.push(`http_request_duration_seconds_bucket{${labels},le="${bound}"} ${durationMs.countAtOrBelow(bound * 1000)}`);
+      }
+      const snapshot = durationMs.snapshot();
+      lines.push(`http_request_duration_seconds_bucket{${labels},le="+Inf"} ${snapshot.count}`);
+      lines.push(`http_request_duration_seconds_sum{${labels}} ${snapshot.sum / 1000}`);
+      lines.push(`http_request_duration_seconds_count{${labels}} ${snapshot.count}`);
+    }
+    return lines.join('\n') + '\n';
+  }
+}
+
+function escapeLabel(value: string): string {
+  return value.replace(/\\/g, '\\\\').replace(/"/g, '\\"').replace(/\n/g, '\\n');
+}
+
+/**
+ * Route template of a handled request (e.g. /api/inspections/:id), never the raw URL
+ */
+export function getRouteTemplate(req: Request): string {
+  if (req.route?.path) {
+    const routePath = typeof req.route.path === 'string' ? req.route.path : String(req.route.path);
+    return `${req.baseUrl || ''}${routePath}`;
+  }
+  // No route matched: static assets, the SPA fallback or a 404
+  if (req.originalUrl.startsWith('/api')) return 'unmatched_api';
+  return 'static';
+}
+
+export const routeMetrics = new RouteMetrics();
+
+/**
+ * Prometheus text for /metrics: route histograms, flat counters and process gauges
+ */
+export function renderPrometheusMetrics(): string {
+  const counters = metricsCollector.getMetrics() as Record<string, number>;
+  const memory = process.memoryUsage();
+  const lines = [
+    '# HELP app_events_total Application event counters (reset daily)',
+    '# TYPE app_events_total counter',
+  ];
+  for (const [name, value] of Object.entries(counters)) {
+    if (name.startsWith('_') || typeof value !== 'number') continue;
+    lines.push(`app_events_total{name="${escapeLabel(name)}"} ${value}`);
+  }
+  lines.push(
+    '# HELP process_resident_memory_bytes Resident memory size in bytes',
+    '# TYPE process_resident_memory_bytes gauge',
+    `process_resident_memory_bytes ${memory.rss}`,
+    '# HELP nodejs_heap_used_bytes V8 heap used in bytes',
+    '# TYPE nodejs_heap_used_bytes gauge',
+    `nodejs_heap_used_bytes ${memory.heapUsed}`,
+    '# HELP process_uptime_seconds Process uptime in seconds',
+    '# TYPE process_uptime_seconds gauge',
+    `process_uptime_seconds ${Math.floor(process.uptime())}`,
+  );
+  return routeMetrics.toPrometheus() + runtimeMonitor.toPrometheus() + lines.join('\n') + '\n';
+}
+
+/**
+ * Label every sample with the worker that produced it. In cluster mode each
+ * scrape reaches whichever worker accepts the connection, so unlabelled
+ * counters would jump between workers' values.
+ */
+export function withWorkerLabel(text: string): string {
+  if (!clusterState.clustered) return text;
+  const label = `worker="${clusterState.workerId}"`;
+  return text.replace(/^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{)?/gm, (_match, name: string, brace?: string) =>
+    brace ? `${name}{${label},` : `${name}{${label}}`,
+  );
+}
+
 // Metrics middleware
 export const metricsMiddleware = (req: Request, res: Response, next: NextFunction) => {
+  const start = process.hrtime.bigint();
   metricsCollector.increment('requests_total');
   metricsCollector.increment(`requests_${req.method.toLowerCase()}`);
   
@@ -227,7 +376,9 @@ export const metricsMiddleware = (req: Request, res: Response, next: NextFunctio
     if (res.statusCode >= 400) {
       metricsCollector.increment('errors_total');
     }
+    const durationMs = Number(process.hrtime.bigint() - start) / 1e6;
+    routeMetrics.record(req.method, getRouteTemplate(req), res.statusCode, durationMs);
   });
   
   next();
-};
\ No newline at end of file
+};
@@ -1,15 +1,40 @@
 import fs from 'fs/promises';
 import path from 'path';
-import { createHash } from 'crypto';
+import { randomBytes } from 'crypto';
 import mime from 'mime-types';
 import { logger } from './logger';
+import { tracer } from './tracing';
+
+// Local storage root; upload temp files live in a subdirectory so renames stay on one filesystem
+export const UPLOADS_DIR = path.join(process.cwd(), 'uploads');
+export const UPLOAD_TEMP_DIR = path.join(UPLOADS_DIR, '.tmp');
+
+// Content-addressed blobs: cas/<first two hex chars>/<sha256>.<ext>
+export const CAS_PREFIX = 'cas';
+const CAS_PATH_PATTERN = /^cas\/[0-9a-f]{2}\/([0-9a-f]{64})(\.[a-z0-9]+)?$/;
+
+/**
+ * Storage name for content with the given SHA-256
+ */
+export function getContentAddressedPath(sha256: string, mimetype?: string): string {
+  const extension = (mimetype && mime.extension(mimetype)) || 'bin';
+  return `${CAS_PREFIX}/${sha256.slice(0, 2)}/${sha256}.${extension}`;
+}
+
+/**
+ * SHA-256 of a content-addressed storage name, or null for other names
+ */
+export function parseContentAddressedPath(filename: string): string | null {
+  const match = CAS_PATH_PATTERN.exec(filename);
+  return match ? match[1] : null;
+}
 
 export class ObjectStorageService {
   private storagePath: string;
 
   constructor() {
     // Use uploads directory for local storage
-    this.storagePath = path.join(process.cwd(), 'uploads');
+    this.storagePath = UPLOADS_DIR;
     this.ensureStorageDirectory();
   }
 
@@ -50,28 +75,49 @@ export class ObjectStorageService {
     return { valid: true, resolvedPath: requestedPath };
   }
 
-  async uploadLargeFile(fileBuffer: Buffer, filename: string, _mimetype?: string) {
-    try {
-      // Parse the filename to extract category/directory structure
-      // The filename is expected to include the directory path (e.g., 'inspections/timestamp-file.jpg')
-      const parsedPath = path.parse(filename);
-      const categoryPath = parsedPath.dir || 'general';
+  /**
+   * Work out where an object named like 'inspections/timestamp-file.jpg' is stored
+   */
+  private async resolveTarget(filename: string) {
+    // Parse the filename to extract category/directory structure
+    // The filename is expected to include the directory path (e.g., 'inspections/timestamp-file.jpg')
+    const parsedPath = path.parse(filename);
+    const categoryPath = parsedPath.dir || 'general';
+
+    // Sanitize the category path to prevent traversal
+    const safeCategoryPath = categoryPath.split(path.sep)
+      .map(segment => segment.replace(/[^a-zA-Z0-9_-]/g, '-'))
+      .join(path.sep);
+
+    // Ensure category directory exists
+    const categoryDir = path.join(this.storagePath, safeCategoryPath);
+    await fs.mkdir(categoryDir, { recursive: true });
 
-      // Sanitize the category path to prevent traversal
-      const safeCategoryPath = categoryPath.split(path.sep)
-        .map(segment => segment.replace(/[^a-zA-Z0-9_-]/g, '-'))
-        .join(path.sep);
+    // Use the provided filename or generate a unique one
+    const finalFilename = parsedPath.base || `${Date.now()}-${Math.random().toString(36).substring(2, 15)}${parsedPath.ext || '.bin'}`;
 
-      // Ensure category directory exists
-      const categoryDir = path.join(this.storagePath, safeCategoryPath);
-      await fs.mkdir(categoryDir, { recursive: true });
+    return {
+      safeCategoryPath,
+      finalFilename,
+      filePath: path.join(categoryDir, finalFilename)
+    };
+  }
 
-      // Use the provided filename or generate a unique one
-      const finalFilename = parsedPath.base || `${Date.now()}-${Math.random().toString(36).substring(2, 15)}${parsedPath.ext || '.bin'}`;
-      const filePath = path.join(categoryDir, finalFilename);
+  async uploadLargeFile(fileBuffer: Buffer, filename: string, _mimetype?: string) {
+    try {
+      const { safeCategoryPath, finalFilename, filePath } = await this.resolveTarget(filename);
 
-      // Write file
-      await fs.writeFile(filePath, fileBuffer);
+      // Write to a temp file and rename it into place: /objects serves any
+      // file it finds as complete and immutable, so it must never see a partial one
+      await fs.mkdir(UPLOAD_TEMP_DIR, { recursive: true });
+      const tempPath = path.join(UPLOAD_TEMP_DIR, `${Date.now()}-${randomBytes(8).toString('hex')}.part`);
+      try {
+        await fs.writeFile(tempPath, fileBuffer);
+        await fs.rename(tempPath, filePath);
+      } catch (error) {
+        await fs.unlink(tempPath).catch(() => undefined);
+        throw error;
+      }
 
       // Generate public URL
       const publicUrl = `/uploads/${safeCategoryPath}/${finalFilename}`;
@@ -95,38 +141,97 @@ export class ObjectStorageService {
     }
   }
 
-  async getObjectFile(filename: string) {
+  /**
+   * Move a streamed upload (see utils/streamingUpload) to its content-addressed
+   * name. If the content is already stored the temp file is dropped instead,
+   * so a retried upload costs no extra write.
+   */
+  async storeContentAddressed(tempPath: string, casPath: string) {
     try {
-      // Validate file path to prevent path traversal
-      const validation = this.validateFilePath(filename);
-      if (!validation.valid) {
-        return {
-          success: false,
-          error: validation.error || 'Invalid file path'
-        };
+      const filePath = path.join(this.storagePath, casPath);
+      let deduplicated = false;
+
+      try {
+        await fs.access(filePath);
+        deduplicated = true;
+        await fs.unlink(tempPath).catch(() => undefined);
+      } catch {
+        await fs.mkdir(path.dirname(filePath), { recursive: true });
+        await fs.rename(tempPath, filePath);
       }
 
-      const fileBuffer = await fs.readFile(validation.resolvedPath!);
+      logger.info(`Blob stored: ${casPath}`, { deduplicated });
+
+      return {
+        success: true,
+        filename: casPath,
+        filePath,
+        deduplicated
+      };
+    } catch (error) {
+      logger.error('Error storing content-addressed blob:', error);
+      return {
+        success: false,
+        error: error instanceof Error ? error.message : 'Unknown error'
+      };
+    }
+  }
 
-      // Detect content type from filename
-      const contentType = mime.lookup(filename) || 'application/octet-stream';
+  /**
+   * Remove a content-addressed blob and any derivatives generated from it
+   * (files named <sha256>__<variant>.<ext> in the same directory)
+   */
+  async deleteContentAddressed(casPath: string) {
+    const sha256 = parseContentAddressedPath(casPath);
+    if (!sha256) {
+      return { success: false, error: 'Not a content-addressed path' };
+    }
 
-      // Generate ETag from file content
-      const hash = createHash('md5').update(fileBuffer).digest('hex');
+    const directory = path.join(this.storagePath, path.dirname(casPath));
+    try {
+      const entries = await fs.readdir(directory).catch(() => [] as string[]);
+      const related = entries.filter(entry => entry === path.basename(casPath) || entry.startsWith(`${sha256}__`));
+      await Promise.all(related.map(entry => fs.unlink(path.join(directory, entry)).catch(() => undefined)));
 
-      logger.info(`File retrieved: ${filename}`);
+      logger.info(`Blob deleted: ${casPath}`, { files: related.length });
+      return { success: true };
+    } catch (error) {
+      logger.error('Error deleting content-addressed blob:', error);
+      return {
+        success: false,
+        error: error instanceof Error ? error.message : 'Unknown error'
+      };
+    }
+  }
+
+  /**
+   * Resolve an object and read its metadata without reading the file,
+   * so callers can stream it from disk
+   */
+  async statObject(filename: string): Promise<
+    | { success: true; filePath: string; size: number; lastModified: Date; contentType: string }
+    | { success: false; error: string }
+  > {
+    // Validate file path to prevent path traversal
+    const validation = this.validateFilePath(filename);
+    if (!validation.valid) {
+      return { success: false, error: validation.error || 'Invalid file path' };
+    }
+
+    try {
+      const stats = await fs.stat(validation.resolvedPath!);
+      if (!stats.isFile()) {
+        return { success: false, error: 'File not found' };
+      }
 
       return {
         success: true,
-        buffer: fileBuffer,
-        filename,
-        httpMetadata: {
-          contentType
-        },
-        httpEtag: hash
+        filePath: validation.resolvedPath!,
+        size: stats.size,
+        lastModified: stats.mtime,
+        contentType: mime.lookup(filename) || 'application/octet-stream'
       };
     } catch (error) {
-      logger.error('Error retrieving file:', error);
       return {
         success: false,
         error: error instanceof Error ? error.message : 'File not found'
@@ -166,11 +271,11 @@ export class ObjectStorageService {
 
   /**
    * Delete a file from storage
-   * NOTE: Caller should verify file is not referenced in database before calling this method
+   * NOTE: Uploaded blobs are reference counted (see storage.releaseObjectUrls) and
+   * removed when no longer referenced; only call this for files outside that scheme
    * @param filename - Path to the file relative to storage directory
-   * @param skipReferenceCheck - If true, skip checking if file is still referenced (use with caution)
    */
-  async deleteFile(filename: string, skipReferenceCheck = false) {
+  async deleteFile(filename: string) {
     try {
       // Validate file path to prevent path traversal
       const validation = this.validateFilePath(filename);
@@ -181,14 +286,9 @@ export class ObjectStorageService {
         };
       }
 
-      // Log warning if reference check is skipped
-      if (skipReferenceCheck) {
-        logger.warn('File deletion without reference check', { filename });
-      }
-
       await fs.unlink(validation.resolvedPath!);
 
-      logger.info(`File deleted: ${filename}`, { skipReferenceCheck });
+      logger.info(`File deleted: ${filename}`);
 
       return {
         success: true
@@ -202,3 +302,15 @@ export class ObjectStorageService {
     }
   }
 }
+
+tracer.traceMethods(ObjectStorageService.prototype, 'objectStorage', [
+  'uploadLargeFile',
+  'storeContentAddressed',
+  'deleteContentAddressed',
+  'statObject',
+  'downloadObject',
+  'deleteFile',
+]);
+
+// Shared instance; the constructor creates the storage directory
+export const objectStorageService = new ObjectStorageService();
@@ -1,6 +1,7 @@
 import { Request, Response, NextFunction } from 'express';
 import { logger } from './logger';
 import { metricsCollector } from './monitoring';
+import { clusterState } from './clusterState';
 
 interface ErrorContext {
   requestId?: string;
@@ -289,19 +290,34 @@ export const gracefulDegradation = (
   next();
 };
 
-// Circuit breaker pattern for performance protection
+type CircuitState = 'CLOSED' | 'OPEN' | 'HALF_OPEN';
+
+interface CircuitTransition {
+  name: string;
+  state: CircuitState;
+  failures: number;
+  lastFailureTime: number;
+}
+
+const circuitBreakers = new Map<string, CircuitBreaker>();
+
+// Circuit breaker pattern for performance protection. Opening and closing
+// are shared with the other cluster workers so they shed load together.
 class CircuitBreaker {
   private failures = 0;
   private lastFailureTime = 0;
-  private state: 'CLOSED' | 'OPEN' | 'HALF_OPEN' = 'CLOSED';
+  private state: CircuitState = 'CLOSED';
+  private readonly name: string;
   private readonly threshold: number;
   private readonly timeout: number;
   private readonly resetTimeout: number;
 
-  constructor(threshold: number = 5, timeout: number = 60000, resetTimeout: number = 30000) {
+  constructor(name: string, threshold: number = 5, timeout: number = 60000, resetTimeout: number = 30000) {
+    this.name = name;
     this.threshold = threshold;
     this.timeout = timeout;
     this.resetTimeout = resetTimeout;
+    circuitBreakers.set(name, this);
   }
 
   async execute<T>(operation: () => Promise<T>, context?: string): Promise<T> {
@@ -339,6 +355,7 @@ class CircuitBreaker {
     this.lastFailureTime = Date.now();
 
     if (this.failures >= this.threshold) {
+      if (this.state !== 'OPEN') this.publish('OPEN');
       this.state = 'OPEN';
       logger.warn('Circuit breaker opened', {
         failures: this.failures,
@@ -351,6 +368,25 @@ class CircuitBreaker {
   private reset(): void {
     this.failures = 0;
     this.state = 'CLOSED';
+    this.publish('CLOSED');
+  }
+
+  private publish(state: CircuitState): void {
+    clusterState.publish('circuit-breaker', {
+      name: this.name,
+      state,
+      failures: this.failures,
+      lastFailureTime: this.lastFailureTime,
+    } satisfies CircuitTransition);
+  }
+
+  /**
+   * Apply a transition made by another cluster worker
+   */
+  applyTransition(transition: CircuitTransition): void {
+    this.state = transition.state;
+    this.failures = transition.failures;
+    this.lastFailureTime = transition.lastFailureTime;
   }
 
   getState(): string {
@@ -363,9 +399,13 @@ class CircuitBreaker {
 }
 
 // Create circuit breakers for different operations
-export const databaseCircuitBreaker = new CircuitBreaker(5, 60000, 30000);
-export const cacheCircuitBreaker = new CircuitBreaker(10, 30000, 10000);
-export const fileUploadCircuitBreaker = new CircuitBreaker(3, 120000, 60000);
+export const databaseCircuitBreaker = new CircuitBreaker('database', 5, 60000, 30000);
+export const cacheCircuitBreaker = new CircuitBreaker('cache', 10, 30000, 10000);
+export const fileUploadCircuitBreaker = new CircuitBreaker('fileUpload', 3, 120000, 60000);
+
+clusterState.subscribe('circuit-breaker', (transition: CircuitTransition) => {
+  circuitBreakers.get(transition.name)?.applyTransition(transition);
+});
 
 // Circuit breaker middleware
 export const circuitBreakerMiddleware = (
@@ -0,0 +1,370 @@
+import { AsyncLocalStorage } from 'async_hooks';
+import { createHash } from 'crypto';
+import type pg from 'pg';
+import { logger } from './logger';
+import { LogHistogram, type HistogramSnapshot } from './utils/histogram';
+import { tracer } from './tracing';
+
+/**
+ * Query-level profiler for the pg Pool
+ *
+ * Every pooled client's query() is wrapped, so drizzle queries, raw
+ * db.execute() analytics and transactions are all seen. SQL is normalized
+ * (literals and $n parameters replaced, IN lists collapsed) and fingerprinted;
+ * each fingerprint keeps call, row and error counts plus a latency histogram.
+ * Queries slower than QUERY_SLOW_MS go to a bounded slow-query log, and for
+ * outliers an EXPLAIN (ANALYZE, BUFFERS) plan is captured on a separate
+ * connection, inside a read-only transaction that is rolled back, at most
+ * once per fingerprint per QUERY_PLAN_INTERVAL_MS.
+ */
+
+const QUERY_PROFILER_ENABLED = process.env.QUERY_PROFILER_ENABLED !== 'false';
+const QUERY_SLOW_MS = parseInt(process.env.QUERY_SLOW_MS || '500', 10);
+const QUERY_EXPLAIN_ENABLED = process.env.QUERY_EXPLAIN_ENABLED !== 'false';
+const QUERY_PLAN_INTERVAL_MS = parseInt(process.env.QUERY_PLAN_INTERVAL_MS || String(10 * 60 * 1000), 10);
+const EXPLAIN_TIMEOUT_MS = 10000;
+const MAX_FINGERPRINTS = 500;
+const SLOW_LOG_SIZE = 200;
+const PLAN_BUFFER_SIZE = 50;
+const MAX_SQL_LENGTH = 2000;
+
+// Marks clients whose queries are not profiled (the EXPLAIN connection)
+const SKIP_PROFILING = Symbol('skipProfiling');
+const INSTRUMENTED = Symbol('queryProfilerInstrumented');
+
+interface FingerprintStats {
+  fingerprint: string;
+  sql: string;
+  operations: Set<string>;
+  calls: number;
+  errors: number;
+  rows: number;
+  durationMs: LogHistogram;
+  lastSeen: number;
+  lastPlanAt: number;
+}
+
+export interface SlowQueryEntry {
+  fingerprint: string;
+  operation?: string;
+  sql: string;
+  durationMs: number;
+  rows: number | null;
+  error?: string;
+  at: string;
+}
+
+export interface CapturedPlan {
+  fingerprint: string;
+  operation?: string;
+  sql: string;
+  durationMs: number;
+  capturedAt: string;
+  analyzed: boolean;
+  planningTimeMs?: number;
+  executionTimeMs?: number;
+  // Tables read by sequential scan, the usual sign of a missing index
+  seqScans: string[];
+  indexes: string[];
+  plan: unknown;
+}
+
+const operationContext = new AsyncLocalStorage<string>();
+
+/**
+ * Replace literals and parameters so queries differing only in values share a fingerprint
+ */
+export function normalizeSql(sql: string): string {
+  return sql
+    .replace(/--[^\n]*/g, ' ')
+    .replace(/\/\*[\s\S]*?\*\//g, ' ')
+    .replace(/'(?:[^']|'')*'/g, '?')
+    .replace(/\$\d+/g, '?')
+    .replace(/\b\d+(?:\.\d+)?\b/g, '?')
+    .replace(/\s+/g, ' ')
+    .replace(/\(\s*\?(?:\s*,\s*\?)+\s*\)/g, '(?, ...)')
+    .trim();
+}
+
+function fingerprintOf(normalized: string): string {
+  return createHash('sha1').update(normalized).digest('hex').slice(0, 12);
+}
+
+/**
+ * Relations and indexes referenced by an EXPLAIN (FORMAT JSON) plan tree
+ */
+function summarizePlan(node: any, seqScans: Set<string>, indexes: Set<string>): void {
+  if (!node || typeof node !== 'object') return;
+  if (node['Node Type'] === 'Seq Scan' && node['Relation Name']) {
+    seqScans.add(node['Relation Name']);
+  }
+  if (node['Index Name']) {
+    indexes.add(node['Index Name']);
+  }
+  for (const child of node.Plans || []) {
+    summarizePlan(child, seqScans, indexes);
+  }
+}
+
+class QueryProfiler {
+  private stats = new Map<string, FingerprintStats>();
+  private slowLog: SlowQueryEntry[] = [];
+  private plans: CapturedPlan[] = [];
+  private pool: pg.Pool | null = null;
+  private explaining = false;
+  private startedAt = Date.now();
+  private totals = { queries: 0, errors: 0, slow: 0, plansCaptured: 0, droppedFingerprints: 0 };
+
+  /**
+   * Wrap query() on every client the pool creates
+   */
+  instrument(pool: pg.Pool): void {
+    if (!QUERY_PROFILER_ENABLED || this.pool) return;
+    this.pool = pool;
+    pool.on('connect', (client) => this.instrumentClient(client));
+    logger.info('Query profiler enabled', { slowMs: QUERY_SLOW_MS, explain: QUERY_EXPLAIN_ENABLED });
+  }
+
+  /**
+   * Attribute queries issued inside fn to a storage operation name
+   */
+  withOperation<T>(operation: string, fn: () => Promise<T>): Promise<T> {
+    return operationContext.run(operation, fn);
+  }
+
+  /**
+   * Fingerprints ordered by total time, with the slow-query log and captured plans
+   */
+  getReport(limit: number = 50) {
+    const fingerprints = Array.from(this.stats.values())
+      .map((entry) => {
+        const latency: HistogramSnapshot = entry.durationMs.snapshot();
+        return {
+          fingerprint: entry.fingerprint,
+          sql: entry.sql,
+          operations: Array.from(entry.operations),
+          calls: entry.calls,
+          errors: entry.errors,
+          rows: entry.rows,
+          avgRows: entry.calls > 0 ? Math.round(entry.rows / entry.calls) : 0,
+          totalMs: latency.sum,
+          latency,
+          lastSeen: new Date(entry.lastSeen).toISOString(),
+        };
+      })
+      .sort((a, b) => b.totalMs - a.totalMs)
+      .slice(0, limit);
+
+    return {
+      enabled: QUERY_PROFILER_ENABLED,
+      since: new Date(this.startedAt).toISOString(),
+      slowThresholdMs: QUERY_SLOW_MS,
+      totals: { ...this.totals, fingerprints: this.stats.size },
+      fingerprints,
+      slowQueries: this.slowLog.slice().reverse(),
+      plans: this.plans.slice().reverse(),
+    };
+  }
+
+  reset(): void {
+    this.stats.clear();
+    this.slowLog = [];
+    this.plans = [];
+    this.startedAt = Date.now();
+    this.totals = { queries: 0, errors: 0, slow: 0, plansCaptured: 0, droppedFingerprints: 0 };
+  }
+
+  private instrumentClient(client: pg.PoolClient): void {
+    const target = client as any;
+    if (target[INSTRUMENTED]) return;
+    target[INSTRUMENTED] = true;
+
+    const originalQuery = target.query.bind(client);
+    const profiler = this;
+
+    target.query = function profiledQuery(...args: any[]) {
+      const first = args[0];
+      // Submittables (cursors, streams) and the EXPLAIN connection pass through
+      if (target[SKIP_PROFILING] || (first && typeof first.submit === 'function')) {
+        return originalQuery(...args);
+      }
+
+      const text: string | undefined = typeof first === 'string' ? first : first?.text;
+      if (!text) return originalQuery(...args);
+      const values: unknown[] | undefined = Array.isArray(args[1]) ? args[1] : first?.values;
+      const operation = operationContext.getStore();
+      const span = tracer.startSpan('pg.query', { 'db.system': 'postgresql', 'db.operation': operation }, 'client');
+      span?.setAttribute('db.statement', normalizeSql(text).slice(0, 500));
+      const start = process.hrtime.bigint();
+      const finish = (error: Error | null, result?: pg.QueryResult) => {
+        const durationMs = Number(process.hrtime.bigint() - start) / 1e6;
+        span?.setAttribute('db.rows', result?.rowCount ?? undefined);
+        span?.end(error);
+        profiler.record(text, values, operation, durationMs, result, error);
+      };
+
+      // pg-pool calls client.query with a callback; drizzle uses the promise form
+      const callbackIndex = args.findIndex(arg => typeof arg === 'function');
+      if (callbackIndex !== -1) {
+        const callback = args[callbackIndex];
+        args[callbackIndex] = (error: Error | null, result: pg.QueryResult) => {
+          finish(error, result);
+          callback(error, result);
+        };
+        return originalQuery(...args);
+      }
+
+      return originalQuery(...args).then(
+        (result: pg.QueryResult) => {
+          finish(null, result);
+          return result;
+        },
+        (error: Error) => {
+          finish(error);
+          throw error;
+        },
+      );
+    };
+  }
+
+  private record(
+    text: string,
+    values: unknown[] | undefined,
+    operation: string | undefined,
+    durationMs: number,
+    result: pg.QueryResult | undefined,
+    error: Error | null,
+  ): void {
+    try {
+      this.totals.queries++;
+      const normalized = normalizeSql(text);
+      const fingerprint = fingerprintOf(normalized);
+
+      let entry = this.stats.get(fingerprint);
+      if (!entry) {
+        if (this.stats.size >= MAX_FINGERPRINTS) {
+          this.totals.droppedFingerprints++;
+          return;
+        }
+        entry = {
+          fingerprint,
+          sql: normalized.slice(0, MAX_SQL_LENGTH),
+          operations: new Set(),
+          calls: 0,
+          errors: 0,
+          rows: 0,
+          durationMs: new LogHistogram(),
+          lastSeen: 0,
+          lastPlanAt: 0,
+        };
+        this.stats.set(fingerprint, entry);
+      }
+
+      const rows = result ? (result.rowCount ?? result.rows?.length ?? 0) : null;
+      entry.calls++;
+      entry.rows += rows ?? 0;
+      entry.lastSeen = Date.now();
+      entry.durationMs.record(durationMs);
+      if (operation && entry.operations.size < 10) entry.operations.add(operation);
+      if (error) {
+        entry.errors++;
+        this.totals.errors++;
+      }
+
+      if (durationMs < QUERY_SLOW_MS) return;
+
+      this.totals.slow++;
+      this.slowLog.push({
+        fingerprint,
+        operation,
+        sql: entry.sql,
+        durationMs: Math.round(durationMs),
+        rows,
+        error: error?.message,
+        at: new Date().toISOString(),
+      });
+      if (this.slowLog.length > SLOW_LOG_SIZE) this.slowLog.shift();
+
+      logger.warn('Slow SQL query', {
+        fingerprint,
+        operation,
+        durationMs: Math.round(durationMs),
+        rows,
+        sql: entry.sql.slice(0, 300),
+      });
+
+      if (!error && QUERY_EXPLAIN_ENABLED && Date.now() - entry.lastPlanAt >= QUERY_PLAN_INTERVAL_MS) {
+        entry.lastPlanAt = Date.now();
+        this.capturePlan(entry, text, values, operation, durationMs).catch((planError) => {
+          logger.warn('Query plan capture failed', {
+            fingerprint,
+            error: planError instanceof Error ? planError.message : 'Unknown error',
+          });
+        });
+      }
+    } catch (recordError) {
+      // Profiling must never break the query path
+      logger.debug('Query profiler failed to record', {
+        error: recordError instanceof Error ? recordError.message : 'Unknown error',
+      });
+    }
+  }
+
+  /**
+   * EXPLAIN one outlier at a time; ANALYZE only for plain reads since it executes the statement
+   */
+  private async capturePlan(
+    entry: FingerprintStats,
+    text: string,
+    values: unknown[] | undefined,
+    operation: string | undefined,
+    durationMs: number,
+  ): Promise<void> {
+    // Never take a connection from requests already waiting for one
+    if (!this.pool || this.explaining || this.pool.waitingCount > 0) return;
+    const trimmed = text.trim();
+    if (!/^(select|with|insert|update|delete)\b/i.test(trimmed)) return;
+
+    const analyze = /^select\b/i.test(trimmed) && !/\bfor\s+(update|share|no key update|key share)\b/i.test(trimmed);
+    this.explaining = true;
+    try {
+      const client = await this.pool.connect();
+      (client as any)[SKIP_PROFILING] = true;
+      try {
+        await client.query('BEGIN READ ONLY');
+        await client.query(`SET LOCAL statement_timeout = ${EXPLAIN_TIMEOUT_MS}`);
+        const options = analyze ? 'ANALYZE, BUFFERS, FORMAT JSON' : 'FORMAT JSON';
+        const result = await client.query(`EXPLAIN (${options}) ${trimmed}`, values as any[]);
+        const [explained] = result.rows[0]['QUERY PLAN'];
+
+        const seqScans = new Set<string>();
+        const indexes = new Set<string>();
+        summarizePlan(explained.Plan, seqScans, indexes);
+
+        this.totals.plansCaptured++;
+        this.plans.push({
+          fingerprint: entry.fingerprint,
+          operation,
+          sql: entry.sql,
+          durationMs: Math.round(durationMs),
+          capturedAt: new Date().toISOString(),
+          analyzed: analyze,
+          planningTimeMs: explained['Planning Time'],
+          executionTimeMs: explained['Execution Time'],
+          seqScans: Array.from(seqScans),
+          indexes: Array.from(indexes),
+          plan: explained.Plan,
+        });
+        if (this.plans.length > PLAN_BUFFER_SIZE) this.plans.shift();
+      } finally {
+        await client.query('ROLLBACK').catch(() => undefined);
+        (client as any)[SKIP_PROFILING] = false;
+        client.release();
+      }
+    } finally {
+      this.explaining = false;
+    }
+  }
+}
+
+export const queryProfiler = new QueryProfiler();
@@ -11,27 +11,36 @@ import {
   insertRoomInspectionSchema,
   insertMonthlyFeedbackSchema,
 } from "../shared/schema";
-import { PasswordManager, SessionManager, photoUploadRateLimit } from "./security";
+import { PasswordManager, SessionManager, CacheManager, photoUploadRateLimit } from "./security";
+import { cacheAnalytics } from "./cacheAnalytics";
+import { apiCache } from "./cache";
 import { z } from "zod";
 import multer from "multer";
 import { logger } from "./logger";
 import { doclingService } from "./doclingService";
 
-import { ObjectStorageService } from "./objectStorage";
+import { objectStorageService, CAS_PREFIX } from "./objectStorage";
 import {
   calculateBuildingScore,
   calculateSchoolScores,
   getComplianceStatus,
 } from "./utils/scoring";
 import { sanitizeFilePath, isValidFilename } from "./utils/pathValidation";
-import { generateThumbnail } from "./services/thumbnail";
+import { storeUploads, storeUploadLimited } from "./utils/fileUpload";
+import { syncQueueWorker } from "./services/syncQueueWorker";
+import { objectGarbageCollector } from "./services/objectGarbageCollector";
+import { queryProfiler } from "./queryProfiler";
+import { clusterState } from "./clusterState";
+import { imagePool, isImageVariant, getVariantFilename, selectVariantFormat } from "./services/imagePool";
+import { diskStreamingStorage } from "./utils/streamingUpload";
 import { sendAlertIfNeeded } from "./notificationService.js";
 
-const objectStorageService = new ObjectStorageService();
 
 // Configure multer for file uploads (5MB limit to match client-side)
+// Files are streamed to uploads/.tmp and type-checked by magic number, never buffered whole.
+// Any image type is accepted, as the fileFilter below always has (e.g. HEIC from phones).
 const upload = multer({
-  storage: multer.memoryStorage(),
+  storage: diskStreamingStorage({ allowedTypes: ["image/*"] }),
   limits: {
     fileSize: 5 * 1024 * 1024, // 5MB limit
     files: 5, // Maximum 5 files
@@ -72,6 +81,9 @@ export async function registerRoutes(app: Express): Promise<void> {
       files: req.files ? req.files.length : 0,
     });
 
+    // Blob references taken for stored uploads, given back unless the inspection is saved
+    let unownedUrls: string[] = [];
+
     try {
       const { inspectorName, school, inspectionType } = req.body;
       const files = req.files as Express.Multer.File[];
@@ -96,34 +108,9 @@ export async function registerRoutes(app: Express): Promise<void> {
           count: files.length,
         });
 
-        for (const file of files) {
-          try {
-            const filename = `inspections/${Date.now()}-${Math.round(Math.random() * 1e9)}-${file.originalname}`;
-            const uploadResult = await objectStorageService.uploadLargeFile(
-              file.buffer,
-              filename,
-              file.mimetype,
-            );
-
-            if (uploadResult.success) {
-              imageUrls.push(`/objects/${filename}`);
-              logger.info("[POST] File uploaded to object storage", {
-                filename,
-                url: `/objects/${filename}`,
-              });
-            } else {
-              logger.error("[POST] Failed to upload file to object storage", {
-                filename,
-                error: uploadResult.error,
-              });
-            }
-          } catch (uploadError) {
-            logger.error(
-              "[POST] Error uploading file to object storage:",
-              uploadError,
-            );
-          }
-        }
+        // Stored in parallel; a re-sent image reuses the existing blob
+        imageUrls = await storeUploads(files, "[POST]");
+        unownedUrls = imageUrls;
       }
 
       // Helper function to parse numeric values properly (0 is valid, not null)
@@ -164,6 +151,7 @@ export async function registerRoutes(app: Express): Promise<void> {
       try {
         const validatedData = insertInspectionSchema.parse(inspectionData);
         const newInspection = await storage.createInspection(validatedData);
+        unownedUrls = [];
 
         logger.info("[POST] Building inspection created successfully", {
           id: newInspection.id,
@@ -179,6 +167,7 @@ export async function registerRoutes(app: Express): Promise<void> {
           logger.warn("[POST] Validation failed", {
             errors: validationError.errors,
           });
+          await storage.releaseObjectUrls(unownedUrls);
           return res.status(400).json({
             message: "Invalid inspection data",
             details: validationError.errors,
@@ -188,6 +177,7 @@ export async function registerRoutes(app: Express): Promise<void> {
       }
     } catch (error) {
       logger.error("[POST] Error creating building inspection:", error);
+      await storage.releaseObjectUrls(unownedUrls);
       res.status(500).json({ message: "Internal server error" });
     }
   });
@@ -518,7 +508,6 @@ export async function registerRoutes(app: Express): Promise<void> {
   // Custodial Notes routes - now supports file uploads
   app.post("/api/custodial-notes", upload.array("images"), async (req, res) => {
     logger.info("[POST] Custodial Notes submission started", {
-      headers: req.headers,
       contentType: req.headers["content-type"],
       files: req.files ? req.files.length : 0,
     });
@@ -540,6 +529,9 @@ export async function registerRoutes(app: Express): Promise<void> {
       });
     }
 
+    // Blob references taken for stored uploads, given back unless the note is saved
+    let unownedUrls: string[] = [];
+
     try {
       const {
         inspectorName,
@@ -595,34 +587,9 @@ export async function registerRoutes(app: Express): Promise<void> {
           count: files.length,
         });
 
-        for (const file of files) {
-          try {
-            const filename = `custodial-notes/${Date.now()}-${Math.round(Math.random() * 1e9)}-${file.originalname}`;
-            const uploadResult = await objectStorageService.uploadLargeFile(
-              file.buffer,
-              filename,
-              file.mimetype,
-            );
-
-            if (uploadResult.success) {
-              imageUrls.push(`/objects/${filename}`);
-              logger.info("[POST] File uploaded to object storage", {
-                filename,
-                url: `/objects/${filename}`,
-              });
-            } else {
-              logger.error("[POST] Failed to upload file to object storage", {
-                filename,
-                error: uploadResult.error,
-              });
-            }
-          } catch (uploadError) {
-            logger.error(
-              "[POST] Error uploading file to object storage:",
-              uploadError,
-            );
-          }
-        }
+        // Stored in parallel; a re-sent image reuses the existing blob
+        imageUrls = await storeUploads(files, "[POST]");
+        unownedUrls = imageUrls;
       }
 
       const custodialNote = {
@@ -644,6 +611,7 @@ export async function registerRoutes(app: Express): Promise<void> {
 
       const custodialNoteResult =
         await storage.createCustodialNote(validatedData);
+      unownedUrls = [];
 
       logger.info("[POST] Custodial note created successfully", {
         id: custodialNoteResult.id,
@@ -657,6 +625,7 @@ export async function registerRoutes(app: Express): Promise<void> {
       });
     } catch (error) {
       logger.error("[POST] Error creating custodial note:", error);
+      await storage.releaseObjectUrls(unownedUrls);
 
       // Handle multer/busboy specific errors
       if (error && error.code === "LIMIT_FILE_SIZE") {
@@ -959,14 +928,11 @@ export async function registerRoutes(app: Express): Promise<void> {
       });
 
       try {
-        logger.info(
-          `[${requestId}] Raw building inspection request:`,
-          JSON.stringify(req.body, null, 2),
-        );
-        logger.info(
-          `[${requestId}] Headers:`,
-          JSON.stringify(req.headers, null, 2),
-        );
+        // Built only when debug logging is on
+        logger.debug(`[${requestId}] Raw building inspection request`, () => ({
+          body: req.body,
+          contentType: req.headers["content-type"],
+        }));
 
         // Ensure we have a body
         if (!req.body) {
@@ -1195,6 +1161,9 @@ export async function registerRoutes(app: Express): Promise<void> {
         files: req.files ? req.files.length : 0,
       });
 
+      // Blob references taken for stored uploads; the saved room holds its own
+      let unownedUrls: string[] = [];
+
       try {
         const inspectionId = parseInt(req.params.id);
         const roomId = parseInt(req.params.roomId);
@@ -1224,34 +1193,9 @@ export async function registerRoutes(app: Express): Promise<void> {
             count: files.length,
           });
 
-          for (const file of files) {
-            try {
-              const filename = `room-inspections/${Date.now()}-${Math.round(Math.random() * 1e9)}-${file.originalname}`;
-              const uploadResult = await objectStorageService.uploadLargeFile(
-                file.buffer,
-                filename,
-                file.mimetype,
-              );
-
-              if (uploadResult.success) {
-                imageUrls.push(`/objects/${filename}`);
-                logger.info("[POST] File uploaded to object storage", {
-                  filename,
-                  url: `/objects/${filename}`,
-                });
-              } else {
-                logger.error("[POST] Failed to upload file to object storage", {
-                  filename,
-                  error: uploadResult.error,
-                });
-              }
-            } catch (uploadError) {
-              logger.error(
-                "[POST] Error uploading file to object storage:",
-                uploadError,
-              );
-            }
-          }
+          // Stored in parallel; a re-sent image reuses the existing blob
+          imageUrls = await storeUploads(files, "[POST]");
+          unownedUrls = imageUrls;
         }
 
         // Update room with responses and images
@@ -1268,8 +1212,12 @@ export async function registerRoutes(app: Express): Promise<void> {
 
         if (!updatedRoom) {
           logger.error("[POST] Room not found", { inspectionId, roomId });
+          await storage.releaseObjectUrls(unownedUrls);
           return res.status(404).json({ message: "Room not found" });
         }
+        // The room took its own references to its images
+        await storage.releaseObjectUrls(unownedUrls);
+        unownedUrls = [];
 
         logger.info("[POST] Room inspection completed successfully", {
           inspectionId,
@@ -1286,6 +1234,7 @@ export async function registerRoutes(app: Express): Promise<void> {
         });
       } catch (error) {
         logger.error("[POST] Error submitting room inspection:", error);
+        await storage.releaseObjectUrls(unownedUrls);
         res.status(500).json({ message: "Internal server error" });
       }
     },
@@ -1340,36 +1289,65 @@ export async function registerRoutes(app: Express): Promise<void> {
 
       logger.info("[GET] Serving object from storage", { filename, requestedPath });
 
-      const objectFile = await objectStorageService.getObjectFile(filename);
-      if (!objectFile) {
-        logger.warn("[GET] Object not found", { filename });
-        return res.status(404).json({ message: "File not found" });
+      // Right-sized derivatives: ?variant=thumb|preview, format from ?format= or Accept
+      let object = await objectStorageService.statObject(filename);
+      let maxAge = 31536000 * 1000; // 1 year cache
+      // Content-addressed names never change content
+      let immutable = filename.startsWith(`${CAS_PREFIX}/`);
+      const variant = req.query.variant;
+      if (isImageVariant(variant)) {
+        const format = selectVariantFormat(variant, req.query.format, req.get("accept"));
+        res.vary("Accept");
+        const derivative = await objectStorageService.statObject(getVariantFilename(filename, variant, format));
+        if (derivative.success) {
+          object = derivative;
+        } else {
+          // Still being generated: serve the original without pinning it in caches
+          maxAge = 60 * 1000;
+          immutable = false;
+        }
       }
 
-      const downloadResult =
-        await objectStorageService.downloadObject(filename);
-      if (!downloadResult.success || !downloadResult.data) {
-        logger.error("[GET] Failed to download object", {
-          filename,
-          error: downloadResult.error,
-        });
-        return res.status(500).json({ message: "Failed to serve file" });
+      if (!object.success) {
+        logger.warn("[GET] Object not found", { filename, error: object.error });
+        return res.status(404).json({ message: "File not found" });
       }
 
-      // Set appropriate headers
-      res.set({
-        "Content-Type":
-          objectFile.httpMetadata?.contentType || "application/octet-stream",
-        "Content-Length": downloadResult.data.length.toString(),
-        "Cache-Control": "public, max-age=31536000", // 1 year cache
-        ETag: `"${objectFile.httpEtag}"`,
-      });
+      // Stream from disk instead of buffering: sendFile handles Range (206),
+      // If-None-Match / If-Modified-Since (304) and stat-based ETag/Last-Modified
+      res.sendFile(
+        object.filePath,
+        {
+          maxAge,
+          immutable,
+          acceptRanges: true,
+          etag: true,
+          lastModified: true,
+          headers: { "Content-Type": object.contentType },
+        },
+        (error?: any) => {
+          if (!error) {
+            logger.debug("[GET] Object served successfully", {
+              filename,
+              size: object.size,
+              status: res.statusCode,
+            });
+            return;
+          }
 
-      res.send(downloadResult.data);
-      logger.info("[GET] Object served successfully", {
-        filename,
-        size: downloadResult.data.length,
-      });
+          // Client aborts surface here too; only answer if nothing was sent yet
+          if (!res.headersSent) {
+            const status = error.status === 404 ? 404 : error.status === 416 ? 416 : 500;
+            res.status(status).json({
+              message: status === 404 ? "File not found" : status === 416 ? "Range not satisfiable" : "Failed to serve file",
+            });
+          }
+          logger.warn("[GET] Object streaming ended with error", {
+            filename,
+            error: error.message,
+          });
+        },
+      );
     } catch (error) {
       logger.error("[GET] Error serving object:", error);
       res.status(500).json({ message: "Internal server error" });
@@ -1517,6 +1495,67 @@ export async function registerRoutes(app: Express): Promise<void> {
     }
   });
 
+  // Cache analytics per key family, for tuning TTLs: bytesInMemory is held now
+  // by this process; bytesWritten is cumulative and also counts Redis writes
+  app.get("/api/admin/cache/stats", validateAdminSession, async (req, res) => {
+    try {
+      const [manager, storageMetrics] = await Promise.all([
+        CacheManager.getStats(),
+        storage.getPerformanceMetrics(),
+      ]);
+
+      res.json({
+        success: true,
+        data: {
+          ...cacheAnalytics.getStats(),
+          manager,
+          responseCache: apiCache.getStats(),
+          storage: storageMetrics,
+          // Per process: in cluster mode this is one worker's view
+          worker: clusterState.workerId,
+        },
+      });
+    } catch (error) {
+      logger.error("Error fetching cache stats", { error });
+      res
+        .status(500)
+        .json({ success: false, message: "Internal server error" });
+    }
+  });
+
+  // Orphaned upload garbage collection (dry run unless dryRun: false)
+  app.get("/api/admin/storage/gc", validateAdminSession, (req, res) => {
+    res.json({ success: true, data: objectGarbageCollector.getStatus() });
+  });
+
+  app.post("/api/admin/storage/gc", validateAdminSession, async (req, res) => {
+    try {
+      const { dryRun, graceHours, maxDeletes } = req.body || {};
+      const stats = await objectGarbageCollector.run({
+        dryRun: dryRun !== false,
+        graceMs: typeof graceHours === "number" && graceHours >= 1 ? graceHours * 60 * 60 * 1000 : undefined,
+        maxDeletes: typeof maxDeletes === "number" && maxDeletes > 0 ? maxDeletes : undefined,
+      });
+      res.json({ success: true, data: stats });
+    } catch (error) {
+      logger.error("Error running object garbage collection", { error });
+      res
+        .status(500)
+        .json({ success: false, message: "Internal server error" });
+    }
+  });
+
+  // Query profiler: per-fingerprint latency, slow-query log and captured plans
+  app.get("/api/admin/queries", validateAdminSession, (req, res) => {
+    const limit = Math.min(Math.max(parseInt(String(req.query.limit || "50"), 10) || 50, 1), 500);
+    res.json({ success: true, data: { ...queryProfiler.getReport(limit), worker: clusterState.workerId } });
+  });
+
+  app.post("/api/admin/queries/reset", validateAdminSession, (req, res) => {
+    queryProfiler.reset();
+    res.json({ success: true, message: "Query profiler statistics reset" });
+  });
+
   app.delete(
     "/api/admin/inspections/:id",
     validateAdminSession,
@@ -1579,7 +1618,7 @@ export async function registerRoutes(app: Express): Promise<void> {
 
   // PDF upload configuration for monthly feedback
   const pdfUpload = multer({
-    storage: multer.memoryStorage(),
+    storage: diskStreamingStorage({ allowedTypes: ["application/pdf"] }),
     limits: {
       fileSize: 10 * 1024 * 1024, // 10MB limit
       files: 1, // Only one PDF at a time
@@ -1607,6 +1646,9 @@ export async function registerRoutes(app: Express): Promise<void> {
         file: req.file ? req.file.originalname : "none",
       });
 
+      // Blob reference taken for the stored PDF, given back unless the feedback is saved
+      let unownedUrls: string[] = [];
+
       try {
         const { school, month, year, notes, uploadedBy } = req.body;
         const file = req.file as Express.Multer.File;
@@ -1631,13 +1673,8 @@ export async function registerRoutes(app: Express): Promise<void> {
           return res.status(400).json({ message: "Invalid year" });
         }
 
-        // Upload PDF to storage
-        const filename = `monthly-feedback/${Date.now()}-${Math.round(Math.random() * 1e9)}-${file.originalname}`;
-        const uploadResult = await objectStorageService.uploadLargeFile(
-          file.buffer,
-          filename,
-          file.mimetype,
-        );
+        // Upload PDF to content-addressed storage
+        const uploadResult = await storeUploadLimited(file);
 
         if (!uploadResult.success) {
           logger.error("[POST] Failed to upload PDF", {
@@ -1646,7 +1683,9 @@ export async function registerRoutes(app: Express): Promise<void> {
           return res.status(500).json({ message: "Failed to upload PDF file" });
         }
 
-        const pdfUrl = `/objects/${filename}`;
+        const filename = uploadResult.filename;
+        const pdfUrl = uploadResult.url;
+        unownedUrls = [pdfUrl];
         logger.info("[POST] PDF uploaded successfully", {
           filename,
           url: pdfUrl,
@@ -1655,8 +1694,8 @@ export async function registerRoutes(app: Express): Promise<void> {
         // Extract text using Docling
         let extractedText: string | null = null;
         try {
-          extractedText = await doclingService.extractTextFromPDF(
-            file.buffer,
+          extractedText = await doclingService.extractTextFromPDFFile(
+            uploadResult.filePath,
             file.originalname,
           );
           if (!extractedText) {
@@ -1688,6 +1727,7 @@ export async function registerRoutes(app: Express): Promise<void> {
         // Validate with Zod
         const validatedData = insertMonthlyFeedbackSchema.parse(feedbackData);
         const newFeedback = await storage.createMonthlyFeedback(validatedData);
+        unownedUrls = [];
 
         logger.info("[POST] Monthly feedback created successfully", {
           id: newFeedback.id,
@@ -1700,6 +1740,7 @@ export async function registerRoutes(app: Express): Promise<void> {
         });
       } catch (error) {
         logger.error("[POST] Error creating monthly feedback:", error);
+        await storage.releaseObjectUrls(unownedUrls);
         if (error instanceof z.ZodError) {
           return res.status(400).json({
             message: "Invalid data",
@@ -2194,6 +2235,9 @@ export async function registerRoutes(app: Express): Promise<void> {
       inspectionId: req.body.inspectionId,
     });
 
+    // Blob reference taken for the stored photo, given back unless the photo row is saved
+    let unownedUrls: string[] = [];
+
     try {
       // Validate required file
       if (!req.file) {
@@ -2313,28 +2357,20 @@ export async function registerRoutes(app: Express): Promise<void> {
         }
       }
 
-      // Generate unique filename
-      const timestamp = Date.now();
-      const randomId = Math.round(Math.random() * 1e9);
-      const filename = `photos/${timestamp}-${randomId}-${req.file.originalname}`;
-
       logger.info("[POST] Uploading photo to object storage", {
-        filename,
         originalName: req.file.originalname,
         size: req.file.size,
         mimetype: req.file.mimetype,
+        sha256: req.file.sha256,
       });
 
-      // Upload to object storage
-      const uploadResult = await objectStorageService.uploadLargeFile(
-        req.file.buffer,
-        filename,
-        req.file.mimetype,
-      );
+      // Upload to content-addressed storage; an offline-sync retry of the
+      // same photo reuses the stored blob and its derivatives
+      const uploadResult = await storeUploadLimited(req.file);
 
       if (!uploadResult.success) {
         logger.error("[POST] Failed to upload photo to object storage", {
-          filename,
+          originalName: req.file.originalname,
           error: uploadResult.error,
         });
         return res.status(500).json({
@@ -2343,40 +2379,27 @@ export async function registerRoutes(app: Express): Promise<void> {
         });
       }
 
-      const photoUrl = `/objects/${filename}`;
+      const filename = uploadResult.filename;
+      const photoUrl = uploadResult.url;
+      unownedUrls = [photoUrl];
 
       // Generate thumbnail
       let thumbnailUrl: string | undefined = undefined;
       try {
         logger.info("[POST] Generating thumbnail", {
           filename,
-          size: req.file.buffer.length,
+          size: uploadResult.size,
         });
 
-        const thumbnailBuffer = await generateThumbnail(req.file.buffer);
-        const thumbnailFilename = `photos/${timestamp}-${randomId}-thumb-${req.file.originalname}`;
-
-        // Upload thumbnail to object storage
-        const thumbnailUploadResult = await objectStorageService.uploadLargeFile(
-          thumbnailBuffer,
+        // Decoded once in the image pool; preview/WebP/AVIF variants follow in the background
+        const thumbnailFilename = await imagePool.processUpload(uploadResult.filePath, filename);
+        thumbnailUrl = `/objects/${thumbnailFilename}`;
+        logger.info("[POST] Thumbnail generated and uploaded", {
           thumbnailFilename,
-          req.file.mimetype,
-        );
-
-        if (thumbnailUploadResult.success) {
-          thumbnailUrl = `/objects/${thumbnailFilename}`;
-          logger.info("[POST] Thumbnail generated and uploaded", {
-            thumbnailFilename,
-            thumbnailUrl,
-            originalSize: req.file.buffer.length,
-            thumbnailSize: thumbnailBuffer.length,
-          });
-        } else {
-          logger.error("[POST] Failed to upload thumbnail", {
-            filename: thumbnailFilename,
-            error: thumbnailUploadResult.error,
-          });
-        }
+          thumbnailUrl,
+          originalSize: req.file.size,
+          storedSize: uploadResult.size,
+        });
       } catch (thumbnailError) {
         logger.error("[POST] Thumbnail generation failed", {
           error: thumbnailError instanceof Error ? thumbnailError.message : 'Unknown error',
@@ -2404,7 +2427,8 @@ export async function registerRoutes(app: Express): Promise<void> {
           ? new Date(metadata.capturedAt)
           : new Date(),
         notes: metadata.notes || null,
-        syncStatus: "synced" as const,
+        // Without a thumbnail the sync queue worker finishes the upload later
+        syncStatus: thumbnailUrl ? ("synced" as const) : ("pending" as const),
         fileSize: metadata.fileSize,
         imageWidth: metadata.width,
         imageHeight: metadata.height,
@@ -2415,6 +2439,18 @@ export async function registerRoutes(app: Express): Promise<void> {
       };
 
       const savedPhoto = await storage.createInspectionPhoto(photoData);
+      unownedUrls = [];
+
+      if (!thumbnailUrl) {
+        await storage.createSyncQueue({
+          type: "photo_upload",
+          photoId: savedPhoto.id,
+          data: JSON.stringify({ reason: "thumbnail" }),
+          retryCount: 0,
+          status: "pending",
+        });
+        syncQueueWorker.wake();
+      }
 
       logger.info("[POST] Photo uploaded and saved successfully", {
         photoId: savedPhoto.id,
@@ -2448,6 +2484,7 @@ export async function registerRoutes(app: Express): Promise<void> {
       });
     } catch (error) {
       logger.error("[POST] Error uploading photo:", error);
+      await storage.releaseObjectUrls(unownedUrls);
       res.status(500).json({
         success: false,
         message: "Internal server error during photo upload",
@@ -2455,8 +2492,8 @@ export async function registerRoutes(app: Express): Promise<void> {
     }
   });
 
-  // Get photos for an inspection
-  app.get("/api/photos/:inspectionId", async (req, res) => {
+  // Get photos for an inspection (numeric only, so /api/photos/sync-status is not shadowed)
+  app.get("/api/photos/:inspectionId(\\d+)", async (req, res) => {
     try {
       const inspectionId = parseInt(req.params.inspectionId, 10);
 
@@ -2543,26 +2580,10 @@ export async function registerRoutes(app: Express): Promise<void> {
         });
       }
 
-      // Delete from database first (so if file deletion fails, we don't have orphaned DB records)
+      // Drops the photo's blob reference; the file and its derivatives are
+      // removed once no other record references the same content
       await storage.deleteInspectionPhoto(photoId);
 
-      // Delete from object storage if it's a valid URL
-      // Note: We use skipReferenceCheck=true because we just deleted the DB record
-      if (photo.photoUrl && photo.photoUrl.startsWith("/objects/")) {
-        const filename = photo.photoUrl.replace("/objects/", "");
-        const deleteResult = await objectStorageService.deleteFile(filename, true);
-
-        if (!deleteResult.success) {
-          logger.warn("[DELETE] Failed to delete photo from object storage", {
-            photoId,
-            filename,
-            error: deleteResult.error,
-            note: "Database record already deleted, file may be orphaned"
-          });
-          // Continue anyway - database record is already gone
-        }
-      }
-
       logger.info("[DELETE] Photo deleted successfully", { photoId });
 
       res.json({
@@ -2581,23 +2602,13 @@ export async function registerRoutes(app: Express): Promise<void> {
   // Get sync status for photos
   app.get("/api/photos/sync-status", async (req, res) => {
     try {
-      // Get all photos with sync status
-      const photos = await storage.getAllInspectionPhotos();
-
-      const syncStats = {
-        total: photos.length,
-        pending: photos.filter((p) => p.syncStatus === "pending").length,
-        synced: photos.filter((p) => p.syncStatus === "synced").length,
-        failed: photos.filter((p) => p.syncStatus === "failed").length,
-        lastSyncTime:
-          photos.length > 0
-            ? Math.max(...photos.map((p) => new Date(p.updatedAt).getTime()))
-            : null,
-      };
+      const { bySchool, byInspection, ...syncStats } = await storage.getPhotoSyncStatus();
 
       res.json({
         success: true,
         stats: syncStats,
+        bySchool,
+        byInspection,
       });
     } catch (error) {
       logger.error("[GET] Error fetching sync status:", error);
@@ -0,0 +1,338 @@
+import { monitorEventLoopDelay, performance, PerformanceObserver, type IntervalHistogram } from 'perf_hooks';
+import v8 from 'v8';
+import { logger } from './logger';
+import { LogHistogram } from './utils/histogram';
+import type { Alert } from './automated-monitoring';
+
+/**
+ * Runtime instrumentation: event-loop delay, GC pauses and V8 heap spaces
+ *
+ * Samples are folded into fixed windows (RUNTIME_WINDOW_MS, default 10s) and
+ * the last RUNTIME_WINDOW_COUNT windows are kept, so a latency spike can be
+ * lined up with the GC pauses or blocking work (sharp, PDF parsing) in the
+ * same window. Alerts are raised through automatedMonitoring's health check.
+ */
+
+const RUNTIME_WINDOW_MS = parseInt(process.env.RUNTIME_WINDOW_MS || '10000', 10);
+const RUNTIME_WINDOW_COUNT = parseInt(process.env.RUNTIME_WINDOW_COUNT || '60', 10);
+// monitorEventLoopDelay sampling resolution
+const EVENT_LOOP_RESOLUTION_MS = 10;
+
+const GC_KINDS: Record<number, string> = {
+  1: 'minor', // scavenge
+  2: 'major', // mark-sweep-compact
+  4: 'incremental',
+  8: 'weakcb',
+};
+
+export interface RuntimeWindow {
+  start: string;
+  durationMs: number;
+  eventLoop: {
+    p50Ms: number;
+    p99Ms: number;
+    maxMs: number;
+    meanMs: number;
+    utilization: number;
+  };
+  gc: {
+    count: number;
+    totalPauseMs: number;
+    maxPauseMs: number;
+    byKind: Record<string, { count: number; totalPauseMs: number }>;
+  };
+  heap: {
+    usedBytes: number;
+    totalBytes: number;
+    limitBytes: number;
+    spaces: Record<string, { usedBytes: number; sizeBytes: number }>;
+  };
+}
+
+const round = (n: number) => Math.round(n * 100) / 100;
+const nsToMs = (ns: number) => (Number.isFinite(ns) ? ns / 1e6 : 0);
+
+class RuntimeMonitor {
+  private eventLoopDelay: IntervalHistogram | null = null;
+  private gcObserver: PerformanceObserver | null = null;
+  private timer: NodeJS.Timeout | null = null;
+  private windows: RuntimeWindow[] = [];
+  private windowStart = Date.now();
+  private lastUtilization = performance.eventLoopUtilization();
+  private windowGc = this.emptyGcWindow();
+
+  // Cumulative since start, for Prometheus counters
+  private gcPauses = new LogHistogram(0.01, 60 * 1000);
+  private gcTotals: Record<string, { count: number; totalPauseMs: number }> = {};
+
+  // Thresholds for alerting, checked against the latest window
+  private readonly thresholds = {
+    eventLoopP99Ms: 200,          // Alert if p99 loop delay > 200ms
+    criticalEventLoopP99Ms: 1000, // Critical at 1s (requests are stalling)
+    gcPauseMs: 250,               // Alert on a single pause > 250ms
+    gcTimeFraction: 0.1,          // Alert if > 10% of the window was spent in GC
+    heapLimitPercent: 90          // Alert if the heap is within 10% of its limit
+  };
+
+  start(): void {
+    if (this.timer) return;
+
+    this.eventLoopDelay = monitorEventLoopDelay({ resolution: EVENT_LOOP_RESOLUTION_MS });
+    this.eventLoopDelay.enable();
+
+    try {
+      this.gcObserver = new PerformanceObserver((list) => {
+        for (const entry of list.getEntries()) {
+          this.recordGc(entry);
+        }
+      });
+      this.gcObserver.observe({ entryTypes: ['gc'] });
+    } catch (error) {
+      logger.warn('GC performance entries unavailable', {
+        error: error instanceof Error ? error.message : 'Unknown error',
+      });
+    }
+
+    this.windowStart = Date.now();
+    this.lastUtilization = performance.eventLoopUtilization();
+    this.timer = setInterval(() => this.closeWindow(), RUNTIME_WINDOW_MS);
+    this.timer.unref();
+
+    logger.info('Runtime monitor started', { windowMs: RUNTIME_WINDOW_MS, windows: RUNTIME_WINDOW_COUNT });
+  }
+
+  stop(): void {
+    if (this.timer) {
+      clearInterval(this.timer);
+      this.timer = null;
+    }
+    this.eventLoopDelay?.disable();
+    this.eventLoopDelay = null;
+    this.gcObserver?.disconnect();
+    this.gcObserver = null;
+  }
+
+  getLatestWindow(): RuntimeWindow | null {
+    return this.windows[this.windows.length - 1] || null;
+  }
+
+  getWindows(limit: number = RUNTIME_WINDOW_COUNT): RuntimeWindow[] {
+    return this.windows.slice(-limit);
+  }
+
+  /**
+   * Compact summary for /health
+   */
+  getSummary() {
+    const latest = this.getLatestWindow();
+    const recent = this.windows.slice(-6);
+    return {
+      windowMs: RUNTIME_WINDOW_MS,
+      latest,
+      recent: {
+        windows: recent.length,
+        eventLoopMaxMs: round(Math.max(0, ...recent.map(w => w.eventLoop.maxMs))),
+        gcMaxPauseMs: round(Math.max(0, ...recent.map(w => w.gc.maxPauseMs))),
+        gcTotalPauseMs: round(recent.reduce((sum, w) => sum + w.gc.totalPauseMs, 0)),
+      },
+      gcPauses: this.gcPauses.snapshot(),
+    };
+  }
+
+  /**
+   * Alerts for the latest window, in automatedMonitoring's alert shape
+   */
+  checkAlerts(timestamp: string): Alert[] {
+    const latest = this.getLatestWindow();
+    if (!latest) return [];
+
+    const alerts: Alert[] = [];
+    const { eventLoop, gc, heap } = latest;
+
+    if (eventLoop.p99Ms > this.thresholds.criticalEventLoopP99Ms) {
+      alerts.push({
+        severity: 'critical',
+        message: `Event loop blocked: p99 delay ${eventLoop.p99Ms}ms (max ${eventLoop.maxMs}ms)`,
+        timestamp,
+        metric: 'eventLoopDelay',
+        value: eventLoop.p99Ms,
+        threshold: this.thresholds.criticalEventLoopP99Ms
+      });
+    } else if (eventLoop.p99Ms > this.thresholds.eventLoopP99Ms) {
+      alerts.push({
+        severity: 'warning',
+        message: `High event loop delay: p99 ${eventLoop.p99Ms}ms`,
+        timestamp,
+        metric: 'eventLoopDelay',
+        value: eventLoop.p99Ms,
+        threshold: this.thresholds.eventLoopP99Ms
+      });
+    }
+
+    if (gc.maxPauseMs > this.thresholds.gcPauseMs) {
+      alerts.push({
+        severity: 'warning',
+        message: `Long GC pause: ${gc.maxPauseMs}ms`,
+        timestamp,
+        metric: 'gcPause',
+        value: gc.maxPauseMs,
+        threshold: this.thresholds.gcPauseMs
+      });
+    }
+
+    const gcFraction = latest.durationMs > 0 ? gc.totalPauseMs / latest.durationMs : 0;
+    if (gcFraction > this.thresholds.gcTimeFraction) {
+      alerts.push({
+        severity: 'warning',
+        message: `GC took ${(gcFraction * 100).toFixed(1)}% of the last ${latest.durationMs}ms`,
+        timestamp,
+        metric: 'gcTime',
+        value: round(gcFraction),
+        threshold: this.thresholds.gcTimeFraction
+      });
+    }
+
+    const heapLimitPercent = heap.limitBytes > 0 ? Math.round((heap.usedBytes / heap.limitBytes) * 100) : 0;
+    if (heapLimitPercent > this.thresholds.heapLimitPercent) {
+      alerts.push({
+        severity: 'critical',
+        message: `Heap near limit: ${heapLimitPercent}% of ${Math.round(heap.limitBytes / 1024 / 1024)}MB`,
+        timestamp,
+        metric: 'heapLimit',
+        value: heapLimitPercent,
+        threshold: this.thresholds.heapLimitPercent
+      });
+    }
+
+    return alerts;
+  }
+
+  /**
+   * Prometheus text for /metrics
+   */
+  toPrometheus(): string {
+    const latest = this.getLatestWindow();
+    const lines: string[] = [];
+
+    if (latest) {
+      lines.push(
+        '# HELP nodejs_eventloop_delay_seconds Event loop delay over the last runtime window',
+        '# TYPE nodejs_eventloop_delay_seconds gauge',
+        `nodejs_eventloop_delay_seconds{quantile="0.5"} ${latest.eventLoop.p50Ms / 1000}`,
+        `nodejs_eventloop_delay_seconds{quantile="0.99"} ${latest.eventLoop.p99Ms / 1000}`,
+        `nodejs_eventloop_delay_seconds{quantile="1"} ${latest.eventLoop.maxMs / 1000}`,
+        '# HELP nodejs_eventloop_utilization Fraction of the last runtime window the event loop was busy',
+        '# TYPE nodejs_eventloop_utilization gauge',
+        `nodejs_eventloop_utilization ${latest.eventLoop.utilization}`,
+        '# HELP nodejs_heap_space_used_bytes V8 heap space used',
+        '# TYPE nodejs_heap_space_used_bytes gauge',
+      );
+      for (const [space, stats] of Object.entries(latest.heap.spaces)) {
+        lines.push(`nodejs_heap_space_used_bytes{space="${space}"} ${stats.usedBytes}`);
+      }
+      lines.push(
+        '# HELP nodejs_heap_size_limit_bytes V8 heap size limit',
+        '# TYPE nodejs_heap_size_limit_bytes gauge',
+        `nodejs_heap_size_limit_bytes ${latest.heap.limitBytes}`,
+      );
+    }
+
+    lines.push(
+      '# HELP nodejs_gc_pause_seconds_total Time spent in GC pauses',
+      '# TYPE nodejs_gc_pause_seconds_total counter',
+    );
+    for (const [kind, totals] of Object.entries(this.gcTotals)) {
+      lines.push(`nodejs_gc_pause_seconds_total{kind="${kind}"} ${totals.totalPauseMs / 1000}`);
+    }
+    lines.push(
+      '# HELP nodejs_gc_runs_total Number of GC pauses',
+      '# TYPE nodejs_gc_runs_total counter',
+    );
+    for (const [kind, totals] of Object.entries(this.gcTotals)) {
+      lines.push(`nodejs_gc_runs_total{kind="${kind}"} ${totals.count}`);
+    }
+
+    return lines.join('\n') + '\n';
+  }
+
+  private emptyGcWindow(): RuntimeWindow['gc'] {
+    return { count: 0, totalPauseMs: 0, maxPauseMs: 0, byKind: {} };
+  }
+
+  private recordGc(entry: PerformanceEntry): void {
+    // Node >= 16 reports the kind in entry.detail; older versions on the entry
+    const detail = (entry as any).detail || entry;
+    const kind = GC_KINDS[detail.kind] || 'other';
+    const pauseMs = entry.duration;
+
+    this.windowGc.count++;
+    this.windowGc.totalPauseMs += pauseMs;
+    this.windowGc.maxPauseMs = Math.max(this.windowGc.maxPauseMs, pauseMs);
+    const byKind = this.windowGc.byKind[kind] || (this.windowGc.byKind[kind] = { count: 0, totalPauseMs: 0 });
+    byKind.count++;
+    byKind.totalPauseMs += pauseMs;
+
+    this.gcPauses.record(pauseMs);
+    const totals = this.gcTotals[kind] || (this.gcTotals[kind] = { count: 0, totalPauseMs: 0 });
+    totals.count++;
+    totals.totalPauseMs += pauseMs;
+  }
+
+  private closeWindow(): void {
+    const now = Date.now();
+    const delay = this.eventLoopDelay;
+    const utilization = performance.eventLoopUtilization(this.lastUtilization);
+    this.lastUtilization = performance.eventLoopUtilization();
+
+    const heapStats = v8.getHeapStatistics();
+    const spaces: RuntimeWindow['heap']['spaces'] = {};
+    for (const space of v8.getHeapSpaceStatistics()) {
+      spaces[space.space_name] = { usedBytes: space.space_used_size, sizeBytes: space.space_size };
+    }
+
+    const gc = this.windowGc;
+    const window: RuntimeWindow = {
+      start: new Date(this.windowStart).toISOString(),
+      durationMs: now - this.windowStart,
+      eventLoop: {
+        // The histogram includes the sampling resolution itself; subtract it
+        p50Ms: round(Math.max(0, nsToMs(delay ? delay.percentile(50) : 0) - EVENT_LOOP_RESOLUTION_MS)),
+        p99Ms: round(Math.max(0, nsToMs(delay ? delay.percentile(99) : 0) - EVENT_LOOP_RESOLUTION_MS)),
+        maxMs: round(Math.max(0, nsToMs(delay ? delay.max : 0) - EVENT_LOOP_RESOLUTION_MS)),
+        meanMs: round(Math.max(0, nsToMs(delay ? delay.mean : 0) - EVENT_LOOP_RESOLUTION_MS)),
+        utilization: round(utilization.utilization),
+      },
+      gc: {
+        count: gc.count,
+        totalPauseMs: round(gc.totalPauseMs),
+        maxPauseMs: round(gc.maxPauseMs),
+        byKind: gc.byKind,
+      },
+      heap: {
+        usedBytes: heapStats.used_heap_size,
+        totalBytes: heapStats.total_heap_size,
+        limitBytes: heapStats.heap_size_limit,
+        spaces,
+      },
+    };
+
+    delay?.reset();
+    this.windowGc = this.emptyGcWindow();
+    this.windowStart = now;
+
+    this.windows.push(window);
+    if (this.windows.length > RUNTIME_WINDOW_COUNT) {
+      this.windows.shift();
+    }
+
+    if (window.eventLoop.maxMs > this.thresholds.eventLoopP99Ms) {
+      logger.warn('Event loop stall detected', {
+        eventLoop: window.eventLoop,
+        gcPauseMs: window.gc.totalPauseMs,
+        gcMaxPauseMs: window.gc.maxPauseMs,
+      });
+    }
+  }
+}
+
+export const runtimeMonitor = new RuntimeMonitor();
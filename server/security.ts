@@ -1,14 +1,84 @@
 import { Request, Response, NextFunction } from "express";
-import rateLimit from "express-rate-limit";
+import rateLimit, { MemoryStore, type Store, type Options, type ClientRateLimitInfo } from "express-rate-limit";
 import bcrypt from "bcrypt";
 import { createClient, RedisClientType } from "redis";
 import { logger } from "./logger";
+import { LRUCache, LRUCacheStats, estimateSize } from "./lruCache";
+import { cacheAnalytics } from "./cacheAnalytics";
+import { CACHE } from "./config/constants";
+import { encodeCacheValue, decodeCacheValue } from "./utils/cacheCodec";
+import { tracer } from "./tracing";
+import { clusterState } from "./clusterState";
+
+/**
+ * Rate-limit counters kept in Redis so every cluster worker enforces the
+ * same limit. Falls back to a per-process MemoryStore while Redis is
+ * unavailable.
+ */
+class RedisRateLimitStore implements Store {
+  readonly prefix: string;
+  readonly localKeys = false;
+  private windowMs = 60 * 1000;
+  private memory = new MemoryStore();
+
+  constructor(name: string) {
+    this.prefix = `rate_limit:${name}:`;
+  }
+
+  init(options: Options): void {
+    this.windowMs = options.windowMs;
+    this.memory.init(options);
+  }
+
+  async increment(key: string): Promise<ClientRateLimitInfo> {
+    if (redisClient) {
+      const redisKey = this.prefix + key;
+      try {
+        // SET NX starts a window with its TTL only if none is running; INCR keeps the TTL
+        const [, hits, ttl] = (await redisClient
+          .multi()
+          .set(redisKey, "0", { expiration: { type: "PX", value: this.windowMs }, condition: "NX" })
+          .incr(redisKey)
+          .pTTL(redisKey)
+          .exec()) as unknown as [string | null, number, number];
+        const resetMs = Number(ttl) > 0 ? Number(ttl) : this.windowMs;
+        return { totalHits: Number(hits), resetTime: new Date(Date.now() + resetMs) };
+      } catch (error) {
+        logger.warn("Redis rate limit increment failed, counting in memory", {
+          key: redisKey,
+          error: error instanceof Error ? error.message : "Unknown error",
+        });
+      }
+    }
+    return this.memory.increment(key);
+  }
+
+  async decrement(key: string): Promise<void> {
+    if (redisClient) {
+      try {
+        await redisClient.decr(this.prefix + key);
+        return;
+      } catch {
+        // Fall through to the memory store
+      }
+    }
+    await this.memory.decrement(key);
+  }
+
+  async resetKey(key: string): Promise<void> {
+    if (redisClient) {
+      await redisClient.del(this.prefix + key).catch(() => undefined);
+    }
+    await this.memory.resetKey(key);
+  }
+}
 
 // Rate limiting middleware
-export const createRateLimit = (windowMs: number, max: number) => {
+export const createRateLimit = (windowMs: number, max: number, name: string) => {
   return rateLimit({
     windowMs,
     max,
+    store: new RedisRateLimitStore(name),
     message: { error: "Too many requests, please try again later" },
     standardHeaders: true,
     legacyHeaders: false,
@@ -25,6 +95,7 @@ const HEALTH_CHECK_RATE_LIMIT = 100; // 100 requests per 15 minutes for health c
 export const apiRateLimit = rateLimit({
   windowMs: 15 * 60 * 1000, // 15 minutes
   max: API_RATE_LIMIT,
+  store: new RedisRateLimitStore("api"),
   message: { error: "Too many requests, please try again later" },
   standardHeaders: true,
   legacyHeaders: false,
@@ -43,12 +114,14 @@ export const apiRateLimit = rateLimit({
 export const strictRateLimit = createRateLimit(
   15 * 60 * 1000,
   STRICT_RATE_LIMIT,
+  "strict",
 );
 
 // Health check rate limiter to prevent abuse
 export const healthCheckRateLimit = rateLimit({
   windowMs: 15 * 60 * 1000, // 15 minutes
   max: HEALTH_CHECK_RATE_LIMIT,
+  store: new RedisRateLimitStore("health"),
   message: { error: "Too many health check requests" },
   standardHeaders: true,
   legacyHeaders: false,
@@ -72,6 +145,7 @@ export const healthCheckRateLimit = rateLimit({
 export const photoUploadRateLimit = rateLimit({
   windowMs: 15 * 60 * 1000, // 15 minutes
   max: 10, // Limit to 10 uploads per 15-minute window per IP
+  store: new RedisRateLimitStore("photo_upload"),
   message: 'Too many photo upload requests from this IP. Please try again after 15 minutes.',
   standardHeaders: true, // Return rate limit info in `RateLimit-*` headers
   legacyHeaders: false,  // Disable `X-RateLimit-*` headers
@@ -500,8 +574,11 @@ export class SessionManager {
     try {
       if (redisClient) {
         // For Redis, scan for sessions and check inactive ones
-        // This helps reclaim memory even though TTL auto-expires
-        await this.cleanupInactiveSessions();
+        // This helps reclaim memory even though TTL auto-expires.
+        // Sessions are shared, so only the cluster leader sweeps them.
+        if (clusterState.isLeader()) {
+          await this.cleanupInactiveSessions();
+        }
         return;
       }
 
@@ -649,10 +726,35 @@ class CacheCircuitBreaker {
   }
 }
 
+// Cache namespaces with a generation counter. Bumping a namespace's
+// generation invalidates every key built from it in O(1).
+export const CACHE_NAMESPACES = [
+  "inspections",
+  "custodialNotes",
+  "roomInspections",
+  "monthlyFeedback",
+  "scores",
+  "inspectionPhotos",
+] as const;
+
+export type CacheNamespace = (typeof CACHE_NAMESPACES)[number];
+
 // Secure cache management (replacing in-memory Map)
 export class CacheManager {
   private static readonly DEFAULT_TTL = 5 * 60; // 5 minutes in seconds
   private static circuitBreaker = new CacheCircuitBreaker();
+  // Bounded in-process fallback used while Redis is unavailable
+  private static memoryCache = new LRUCache<any>({
+    maxEntries: CACHE.MEMORY_FALLBACK_MAX_ENTRIES,
+    maxBytes: CACHE.MEMORY_FALLBACK_MAX_BYTES,
+    onEvict: (key, _value, reason) => {
+      if (reason === "evicted") cacheAnalytics.recordEviction(key);
+    },
+    onBytesChange: (key, delta) => cacheAnalytics.recordMemoryBytes(key, delta),
+  });
+  private static readonly GENERATION_PREFIX = "gen:";
+  // Last generation seen per namespace (authoritative when Redis is down)
+  private static generations = new Map<CacheNamespace, number>();
   private static cacheStats = {
     hits: 0,
     misses: 0,
@@ -669,12 +771,14 @@ export class CacheManager {
     ttl: number = this.DEFAULT_TTL,
   ): Promise<void> {
     const cacheKey = SessionManager.CACHE_PREFIX + key;
-    const serializedValue = JSON.stringify(value);
 
     // Try Redis if available and circuit breaker allows
     if (redisClient && this.circuitBreaker.canAttempt()) {
       try {
+        // Large values are stored brotli-compressed
+        const serializedValue = await encodeCacheValue(value);
         await redisClient.setEx(cacheKey, ttl, serializedValue);
+        cacheAnalytics.recordSet(key, serializedValue.length, ttl);
         this.circuitBreaker.recordSuccess();
         logger.debug("Cache stored in Redis", { key, ttl });
         return;
@@ -693,23 +797,14 @@ export class CacheManager {
     // Fallback to memory storage
     try {
       this.cacheStats.fallbacks++;
-      if (!global.appCache) {
-        global.appCache = new Map();
-      }
+      const size = estimateSize(value);
+      const stored = this.memoryCache.set(key, value, ttl * 1000, size);
 
-      const cache = global.appCache as Map<
-        string,
-        { data: any; expiresAt: Date }
-      >;
-      const expiresAt = new Date(Date.now() + ttl * 1000);
-      cache.set(key, { data: value, expiresAt });
-
-      // Implement LRU eviction if cache gets too large (limit to 500 items)
-      if (cache.size > 500) {
-        const keysToDelete = Array.from(cache.keys()).slice(0, 100);
-        keysToDelete.forEach((k) => cache.delete(k));
-        logger.debug("Memory cache LRU eviction", { evicted: keysToDelete.length });
+      if (!stored) {
+        logger.debug("Value exceeds memory cache budget, not cached", { key });
+        return;
       }
+      cacheAnalytics.recordSet(key, size, ttl);
 
       logger.debug("Cache stored in memory", { key, ttl });
     } catch (error) {
@@ -735,7 +830,7 @@ export class CacheManager {
         if (value) {
           this.circuitBreaker.recordSuccess();
           this.cacheStats.hits++;
-          const parsedValue = JSON.parse(value);
+          const parsedValue = await decodeCacheValue(value);
           logger.debug("Cache hit in Redis", { key });
           return parsedValue;
         }
@@ -754,25 +849,10 @@ export class CacheManager {
 
     // Fallback to memory storage
     try {
-      if (!global.appCache) {
-        this.cacheStats.misses++;
-        return null;
-      }
+      // LRU handles expiry and recency on lookup
+      const cached = this.memoryCache.get(key);
 
-      const cache = global.appCache as Map<
-        string,
-        { data: any; expiresAt: Date }
-      >;
-      const cached = cache.get(key);
-
-      if (!cached) {
-        this.cacheStats.misses++;
-        return null;
-      }
-
-      // Check expiration
-      if (new Date() > cached.expiresAt) {
-        cache.delete(key);
+      if (cached === undefined) {
         this.cacheStats.misses++;
         return null;
       }
@@ -780,7 +860,7 @@ export class CacheManager {
       this.cacheStats.hits++;
       this.cacheStats.fallbacks++;
       logger.debug("Cache hit in memory", { key });
-      return cached.data;
+      return cached;
     } catch (error) {
       this.cacheStats.errors++;
       this.cacheStats.misses++;
@@ -818,11 +898,8 @@ export class CacheManager {
 
     // Also delete from memory (even if Redis succeeded, for consistency)
     try {
-      if (global.appCache) {
-        (global.appCache as Map<string, any>).delete(key);
-        if (!redisSuccess) {
-          logger.debug("Cache deleted from memory", { key });
-        }
+      if (this.memoryCache.delete(key) && !redisSuccess) {
+        logger.debug("Cache deleted from memory", { key });
       }
     } catch (error) {
       logger.error("Failed to delete cache from memory", {
@@ -850,18 +927,13 @@ export class CacheManager {
         }
       } else {
         // Fallback to memory storage
-        if (!global.appCache) {
-          return;
-        }
-
-        const cache = global.appCache as Map<string, any>;
-        const keysToDelete = Array.from(cache.keys()).filter((key) =>
+        const keysToDelete = Array.from(this.memoryCache.keys()).filter((key) =>
           key.includes(pattern),
         );
         let deletedCount = 0;
 
         for (const key of keysToDelete) {
-          cache.delete(key);
+          this.memoryCache.delete(key);
           deletedCount++;
         }
 
@@ -879,6 +951,104 @@ export class CacheManager {
     }
   }
 
+  /**
+   * Get the current generation of a cache namespace
+   */
+  static async getGeneration(namespace: CacheNamespace): Promise<number> {
+    const local = this.generations.get(namespace) ?? 0;
+
+    if (redisClient && this.circuitBreaker.canAttempt()) {
+      try {
+        const value = await redisClient.get(
+          SessionManager.CACHE_PREFIX + this.GENERATION_PREFIX + namespace,
+        );
+        this.circuitBreaker.recordSuccess();
+        const remote = value ? parseInt(value, 10) || 0 : 0;
+        if (remote > local) {
+          this.generations.set(namespace, remote);
+          return remote;
+        }
+      } catch (error) {
+        this.cacheStats.errors++;
+        this.circuitBreaker.recordFailure();
+        logger.warn("Redis generation lookup failed, using local generation", {
+          namespace,
+          error: error instanceof Error ? error.message : "Unknown error",
+        });
+      }
+    }
+
+    return local;
+  }
+
+  /**
+   * Last known generation of a namespace without a Redis round trip
+   */
+  static getLocalGeneration(namespace: CacheNamespace): number {
+    return this.generations.get(namespace) ?? 0;
+  }
+
+  /**
+   * Adopt a generation bumped by another cluster worker
+   */
+  static observeGeneration(namespace: CacheNamespace, generation: number): void {
+    if (generation > (this.generations.get(namespace) ?? 0)) {
+      this.generations.set(namespace, generation);
+    }
+  }
+
+  /**
+   * Invalidate every key in a namespace by bumping its generation
+   */
+  static async bumpGeneration(namespace: CacheNamespace): Promise<number> {
+    let next = (this.generations.get(namespace) ?? 0) + 1;
+    // Update the local view synchronously so in-process caches drop stale
+    // entries before the Redis round trip completes
+    this.generations.set(namespace, next);
+
+    if (redisClient && this.circuitBreaker.canAttempt()) {
+      const genKey =
+        SessionManager.CACHE_PREFIX + this.GENERATION_PREFIX + namespace;
+      try {
+        const remote = await redisClient.incr(genKey);
+        if (remote < next) {
+          // Counter was lost (Redis restart/eviction); never move backwards
+          await redisClient.set(genKey, String(next));
+        } else {
+          next = remote;
+        }
+        this.circuitBreaker.recordSuccess();
+      } catch (error) {
+        this.cacheStats.errors++;
+        this.circuitBreaker.recordFailure();
+        logger.warn("Redis generation bump failed, bumping locally", {
+          namespace,
+          error: error instanceof Error ? error.message : "Unknown error",
+        });
+      }
+    }
+
+    this.generations.set(
+      namespace,
+      Math.max(next, this.generations.get(namespace) ?? 0),
+    );
+    // Other workers' API caches check generations without a Redis round trip
+    clusterState.publish("cache:generation", { namespace, generation: next });
+    logger.debug("Cache namespace generation bumped", { namespace, generation: next });
+    return next;
+  }
+
+  /**
+   * Build a cache key embedding the namespace's current generation
+   */
+  static async versionedKey(
+    namespace: CacheNamespace,
+    suffix: string,
+  ): Promise<string> {
+    const generation = await this.getGeneration(namespace);
+    return `${namespace}:g${generation}:${suffix}`;
+  }
+
   /**
    * Get comprehensive cache statistics
    */
@@ -891,6 +1061,7 @@ export class CacheManager {
     fallbacks: number;
     hitRate: string;
     circuitBreakerState: string;
+    memory: LRUCacheStats;
   }> {
     try {
       let size = 0;
@@ -903,11 +1074,11 @@ export class CacheManager {
           type = "Redis";
         } catch (error) {
           // Fallback to memory stats
-          size = global.appCache ? (global.appCache as Map<string, any>).size : 0;
+          size = this.memoryCache.size;
           type = "Memory (Redis unavailable)";
         }
       } else {
-        size = global.appCache ? (global.appCache as Map<string, any>).size : 0;
+        size = this.memoryCache.size;
         type = this.circuitBreaker.getState() === "open"
           ? "Memory (Circuit breaker open)"
           : "Memory (INSECURE)";
@@ -927,6 +1098,7 @@ export class CacheManager {
         fallbacks: this.cacheStats.fallbacks,
         hitRate,
         circuitBreakerState: this.circuitBreaker.getState(),
+        memory: this.memoryCache.getStats(),
       };
     } catch (error) {
       logger.error("Failed to get cache stats", {
@@ -941,11 +1113,19 @@ export class CacheManager {
         fallbacks: this.cacheStats.fallbacks,
         hitRate: "N/A",
         circuitBreakerState: "unknown",
+        memory: this.memoryCache.getStats(),
       };
     }
   }
 }
 
+// Spans for cache reads and writes on sampled requests
+tracer.traceMethods(CacheManager, "cache", ["get", "set", "delete"]);
+
+clusterState.subscribe("cache:generation", ({ namespace, generation }) => {
+  CacheManager.observeGeneration(namespace, generation);
+});
+
 /**
  * Get Redis connection status and health
  */
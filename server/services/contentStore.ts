@@ -0,0 +1,143 @@
+import { createReadStream, promises as fs } from 'fs';
+import { createHash } from 'crypto';
+import { objectStorageService, getContentAddressedPath } from '../objectStorage';
+import { storage } from '../storage';
+import { logger } from '../logger';
+import { IMAGE_INGEST } from '../config/constants';
+import { normalizeImageForStorage } from './thumbnail';
+import { imagePool } from './imagePool';
+
+/**
+ * Content-addressed uploads
+ *
+ * Streamed uploads are stored once per SHA-256 under uploads/cas/ and
+ * reference counted in object_blobs, so a photo re-sent by an offline sync
+ * retry reuses the existing file and URL. URLs never change content and can
+ * be cached as immutable. Photos are re-encoded before hashing (see
+ * normalizeImageForStorage); re-encoding is deterministic, so retries still
+ * deduplicate.
+ */
+
+export type StoredUpload =
+  | { success: true; filename: string; url: string; filePath: string; size: number; mimetype: string; deduplicated: boolean }
+  | { success: false; error: string };
+
+function hashFile(filePath: string): Promise<string> {
+  return new Promise((resolve, reject) => {
+    const hash = createHash('sha256');
+    createReadStream(filePath)
+      .on('data', chunk => hash.update(chunk))
+      .on('end', () => resolve(hash.digest('hex')))
+      .on('error', reject);
+  });
+}
+
+interface IngestedFile {
+  path: string;
+  sha256: string;
+  size: number;
+  mimetype: string;
+  // Untouched upload, kept alongside the normalized blob when configured
+  original?: { path: string; mimetype: string };
+}
+
+/**
+ * Re-encode photos in the image pool; other files pass through unchanged
+ */
+async function ingest(file: Express.Multer.File): Promise<IngestedFile> {
+  const passthrough = { path: file.path, sha256: file.sha256!, size: file.size, mimetype: file.mimetype };
+  if (!IMAGE_INGEST.ENABLED || !(IMAGE_INGEST.TYPES as readonly string[]).includes(file.mimetype)) {
+    return passthrough;
+  }
+
+  const normalizedPath = `${file.path}.normalized`;
+  try {
+    const normalized = await imagePool.run(() => normalizeImageForStorage(file.path, normalizedPath), 'high', 'image.normalize');
+    const ingested: IngestedFile = {
+      path: normalizedPath,
+      sha256: await hashFile(normalizedPath),
+      size: normalized.size,
+      mimetype: normalized.mimetype,
+    };
+    if (IMAGE_INGEST.KEEP_ORIGINAL) {
+      ingested.original = { path: file.path, mimetype: file.mimetype };
+    } else {
+      await fs.unlink(file.path).catch(() => undefined);
+    }
+    return ingested;
+  } catch (error) {
+    // Store as uploaded rather than failing the request (e.g. pool saturated)
+    await fs.unlink(normalizedPath).catch(() => undefined);
+    logger.warn('Image normalization skipped', {
+      originalName: file.originalname,
+      error: error instanceof Error ? error.message : 'Unknown error',
+    });
+    return passthrough;
+  }
+}
+
+/**
+ * Remove the temp files ingest() produced when the upload is not stored
+ */
+async function discardIngested(ingested: IngestedFile): Promise<void> {
+  const paths = new Set([ingested.path, ...(ingested.original ? [ingested.original.path] : [])]);
+  await Promise.all([...paths].map(tempPath => fs.unlink(tempPath).catch(() => undefined)));
+}
+
+/**
+ * Store a disk-streamed multer file and take one reference on its blob
+ */
+export async function storeUpload(file: Express.Multer.File): Promise<StoredUpload> {
+  if (!file.path || !file.sha256) {
+    return { success: false, error: 'Upload was not streamed to disk' };
+  }
+
+  const ingested = await ingest(file);
+  const casPath = getContentAddressedPath(ingested.sha256, ingested.mimetype);
+  try {
+    // Reference first: garbage collection holds the row lock while deleting
+    // files, so this waits for any in-progress deletion of the same content
+    await storage.acquireObjectBlob({
+      sha256: ingested.sha256,
+      path: casPath,
+      size: ingested.size,
+      contentType: ingested.mimetype,
+    });
+  } catch (error) {
+    logger.error('Failed to reference object blob', {
+      casPath,
+      error: error instanceof Error ? error.message : 'Unknown error',
+    });
+    await discardIngested(ingested);
+    return { success: false, error: 'Failed to record upload' };
+  }
+
+  const result = await objectStorageService.storeContentAddressed(ingested.path, casPath);
+  if (!result.success) {
+    await storage.releaseObjectUrls([`/objects/${casPath}`]);
+    await discardIngested(ingested);
+    return { success: false, error: result.error || 'Failed to store upload' };
+  }
+
+  if (ingested.original) {
+    // Stored as a derivative so it shares the blob's lifetime
+    const extension = getContentAddressedPath(ingested.sha256, ingested.original.mimetype).split('.').pop();
+    const originalPath = casPath.replace(/\.[a-z0-9]+$/, `__original.${extension}`);
+    const original = await objectStorageService.storeContentAddressed(ingested.original.path, originalPath);
+    if (!original.success) {
+      // The normalized blob is stored; the upload succeeds without its original
+      logger.warn('Failed to keep original upload', { originalPath, error: original.error });
+      await fs.unlink(ingested.original.path).catch(() => undefined);
+    }
+  }
+
+  return {
+    success: true,
+    filename: casPath,
+    url: `/objects/${casPath}`,
+    filePath: result.filePath!,
+    size: ingested.size,
+    mimetype: ingested.mimetype,
+    deduplicated: result.deduplicated!,
+  };
+}
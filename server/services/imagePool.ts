@@ -0,0 +1,264 @@
+import sharp from 'sharp';
+import os from 'os';
+import { AsyncResource } from 'async_hooks';
+import * as path from 'path';
+import { logger } from '../logger';
+import { objectStorageService } from '../objectStorage';
+import { tracer } from '../tracing';
+
+/**
+ * Bounded image-processing pool
+ *
+ * Every sharp job runs through a fixed number of slots with bounded queues,
+ * and libvips gets one thread per job so the pool size sets how much CPU image
+ * work takes. Each source image is decoded once (shrink-on-load to the
+ * largest derivative) and all derivatives are encoded from that raw copy. The
+ * thumbnail is produced inline for the upload response, and the preview sizes
+ * and formats are produced afterwards at low priority.
+ */
+
+export type ImageVariant = 'thumb' | 'preview';
+export type ImageFormat = 'jpeg' | 'webp' | 'avif';
+
+interface DerivativeSpec {
+  width: number;
+  height: number;
+  fit: 'cover' | 'inside';
+  formats: readonly ImageFormat[];
+}
+
+const DERIVATIVES: Record<ImageVariant, DerivativeSpec> = {
+  thumb: { width: 200, height: 200, fit: 'cover', formats: ['jpeg'] },
+  preview: { width: 800, height: 800, fit: 'inside', formats: ['avif', 'webp', 'jpeg'] },
+};
+
+// Largest derivative edge; sources are decoded straight to this size
+const DECODE_MAX_EDGE = 800;
+
+const FORMAT_EXTENSIONS: Record<ImageFormat, string> = {
+  jpeg: 'jpg',
+  webp: 'webp',
+  avif: 'avif',
+};
+
+const IMAGE_POOL_CONCURRENCY = parseInt(
+  process.env.IMAGE_POOL_CONCURRENCY || String(Math.max(1, Math.min(2, os.cpus().length - 1))),
+  10,
+);
+const IMAGE_POOL_MAX_QUEUE = parseInt(process.env.IMAGE_POOL_MAX_QUEUE || '32', 10);
+// Refuse decompression bombs before allocating pixel memory
+const MAX_INPUT_PIXELS = 50 * 1000 * 1000;
+
+sharp.concurrency(1);
+sharp.cache({ memory: 50, files: 0, items: 100 });
+
+type Priority = 'high' | 'low';
+
+interface DecodedImage {
+  data: Buffer;
+  info: sharp.OutputInfo;
+}
+
+/**
+ * Whether a query value names a known variant
+ */
+export function isImageVariant(value: unknown): value is ImageVariant {
+  return typeof value === 'string' && Object.prototype.hasOwnProperty.call(DERIVATIVES, value);
+}
+
+/**
+ * Storage name of a derivative, e.g. photos/123-a.jpg -> photos/123-a__preview.webp
+ */
+export function getVariantFilename(filename: string, variant: ImageVariant, format: ImageFormat): string {
+  const parsed = path.posix.parse(filename);
+  const name = `${parsed.name}__${variant}.${FORMAT_EXTENSIONS[format]}`;
+  return parsed.dir ? `${parsed.dir}/${name}` : name;
+}
+
+/**
+ * Pick the best derivative format for a request: an explicit ?format= wins,
+ * otherwise the Accept header is used, falling back to JPEG
+ */
+export function selectVariantFormat(variant: ImageVariant, requested: unknown, accept: string | undefined): ImageFormat {
+  const formats = DERIVATIVES[variant].formats;
+  if (typeof requested === 'string' && (formats as readonly string[]).includes(requested)) {
+    return requested as ImageFormat;
+  }
+  for (const format of formats) {
+    if (format === 'jpeg' || (accept && accept.includes(`image/${format}`))) {
+      return format;
+    }
+  }
+  return 'jpeg';
+}
+
+class ImagePool {
+  private readonly concurrency: number;
+  private readonly maxQueue: number;
+  private readonly storage = objectStorageService;
+  private active = 0;
+  private queues: Record<Priority, Array<() => void>> = { high: [], low: [] };
+  private stats = { completed: 0, failed: 0, rejected: 0 };
+
+  constructor(concurrency: number, maxQueue: number) {
+    this.concurrency = Math.max(1, concurrency);
+    this.maxQueue = Math.max(1, maxQueue);
+  }
+
+  /**
+   * Run a task when a slot is free. High priority tasks are started first;
+   * each priority has its own queue bound and rejects when full.
+   */
+  run<T>(task: () => Promise<T>, priority: Priority = 'high', name: string = 'imagePool.task'): Promise<T> {
+    return new Promise<T>((resolve, reject) => {
+      const queuedAt = Date.now();
+      // Queued tasks start from another task's completion; run them in the caller's
+      // async context so log request IDs and trace spans stay attributed
+      const start = AsyncResource.bind(() => {
+        this.active++;
+        tracer.withSpan(name, { 'imagePool.priority': priority, 'imagePool.waitMs': Date.now() - queuedAt }, task)
+          .then(
+            (result) => {
+              this.stats.completed++;
+              resolve(result);
+            },
+            (error) => {
+              this.stats.failed++;
+              reject(error);
+            },
+          )
+          .finally(() => {
+            this.active--;
+            this.startNext();
+          });
+      });
+
+      if (this.active < this.concurrency) {
+        start();
+        return;
+      }
+
+      const queue = this.queues[priority];
+      if (queue.length >= this.maxQueue) {
+        this.stats.rejected++;
+        reject(new Error('Image processing queue is full'));
+        return;
+      }
+      queue.push(start);
+    });
+  }
+
+  /**
+   * Decode an uploaded image and store its thumbnail; the preview
+   * derivatives are queued in the background from the same decoded pixels.
+   * Resolves with the thumbnail's storage filename.
+   */
+  async processUpload(sourcePath: string, filename: string): Promise<string> {
+    // Content-addressed sources keep their derivatives; a re-upload reuses them
+    const existingThumbnail = getVariantFilename(filename, 'thumb', 'jpeg');
+    if ((await this.storage.statObject(existingThumbnail)).success) {
+      return existingThumbnail;
+    }
+
+    const { decoded, thumbnailFilename } = await this.run(async () => {
+      const decoded = await this.decode(sourcePath);
+      return { decoded, thumbnailFilename: await this.writeDerivative(decoded, filename, 'thumb', 'jpeg') };
+    }, 'high', 'image.thumbnail');
+
+    this.run(() => this.writeVariant(decoded, filename, 'preview'), 'low', 'image.preview').catch((error) => {
+      logger.warn('Preview derivative generation skipped', {
+        filename,
+        error: error instanceof Error ? error.message : 'Unknown error',
+      });
+    });
+
+    return thumbnailFilename;
+  }
+
+  /**
+   * Generate every derivative of a stored image in the background
+   */
+  scheduleDerivatives(sourcePath: string, filename: string): void {
+    this.run(async () => {
+      const decoded = await this.decode(sourcePath);
+      for (const variant of Object.keys(DERIVATIVES) as ImageVariant[]) {
+        await this.writeVariant(decoded, filename, variant);
+      }
+    }, 'low', 'image.derivatives').catch((error) => {
+      logger.warn('Image derivative generation skipped', {
+        filename,
+        error: error instanceof Error ? error.message : 'Unknown error',
+      });
+    });
+  }
+
+  getStats() {
+    return {
+      concurrency: this.concurrency,
+      maxQueue: this.maxQueue,
+      active: this.active,
+      queuedHigh: this.queues.high.length,
+      queuedLow: this.queues.low.length,
+      ...this.stats,
+    };
+  }
+
+  private startNext(): void {
+    while (this.active < this.concurrency) {
+      const next = this.queues.high.shift() || this.queues.low.shift();
+      if (!next) return;
+      next();
+    }
+  }
+
+  private decode(sourcePath: string): Promise<DecodedImage> {
+    return sharp(sourcePath, { limitInputPixels: MAX_INPUT_PIXELS })
+      .rotate()
+      .resize(DECODE_MAX_EDGE, DECODE_MAX_EDGE, { fit: 'inside', withoutEnlargement: true })
+      .raw()
+      .toBuffer({ resolveWithObject: true });
+  }
+
+  private async writeVariant(decoded: DecodedImage, filename: string, variant: ImageVariant): Promise<void> {
+    for (const format of DERIVATIVES[variant].formats) {
+      await this.writeDerivative(decoded, filename, variant, format);
+    }
+  }
+
+  private async writeDerivative(
+    decoded: DecodedImage,
+    filename: string,
+    variant: ImageVariant,
+    format: ImageFormat,
+  ): Promise<string> {
+    const startTime = Date.now();
+    const spec = DERIVATIVES[variant];
+    const { width, height, channels } = decoded.info;
+
+    let pipeline = sharp(decoded.data, { raw: { width, height, channels } })
+      .resize(spec.width, spec.height, { fit: spec.fit, position: 'center', withoutEnlargement: spec.fit === 'inside' });
+    if (format === 'avif') {
+      pipeline = pipeline.avif({ quality: 50, effort: 2 });
+    } else if (format === 'webp') {
+      pipeline = pipeline.webp({ quality: 75 });
+    } else {
+      pipeline = pipeline.jpeg({ quality: variant === 'thumb' ? 70 : 80, progressive: true, mozjpeg: true });
+    }
+    const output = await pipeline.toBuffer();
+
+    const variantFilename = getVariantFilename(filename, variant, format);
+    const result = await this.storage.uploadLargeFile(output, variantFilename, `image/${format}`);
+    if (!result.success) {
+      throw new Error(`Failed to store ${variant} ${format}: ${result.error}`);
+    }
+
+    logger.debug('Image derivative generated', {
+      filename: variantFilename,
+      outputSize: output.length,
+      durationMs: Date.now() - startTime,
+    });
+    return variantFilename;
+  }
+}
+
+export const imagePool = new ImagePool(IMAGE_POOL_CONCURRENCY, IMAGE_POOL_MAX_QUEUE);
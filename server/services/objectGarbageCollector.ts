@@ -0,0 +1,256 @@
+import { promises as fs } from 'fs';
+import * as path from 'path';
+import { storage } from '../storage';
+import { logger } from '../logger';
+import { UPLOADS_DIR, UPLOAD_TEMP_DIR } from '../objectStorage';
+import { mapWithConcurrency } from '../utils/concurrency';
+
+/**
+ * Orphaned upload garbage collector
+ *
+ * One paged pass over every column that references uploads builds a set of
+ * referenced paths. The uploads tree is then walked with a streaming
+ * directory iterator, and files that are unreferenced and older than the
+ * grace period are deleted in small batches. Derivatives (<name>__<variant>.<ext>)
+ * live as long as their source, and abandoned upload temp files are
+ * collected too. Dry runs report what would be deleted without deleting.
+ */
+
+const OBJECT_GC_INTERVAL_MS = parseInt(process.env.OBJECT_GC_INTERVAL_MS || String(24 * 60 * 60 * 1000), 10);
+const OBJECT_GC_GRACE_MS = parseInt(process.env.OBJECT_GC_GRACE_MS || String(24 * 60 * 60 * 1000), 10);
+const DELETE_BATCH_SIZE = 100;
+const DELETE_CONCURRENCY = 8;
+const SAMPLE_SIZE = 50;
+
+const DERIVATIVE_PATTERN = /^(.+)__[a-z]+\.[a-z0-9]+$/;
+
+export interface GarbageCollectionOptions {
+  dryRun?: boolean;
+  graceMs?: number;
+  maxDeletes?: number;
+}
+
+export interface GarbageCollectionStats {
+  dryRun: boolean;
+  startedAt: string;
+  durationMs: number;
+  referenceRows: number;
+  referencedPaths: number;
+  filesScanned: number;
+  bytesScanned: number;
+  orphans: number;
+  orphanBytes: number;
+  deleted: number;
+  bytesReclaimed: number;
+  skippedRecent: number;
+  errors: number;
+  filesPerSecond: number;
+  sample: string[];
+}
+
+/**
+ * Paths relative to uploads/ that a stored reference (/objects/x, /uploads/x or x)
+ * may point at; both the raw and the percent-decoded form are kept
+ */
+function toStoragePaths(reference: string): string[] {
+  if (/^https?:\/\//.test(reference)) return [];
+
+  const relative = reference.split('?')[0].replace(/^\/(objects|uploads)\//, '').replace(/^\/+/, '');
+  if (!relative) return [];
+  try {
+    const decoded = decodeURIComponent(relative);
+    return decoded === relative ? [relative] : [relative, decoded];
+  } catch {
+    return [relative];
+  }
+}
+
+function withoutExtension(relativePath: string): string {
+  const parsed = path.posix.parse(relativePath);
+  return parsed.dir ? `${parsed.dir}/${parsed.name}` : parsed.name;
+}
+
+/**
+ * Depth-first walk yielding files as they are read (fs.opendir streams entries)
+ */
+async function* walkFiles(root: string): AsyncGenerator<string> {
+  let directory;
+  try {
+    directory = await fs.opendir(root);
+  } catch {
+    return;
+  }
+  for await (const entry of directory) {
+    const entryPath = path.join(root, entry.name);
+    if (entry.isDirectory()) {
+      yield* walkFiles(entryPath);
+    } else if (entry.isFile()) {
+      yield entryPath;
+    }
+  }
+}
+
+class ObjectGarbageCollector {
+  private running: Promise<GarbageCollectionStats> | null = null;
+  private timer: NodeJS.Timeout | null = null;
+  private lastRun: GarbageCollectionStats | null = null;
+
+  isRunning(): boolean {
+    return this.running !== null;
+  }
+
+  getStatus() {
+    return {
+      running: this.isRunning(),
+      intervalMs: OBJECT_GC_INTERVAL_MS,
+      graceMs: OBJECT_GC_GRACE_MS,
+      lastRun: this.lastRun,
+    };
+  }
+
+  /**
+   * Run periodically; OBJECT_GC_INTERVAL_MS=0 disables
+   */
+  schedule(): void {
+    if (this.timer || OBJECT_GC_INTERVAL_MS <= 0) return;
+    this.timer = setInterval(() => {
+      this.run().catch(() => undefined);
+    }, OBJECT_GC_INTERVAL_MS);
+    this.timer.unref();
+  }
+
+  stop(): void {
+    if (this.timer) {
+      clearInterval(this.timer);
+      this.timer = null;
+    }
+  }
+
+  /**
+   * Collect orphaned files. Concurrent calls share the run in progress.
+   */
+  run(options: GarbageCollectionOptions = {}): Promise<GarbageCollectionStats> {
+    if (this.running) return this.running;
+
+    this.running = this.collect(options)
+      .then((stats) => {
+        this.lastRun = stats;
+        logger.info('Object garbage collection completed', { ...stats, sample: undefined });
+        return stats;
+      })
+      .catch((error) => {
+        logger.error('Object garbage collection failed', {
+          error: error instanceof Error ? error.message : 'Unknown error',
+        });
+        throw error;
+      })
+      .finally(() => {
+        this.running = null;
+      });
+    return this.running;
+  }
+
+  private async collect(options: GarbageCollectionOptions): Promise<GarbageCollectionStats> {
+    const dryRun = options.dryRun ?? false;
+    const graceMs = options.graceMs ?? OBJECT_GC_GRACE_MS;
+    const maxDeletes = options.maxDeletes ?? Infinity;
+    const startedAt = Date.now();
+
+    // Referenced paths and their extension-less stems (for derivatives)
+    const referenced = new Set<string>();
+    const referencedStems = new Set<string>();
+    const referenceRows = await storage.forEachObjectReference((reference) => {
+      for (const relative of toStoragePaths(reference)) {
+        referenced.add(relative);
+        referencedStems.add(withoutExtension(relative));
+      }
+    });
+
+    const stats: GarbageCollectionStats = {
+      dryRun,
+      startedAt: new Date(startedAt).toISOString(),
+      durationMs: 0,
+      referenceRows,
+      referencedPaths: referenced.size,
+      filesScanned: 0,
+      bytesScanned: 0,
+      orphans: 0,
+      orphanBytes: 0,
+      deleted: 0,
+      bytesReclaimed: 0,
+      skippedRecent: 0,
+      errors: 0,
+      filesPerSecond: 0,
+      sample: [],
+    };
+
+    const cutoff = startedAt - graceMs;
+    let batch: Array<{ filePath: string; size: number }> = [];
+
+    const flush = async () => {
+      const current = batch;
+      batch = [];
+      if (dryRun || current.length === 0) return;
+      await mapWithConcurrency(current, DELETE_CONCURRENCY, async ({ filePath, size }) => {
+        try {
+          await fs.unlink(filePath);
+          stats.deleted++;
+          stats.bytesReclaimed += size;
+        } catch (error) {
+          if ((error as NodeJS.ErrnoException).code !== 'ENOENT') stats.errors++;
+        }
+      });
+    };
+
+    for await (const filePath of walkFiles(UPLOADS_DIR)) {
+      stats.filesScanned++;
+
+      let fileStats;
+      try {
+        fileStats = await fs.stat(filePath);
+      } catch {
+        continue; // Removed while walking
+      }
+      stats.bytesScanned += fileStats.size;
+
+      const relative = path.relative(UPLOADS_DIR, filePath).split(path.sep).join('/');
+      const isTemp = filePath.startsWith(UPLOAD_TEMP_DIR + path.sep);
+      if (!isTemp && this.isReferenced(relative, referenced, referencedStems)) continue;
+
+      // New uploads may not be referenced yet; temp files may still be streaming
+      if (fileStats.mtimeMs > cutoff) {
+        stats.skippedRecent++;
+        continue;
+      }
+
+      if (stats.orphans >= maxDeletes) break;
+      stats.orphans++;
+      stats.orphanBytes += fileStats.size;
+      if (stats.sample.length < SAMPLE_SIZE) stats.sample.push(relative);
+
+      batch.push({ filePath, size: fileStats.size });
+      if (batch.length >= DELETE_BATCH_SIZE) {
+        await flush();
+      }
+    }
+    await flush();
+
+    stats.durationMs = Date.now() - startedAt;
+    stats.filesPerSecond = stats.durationMs > 0
+      ? Math.round((stats.filesScanned / stats.durationMs) * 1000)
+      : stats.filesScanned;
+    return stats;
+  }
+
+  private isReferenced(relative: string, referenced: Set<string>, referencedStems: Set<string>): boolean {
+    if (referenced.has(relative)) return true;
+
+    const match = DERIVATIVE_PATTERN.exec(path.posix.basename(relative));
+    if (!match) return false;
+    const directory = path.posix.dirname(relative);
+    const stem = directory === '.' ? match[1] : `${directory}/${match[1]}`;
+    return referencedStems.has(stem);
+  }
+}
+
+export const objectGarbageCollector = new ObjectGarbageCollector();
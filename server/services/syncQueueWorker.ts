@@ -0,0 +1,213 @@
+import { storage } from '../storage';
+import { logger } from '../logger';
+import { objectStorageService } from '../objectStorage';
+import { imagePool } from './imagePool';
+import { mapWithConcurrency } from '../utils/concurrency';
+import type { SyncQueue } from '../../shared/schema';
+
+/**
+ * Background sync queue processor
+ *
+ * Claims due sync_queue items in batches (SELECT ... FOR UPDATE SKIP LOCKED),
+ * runs them with bounded concurrency and reschedules failures with
+ * exponential backoff and full jitter until MAX_ATTEMPTS. While batches come
+ * back full the worker keeps draining; otherwise it sleeps for the poll
+ * interval, or until wake() is called after an enqueue.
+ */
+
+const SYNC_QUEUE_BATCH_SIZE = parseInt(process.env.SYNC_QUEUE_BATCH_SIZE || '20', 10);
+const SYNC_QUEUE_CONCURRENCY = parseInt(process.env.SYNC_QUEUE_CONCURRENCY || '4', 10);
+const SYNC_QUEUE_POLL_MS = parseInt(process.env.SYNC_QUEUE_POLL_MS || '5000', 10);
+const MAX_ATTEMPTS = 8;
+const BACKOFF_BASE_MS = 1000;
+const BACKOFF_MAX_MS = 10 * 60 * 1000;
+// Items stuck in 'processing' this long are assumed abandoned by a dead worker
+const STALE_LOCK_MS = 5 * 60 * 1000;
+
+export type SyncQueueHandler = (item: SyncQueue, payload: any) => Promise<void>;
+
+/**
+ * Delay before the given retry attempt: random in [0, min(max, base * 2^attempt))
+ */
+export function getRetryDelay(attempt: number): number {
+  const ceiling = Math.min(BACKOFF_MAX_MS, BACKOFF_BASE_MS * Math.pow(2, attempt));
+  return Math.round(Math.random() * ceiling);
+}
+
+class SyncQueueWorker {
+  private handlers = new Map<string, SyncQueueHandler>();
+  private running = false;
+  private draining: Promise<void> | null = null;
+  private timer: NodeJS.Timeout | null = null;
+  private wakeRequested = false;
+  private stats = {
+    batches: 0,
+    processed: 0,
+    retried: 0,
+    failed: 0,
+    lastBatchSize: 0,
+    lastRunAt: null as string | null,
+  };
+
+  registerHandler(type: string, handler: SyncQueueHandler): void {
+    this.handlers.set(type, handler);
+  }
+
+  start(): void {
+    if (this.running) return;
+    this.running = true;
+    logger.info('Sync queue worker started', {
+      batchSize: SYNC_QUEUE_BATCH_SIZE,
+      concurrency: SYNC_QUEUE_CONCURRENCY,
+      pollMs: SYNC_QUEUE_POLL_MS,
+    });
+    this.schedule(0);
+  }
+
+  /**
+   * Stop polling and wait for the batch in progress to finish
+   */
+  async stop(): Promise<void> {
+    this.running = false;
+    if (this.timer) {
+      clearTimeout(this.timer);
+      this.timer = null;
+    }
+    await this.draining;
+  }
+
+  /**
+   * Process the queue now instead of waiting for the next poll
+   */
+  wake(): void {
+    if (!this.running) return;
+    if (this.draining) {
+      this.wakeRequested = true;
+      return;
+    }
+    this.schedule(0);
+  }
+
+  async getStats() {
+    let queue = null;
+    try {
+      queue = await storage.getSyncQueueMetrics();
+    } catch (error) {
+      logger.warn('Failed to read sync queue metrics', {
+        error: error instanceof Error ? error.message : 'Unknown error',
+      });
+    }
+    return {
+      running: this.running,
+      ...this.stats,
+      queue,
+    };
+  }
+
+  private schedule(delayMs: number): void {
+    if (this.timer) clearTimeout(this.timer);
+    this.timer = setTimeout(() => {
+      this.timer = null;
+      this.draining = this.drain().finally(() => {
+        this.draining = null;
+      });
+    }, delayMs);
+    this.timer.unref();
+  }
+
+  private async drain(): Promise<void> {
+    let claimedFullBatch = false;
+    try {
+      this.wakeRequested = false;
+      const batch = await storage.claimSyncQueueBatch(SYNC_QUEUE_BATCH_SIZE, STALE_LOCK_MS);
+      this.stats.lastBatchSize = batch.length;
+      this.stats.lastRunAt = new Date().toISOString();
+
+      if (batch.length > 0) {
+        this.stats.batches++;
+        await mapWithConcurrency(batch, SYNC_QUEUE_CONCURRENCY, item => this.processItem(item));
+      }
+      claimedFullBatch = batch.length === SYNC_QUEUE_BATCH_SIZE;
+    } catch (error) {
+      logger.error('Sync queue batch failed', {
+        error: error instanceof Error ? error.message : 'Unknown error',
+      });
+    }
+
+    if (this.running) {
+      // Keep draining while there is a backlog; otherwise go back to polling
+      this.schedule(claimedFullBatch || this.wakeRequested ? 0 : SYNC_QUEUE_POLL_MS);
+    }
+  }
+
+  private async processItem(item: SyncQueue): Promise<void> {
+    try {
+      const handler = this.handlers.get(item.type);
+      if (!handler) {
+        throw new Error(`No handler registered for sync type: ${item.type}`);
+      }
+
+      await handler(item, item.data ? JSON.parse(item.data) : {});
+      await storage.deleteSyncQueue(item.id);
+      this.stats.processed++;
+    } catch (error) {
+      const message = error instanceof Error ? error.message : 'Unknown error';
+      const attempts = (item.retryCount || 0) + 1;
+
+      try {
+        if (attempts >= MAX_ATTEMPTS) {
+          this.stats.failed++;
+          await storage.updateSyncQueue(item.id, {
+            status: 'failed',
+            retryCount: attempts,
+            errorMessage: message.slice(0, 1000),
+            lockedAt: null,
+          });
+          logger.error('Sync queue item failed permanently', { id: item.id, type: item.type, attempts, error: message });
+        } else {
+          this.stats.retried++;
+          await storage.updateSyncQueue(item.id, {
+            status: 'pending',
+            retryCount: attempts,
+            nextRetryAt: new Date(Date.now() + getRetryDelay(attempts)),
+            errorMessage: message.slice(0, 1000),
+            lockedAt: null,
+          });
+          logger.warn('Sync queue item will be retried', { id: item.id, type: item.type, attempts, error: message });
+        }
+      } catch (updateError) {
+        // The stale-lock reclaim picks the item up again later
+        logger.error('Failed to reschedule sync queue item', {
+          id: item.id,
+          error: updateError instanceof Error ? updateError.message : 'Unknown error',
+        });
+      }
+    }
+  }
+}
+
+export const syncQueueWorker = new SyncQueueWorker();
+
+// Finish a photo upload whose thumbnail could not be produced inline
+syncQueueWorker.registerHandler('photo_upload', async (item) => {
+  if (!item.photoId) return;
+
+  const photo = await storage.getInspectionPhoto(item.photoId);
+  if (!photo) return; // Photo deleted since it was queued
+
+  if (!photo.thumbnailUrl && photo.photoUrl.startsWith('/objects/')) {
+    const filename = photo.photoUrl.slice('/objects/'.length);
+    const object = await objectStorageService.statObject(filename);
+    if (!object.success) {
+      throw new Error(`Photo file missing: ${filename}`);
+    }
+    const thumbnailFilename = await imagePool.processUpload(object.filePath, filename);
+    await storage.updateInspectionPhoto(photo.id, {
+      thumbnailUrl: `/objects/${thumbnailFilename}`,
+      syncStatus: 'synced',
+    });
+    return;
+  }
+
+  await storage.updateInspectionPhoto(photo.id, { syncStatus: 'synced' });
+});
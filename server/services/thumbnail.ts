@@ -2,6 +2,7 @@ import sharp from 'sharp';
 import { logger } from '../logger';
 import * as fs from 'fs/promises';
 import * as path from 'path';
+import { IMAGE_INGEST } from '../config/constants';
 
 /**
  * Thumbnail generation configuration
@@ -123,6 +124,59 @@ export async function generateThumbnailFromPath(imagePath: string): Promise<Buff
   }
 }
 
+/**
+ * Re-encode an uploaded image for storage: apply EXIF orientation, strip all
+ * metadata (location is kept in inspection_photos columns), cap the longest
+ * edge and encode as quality-bounded JPEG, or WebP when configured or when
+ * the image has transparency
+ * @param inputPath - Uploaded image on disk
+ * @param outputPath - Where to write the normalized image
+ * @returns Output format, mimetype, dimensions and byte size
+ * @throws Error if the image cannot be decoded
+ */
+export async function normalizeImageForStorage(inputPath: string, outputPath: string): Promise<{
+  format: 'jpeg' | 'webp';
+  mimetype: string;
+  width: number;
+  height: number;
+  size: number;
+}> {
+  const startTime = Date.now();
+  const image = sharp(inputPath, { limitInputPixels: 50 * 1000 * 1000 });
+  const metadata = await image.metadata();
+  const format = IMAGE_INGEST.FORMAT === 'webp' || metadata.hasAlpha ? 'webp' : 'jpeg';
+
+  let pipeline = image
+    .rotate()
+    .resize(IMAGE_INGEST.MAX_DIMENSION, IMAGE_INGEST.MAX_DIMENSION, {
+      fit: 'inside',
+      withoutEnlargement: true,
+    });
+  pipeline = format === 'webp'
+    ? pipeline.webp({ quality: IMAGE_INGEST.WEBP_QUALITY })
+    : pipeline.jpeg({ quality: IMAGE_INGEST.JPEG_QUALITY, progressive: true, mozjpeg: true });
+
+  // sharp drops EXIF/XMP/ICC unless withMetadata() is requested
+  const info = await pipeline.toFile(outputPath);
+
+  logger.info('Image normalized for storage', {
+    inputFormat: metadata.format,
+    inputDimensions: `${metadata.width}x${metadata.height}`,
+    outputDimensions: `${info.width}x${info.height}`,
+    outputSize: info.size,
+    format,
+    durationMs: Date.now() - startTime,
+  });
+
+  return {
+    format,
+    mimetype: `image/${format}`,
+    width: info.width,
+    height: info.height,
+    size: info.size,
+  };
+}
+
 /**
  * Get image metadata without generating thumbnail
  * Useful for validation before processing
@@ -1,19 +1,58 @@
 import { db, pool, withDatabaseReconnection } from './db';
-import { inspections, custodialNotes, roomInspections, monthlyFeedback, inspectionPhotos, syncQueue } from '../shared/schema';
+import { inspections, custodialNotes, roomInspections, monthlyFeedback, inspectionPhotos, syncQueue, objectBlobs } from '../shared/schema';
 import type { InsertInspection, InsertCustodialNote, InsertRoomInspection, InsertMonthlyFeedback, InsertInspectionPhoto, InsertSyncQueue } from '../shared/schema';
-import { eq, desc, and, gte, lte, count, sql } from 'drizzle-orm';
+import { eq, desc, asc, and, or, gt, gte, lte, lt, isNull, inArray, count, sql } from 'drizzle-orm';
 import { logger } from './logger';
-import { CacheManager } from './security';
+import { queryProfiler } from './queryProfiler';
+import { buildCacheKey } from './utils/cacheCodec';
+import { cacheAnalytics } from './cacheAnalytics';
+import { CacheManager, CACHE_NAMESPACES } from './security';
+import type { CacheNamespace } from './security';
+import { objectStorageService, parseContentAddressedPath } from './objectStorage';
 
 // Performance monitoring for storage operations
 const performanceMetrics = {
   cacheHits: 0,
   cacheMisses: 0,
+  staleHits: 0,
+  coalescedQueries: 0,
+  backgroundRefreshes: 0,
   slowQueries: 0,
   totalQueries: 0
 };
 
 const DEFAULT_TTL = 5 * 60 * 1000; // 5 minutes
+// Entries stay servable (stale) until STALE_TTL_MULTIPLIER x the fresh TTL
+const STALE_TTL_MULTIPLIER = 2;
+// +/-10% so keys written together don't all expire together
+const TTL_JITTER_RATIO = 0.1;
+
+// Cached query results carry their own freshness deadline
+interface CacheEnvelope<T = any> {
+  v: T;
+  softExpiresAt: number;
+}
+
+// One in-flight load per cache key (single-flight)
+const inFlightQueries = new Map<string, Promise<any>>();
+
+function isCacheEnvelope(value: any): value is CacheEnvelope {
+  return value !== null && typeof value === 'object' && 'v' in value && typeof value.softExpiresAt === 'number';
+}
+
+function applyTtlJitter(ttl: number): number {
+  const jitter = (Math.random() * 2 - 1) * TTL_JITTER_RATIO;
+  return Math.max(1000, Math.round(ttl * (1 + jitter)));
+}
+
+// Invalidate namespaces after a write (one INCR each)
+async function invalidateNamespaces(...namespaces: CacheNamespace[]): Promise<void> {
+  try {
+    await Promise.all(namespaces.map(namespace => CacheManager.bumpGeneration(namespace)));
+  } catch (error) {
+    logger.error('Cache invalidation failed', { error, namespaces });
+  }
+}
 
 async function getFromCache(key: string): Promise<any | null> {
   try {
@@ -39,28 +78,122 @@ async function setCache(key: string, data: any, ttl: number = DEFAULT_TTL): Prom
   }
 }
 
-// Query performance wrapper with database reconnection
-async function executeQuery<T>(
+type Transaction = Parameters<Parameters<typeof db.transaction>[0]>[0];
+
+// References per blob held by a list of /objects URLs; other URLs hold none
+function countObjectReferences(urls: Array<string | null | undefined>): Map<string, number> {
+  const references = new Map<string, number>();
+  for (const url of urls) {
+    if (!url || !url.startsWith('/objects/')) continue;
+    const sha256 = parseContentAddressedPath(url.slice('/objects/'.length));
+    if (sha256) references.set(sha256, (references.get(sha256) || 0) + 1);
+  }
+  return references;
+}
+
+// Drop one reference per content-addressed /objects URL; blobs that reach zero are deleted
+async function releaseObjectUrls(urls: Array<string | null | undefined>): Promise<void> {
+  await releaseObjectReferences(countObjectReferences(urls));
+}
+
+async function releaseObjectReferences(releases: Map<string, number>): Promise<void> {
+  for (const [sha256, references] of releases) {
+    try {
+      const [blob] = await db.update(objectBlobs)
+        .set({ refCount: sql`GREATEST(${objectBlobs.refCount} - ${references}, 0)`, updatedAt: new Date() })
+        .where(eq(objectBlobs.sha256, sha256))
+        .returning({ refCount: objectBlobs.refCount });
+
+      if (blob && blob.refCount === 0) {
+        await collectObjectBlob(sha256);
+      }
+    } catch (error) {
+      logger.error('Failed to release object blob', {
+        sha256,
+        error: error instanceof Error ? error.message : 'Unknown error'
+      });
+    }
+  }
+}
+
+// When a record's URLs change from previous to next, take references for
+// blobs it gains inside the transaction and return the ones it drops, to be
+// released once the transaction commits
+async function moveObjectReferences(
+  tx: Transaction,
+  previous: Array<string | null | undefined>,
+  next: Array<string | null | undefined>
+): Promise<Map<string, number>> {
+  const before = countObjectReferences(previous);
+  const after = countObjectReferences(next);
+
+  const dropped = new Map<string, number>();
+  for (const [sha256, references] of before) {
+    const removed = references - (after.get(sha256) || 0);
+    if (removed > 0) dropped.set(sha256, removed);
+  }
+
+  for (const [sha256, references] of after) {
+    const added = references - (before.get(sha256) || 0);
+    if (added <= 0) continue;
+    const [blob] = await tx.update(objectBlobs)
+      .set({ refCount: sql`${objectBlobs.refCount} + ${added}`, updatedAt: new Date() })
+      .where(eq(objectBlobs.sha256, sha256))
+      .returning({ sha256: objectBlobs.sha256 });
+    if (!blob) {
+      logger.warn('Referenced object blob not found', { sha256 });
+    }
+  }
+
+  return dropped;
+}
+
+// Delete an unreferenced blob. The row lock taken by DELETE is held until the
+// files are gone, so a concurrent upload of the same content waits for it and
+// then re-creates the file.
+async function collectObjectBlob(sha256: string): Promise<void> {
+  await db.transaction(async (tx) => {
+    const [blob] = await tx.delete(objectBlobs)
+      .where(and(eq(objectBlobs.sha256, sha256), eq(objectBlobs.refCount, 0)))
+      .returning({ path: objectBlobs.path });
+
+    if (blob) {
+      await objectStorageService.deleteContentAddressed(blob.path);
+    }
+  });
+}
+
+// Walk a table in primary-key order, one page at a time, passing each row's object references to visit
+async function scanReferencePages<K, T extends { key: K }>(
+  fetchPage: (after: K | null) => Promise<T[]>,
+  extract: (row: T) => Array<string | null | undefined>,
+  visit: (reference: string) => void
+): Promise<number> {
+  let after: K | null = null;
+  let rows = 0;
+  for (;;) {
+    const page = await fetchPage(after);
+    for (const row of page) {
+      for (const reference of extract(row)) {
+        if (reference) visit(reference);
+      }
+    }
+    rows += page.length;
+    if (page.length === 0) return rows;
+    after = page[page.length - 1].key;
+  }
+}
+
+// Run a query with reconnection logic and slow query tracking
+async function runQuery<T>(
   operation: string,
   queryFn: () => Promise<T>,
-  cacheKey?: string,
-  ttl?: number
+  cacheKey?: string
 ): Promise<T> {
   const startTime = Date.now();
-  performanceMetrics.totalQueries++;
 
   try {
-    // Check cache first if cache key provided
-    if (cacheKey) {
-      const cached = await getFromCache(cacheKey);
-      if (cached !== null) {
-        logger.debug('Cache hit for operation', { operation, cacheKey });
-        return cached;
-      }
-    }
-
-    // Wrap database operation with reconnection logic
-    const result = await withDatabaseReconnection(queryFn, operation);
+    const result = await queryProfiler.withOperation(operation, () => withDatabaseReconnection(queryFn, operation));
     const duration = Date.now() - startTime;
 
     // Log slow queries
@@ -73,11 +206,6 @@ async function executeQuery<T>(
       });
     }
 
-    // Cache result if cache key provided
-    if (cacheKey && result) {
-      await setCache(cacheKey, result, ttl);
-    }
-
     logger.debug('Query completed', {
       operation,
       duration,
@@ -96,6 +224,86 @@ async function executeQuery<T>(
   }
 }
 
+// Load a cacheable query, sharing one database round trip per key
+function loadSingleFlight<T>(
+  operation: string,
+  queryFn: () => Promise<T>,
+  cacheKey: string,
+  ttl: number = DEFAULT_TTL
+): Promise<T> {
+  const pending = inFlightQueries.get(cacheKey);
+  if (pending) {
+    performanceMetrics.coalescedQueries++;
+    return pending;
+  }
+
+  const load = (async () => {
+    const fetchStart = Date.now();
+    const result = await runQuery(operation, queryFn, cacheKey);
+    cacheAnalytics.recordFetch(cacheKey, Date.now() - fetchStart);
+
+    if (result) {
+      const freshTtl = applyTtlJitter(ttl);
+      const envelope: CacheEnvelope<T> = { v: result, softExpiresAt: Date.now() + freshTtl };
+      await setCache(cacheKey, envelope, freshTtl * STALE_TTL_MULTIPLIER);
+    }
+
+    return result;
+  })().finally(() => {
+    inFlightQueries.delete(cacheKey);
+  });
+
+  inFlightQueries.set(cacheKey, load);
+  return load;
+}
+
+// Query performance wrapper with stale-while-revalidate caching
+async function executeQuery<T>(
+  operation: string,
+  queryFn: () => Promise<T>,
+  cacheKey?: string,
+  ttl?: number
+): Promise<T> {
+  performanceMetrics.totalQueries++;
+
+  if (!cacheKey) {
+    return runQuery(operation, queryFn);
+  }
+
+  const cached = await getFromCache(cacheKey);
+  if (cached !== null) {
+    // Values written before envelopes were introduced are served as-is
+    if (!isCacheEnvelope(cached)) {
+      cacheAnalytics.recordHit(cacheKey);
+      return cached;
+    }
+
+    if (cached.softExpiresAt > Date.now()) {
+      cacheAnalytics.recordHit(cacheKey);
+      logger.debug('Cache hit for operation', { operation, cacheKey });
+      return cached.v;
+    }
+
+    // Stale: serve the cached value and refresh once in the background
+    performanceMetrics.staleHits++;
+    cacheAnalytics.recordStale(cacheKey);
+    if (!inFlightQueries.has(cacheKey)) {
+      performanceMetrics.backgroundRefreshes++;
+      loadSingleFlight(operation, queryFn, cacheKey, ttl).catch(error => {
+        logger.warn('Background cache refresh failed', {
+          operation,
+          cacheKey,
+          error: error instanceof Error ? error.message : 'Unknown error'
+        });
+      });
+    }
+    return cached.v;
+  }
+
+  cacheAnalytics.recordMiss(cacheKey);
+  return loadSingleFlight(operation, queryFn, cacheKey, ttl);
+}
+
 export const storage = {
   // Inspection methods
   async createInspection(data: InsertInspection) {
@@ -104,7 +312,7 @@ export const storage = {
       logger.info('Created inspection:', { id: result.id });
 
       // Invalidate relevant cache entries
-      await CacheManager.clearPattern('inspections:all');
+      await invalidateNamespaces('inspections', 'scores');
 
       return result;
     });
@@ -131,7 +339,7 @@ export const storage = {
       hasPreviousPage: boolean;
     };
   }> {
-    const cacheKey = `inspections:list:${JSON.stringify(options || {})}`;
+    const cacheKey = await CacheManager.versionedKey('inspections', buildCacheKey('list', options));
     return executeQuery('getInspections', async () => {
       // Build filter conditions
       const conditions = [];
@@ -217,7 +425,7 @@ export const storage = {
       const totalCount = Number(totalCountResult[0]?.count || 0);
       const totalPages = Math.ceil(totalCount / limit);
 
-      logger.info(`Retrieved ${inspectionsData.length} inspections (page ${page}/${totalPages})`, {
+      logger.debug(`Retrieved ${inspectionsData.length} inspections (page ${page}/${totalPages})`, {
         options,
         totalCount
       });
@@ -238,22 +446,32 @@ export const storage = {
   },
 
   async getInspection(id: number) {
-    const cacheKey = `inspection:${id}`;
+    const cacheKey = await CacheManager.versionedKey('inspections', `item:${id}`);
     return executeQuery('getInspection', async () => {
       const [result] = await db.select().from(inspections).where(eq(inspections.id, id));
-      logger.info('Retrieved inspection:', { id });
+      logger.debug('Retrieved inspection:', { id });
       return result;
     }, cacheKey, 300000); // 5 minutes cache for single items
   },
 
   async updateInspection(id: number, data: Partial<InsertInspection>) {
     return executeQuery('updateInspection', async () => {
-      const [result] = await db.update(inspections).set(data).where(eq(inspections.id, id)).returning();
+      // New images may be shared with other records, so each takes its own reference
+      const { result, dropped } = await db.transaction(async (tx) => {
+        const [previous] = data.images === undefined
+          ? []
+          : await tx.select({ images: inspections.images }).from(inspections).where(eq(inspections.id, id)).for('update');
+        const [result] = await tx.update(inspections).set(data).where(eq(inspections.id, id)).returning();
+        const dropped = result && previous
+          ? await moveObjectReferences(tx, previous.images || [], result.images || [])
+          : new Map<string, number>();
+        return { result, dropped };
+      });
+      await releaseObjectReferences(dropped);
       logger.info('Updated inspection:', { id });
 
       // Invalidate relevant cache entries
-      await CacheManager.delete(`inspection:${id}`);
-      await CacheManager.clearPattern('inspections:all');
+      await invalidateNamespaces('inspections', 'scores');
 
       return result;
     });
@@ -261,12 +479,22 @@ export const storage = {
 
   async deleteInspection(id: number) {
     return executeQuery('deleteInspection', async () => {
-      await db.delete(inspections).where(eq(inspections.id, id));
+      // Photos are removed by the foreign key cascade; release their blobs too
+      const photos = await db.select({ photoUrl: inspectionPhotos.photoUrl })
+        .from(inspectionPhotos)
+        .where(eq(inspectionPhotos.inspectionId, id));
+      const [deleted] = await db.delete(inspections)
+        .where(eq(inspections.id, id))
+        .returning({ images: inspections.images });
       logger.info('Deleted inspection:', { id });
 
+      if (deleted) {
+        await releaseObjectUrls([...(deleted.images || []), ...photos.map(photo => photo.photoUrl)]);
+        await invalidateNamespaces('inspectionPhotos');
+      }
+
       // Invalidate relevant cache entries
-      await CacheManager.delete(`inspection:${id}`);
-      await CacheManager.clearPattern('inspections:all');
+      await invalidateNamespaces('inspections', 'scores');
 
       return true;
     });
@@ -299,8 +527,7 @@ export const storage = {
       logger.info('Created quick capture inspection:', { id: result.id, school: data.school });
 
       // Invalidate relevant cache entries
-      await CacheManager.clearPattern('inspections:pending');
-      await CacheManager.clearPattern('inspections:list');
+      await invalidateNamespaces('inspections', 'scores');
 
       return result;
     });
@@ -322,7 +549,7 @@ export const storage = {
       hasPreviousPage: boolean;
     };
   }> {
-    const cacheKey = `inspections:pending:${JSON.stringify(options || {})}`;
+    const cacheKey = await CacheManager.versionedKey('inspections', buildCacheKey('pending', options));
     return executeQuery('getPendingInspections', async () => {
       // Build filter conditions
       const conditions = [eq(inspections.status, 'pending_review')];
@@ -381,7 +608,7 @@ export const storage = {
       const totalCount = Number(totalCountResult[0]?.count || 0);
       const totalPages = Math.ceil(totalCount / limit);
 
-      logger.info(`Retrieved ${inspectionsData.length} pending inspections (page ${page}/${totalPages})`, {
+      logger.debug(`Retrieved ${inspectionsData.length} pending inspections (page ${page}/${totalPages})`, {
         options,
         totalCount
       });
@@ -433,9 +660,7 @@ export const storage = {
       logger.info('Completed pending inspection:', { id });
 
       // Invalidate relevant cache entries
-      await CacheManager.delete(`inspection:${id}`);
-      await CacheManager.clearPattern('inspections:pending');
-      await CacheManager.clearPattern('inspections:list');
+      await invalidateNamespaces('inspections', 'scores');
 
       return result;
     });
@@ -466,9 +691,7 @@ export const storage = {
       logger.info('Discarded inspection:', { id });
 
       // Invalidate relevant cache entries
-      await CacheManager.delete(`inspection:${id}`);
-      await CacheManager.clearPattern('inspections:pending');
-      await CacheManager.clearPattern('inspections:list');
+      await invalidateNamespaces('inspections', 'scores');
 
       return result;
     });
@@ -481,7 +704,7 @@ export const storage = {
       logger.info('Created custodial note:', { id: result.id });
 
       // Invalidate relevant cache entries
-      await CacheManager.delete('custodialNotes:all');
+      await invalidateNamespaces('custodialNotes', 'scores');
 
       return result;
     });
@@ -494,7 +717,7 @@ export const storage = {
     startDate?: string;
     endDate?: string;
   }) {
-    const cacheKey = `custodialNotes:all:${JSON.stringify(options || {})}`;
+    const cacheKey = await CacheManager.versionedKey('custodialNotes', buildCacheKey('list', options));
     return executeQuery('getCustodialNotes', async () => {
       let query = db.select().from(custodialNotes);
 
@@ -530,28 +753,33 @@ export const storage = {
       }
 
       const result = await query;
-      logger.info(`Retrieved ${result.length} custodial notes`, { options });
+      logger.debug(`Retrieved ${result.length} custodial notes`, { options });
       return result;
     }, cacheKey, 60000); // 1 minute cache for list queries
   },
 
   async getCustodialNote(id: number) {
-    const cacheKey = `custodialNote:${id}`;
+    const cacheKey = await CacheManager.versionedKey('custodialNotes', `item:${id}`);
     return executeQuery('getCustodialNote', async () => {
       const [result] = await db.select().from(custodialNotes).where(eq(custodialNotes.id, id));
-      logger.info('Retrieved custodial note:', { id });
+      logger.debug('Retrieved custodial note:', { id });
       return result;
     }, cacheKey, 300000); // 5 minutes cache for single items
   },
 
   async deleteCustodialNote(id: number) {
     return executeQuery('deleteCustodialNote', async () => {
-      await db.delete(custodialNotes).where(eq(custodialNotes.id, id));
+      const [deleted] = await db.delete(custodialNotes)
+        .where(eq(custodialNotes.id, id))
+        .returning({ images: custodialNotes.images });
       logger.info('Deleted custodial note:', { id });
 
+      if (deleted) {
+        await releaseObjectUrls(deleted.images || []);
+      }
+
       // Invalidate relevant cache entries
-      await CacheManager.delete(`custodialNote:${id}`);
-      await CacheManager.clearPattern('custodialNotes:all');
+      await invalidateNamespaces('custodialNotes', 'scores');
 
       return true;
     });
@@ -564,7 +792,7 @@ export const storage = {
       logger.info('Created room inspection:', { id: result.id });
 
       // Invalidate relevant cache entries
-      await CacheManager.delete('roomInspections:all');
+      await invalidateNamespaces('roomInspections');
 
       return result;
     });
@@ -577,7 +805,7 @@ export const storage = {
     page?: number;
     limit?: number;
   }) {
-    const cacheKey = `roomInspections:list:${JSON.stringify(options || {})}`;
+    const cacheKey = await CacheManager.versionedKey('roomInspections', buildCacheKey('list', options));
     return executeQuery('getRoomInspections', async () => {
       // Build filter conditions
       const conditions = [];
@@ -641,7 +869,7 @@ export const storage = {
       const totalCount = Number(totalCountResult[0]?.count || 0);
       const totalPages = Math.ceil(totalCount / limit);
 
-      logger.info(`Retrieved ${roomData.length} room inspections (page ${page}/${totalPages})`, {
+      logger.debug(`Retrieved ${roomData.length} room inspections (page ${page}/${totalPages})`, {
         options,
         totalCount
       });
@@ -662,10 +890,10 @@ export const storage = {
   },
 
   async getRoomInspection(id: number) {
-    const cacheKey = `roomInspection:${id}`;
+    const cacheKey = await CacheManager.versionedKey('roomInspections', `item:${id}`);
     return executeQuery('getRoomInspection', async () => {
       const [result] = await db.select().from(roomInspections).where(eq(roomInspections.id, id));
-      logger.info('Retrieved room inspection:', { id });
+      logger.debug('Retrieved room inspection:', { id });
       return result;
     }, cacheKey, 300000); // 5 minutes cache for single items
   },
@@ -676,15 +904,22 @@ export const storage = {
 
   async updateRoomInspection(roomId: number, buildingInspectionId: number, data: Partial<InsertRoomInspection>) {
     return executeQuery('updateRoomInspection', async () => {
-      const [result] = await db.update(roomInspections)
-        .set(data)
-        .where(
-          and(
-            eq(roomInspections.id, roomId),
-            eq(roomInspections.buildingInspectionId, buildingInspectionId)
-          )
-        )
-        .returning();
+      const room = and(
+        eq(roomInspections.id, roomId),
+        eq(roomInspections.buildingInspectionId, buildingInspectionId)
+      );
+      // Same reference accounting as updateInspection
+      const { result, dropped } = await db.transaction(async (tx) => {
+        const [previous] = data.images === undefined
+          ? []
+          : await tx.select({ images: roomInspections.images }).from(roomInspections).where(room).for('update');
+        const [result] = await tx.update(roomInspections).set(data).where(room).returning();
+        const dropped = result && previous
+          ? await moveObjectReferences(tx, previous.images || [], result.images || [])
+          : new Map<string, number>();
+        return { result, dropped };
+      });
+      await releaseObjectReferences(dropped);
 
       if (!result) {
         logger.warn('Room inspection not found for update:', { roomId, buildingInspectionId });
@@ -694,9 +929,7 @@ export const storage = {
       logger.info('Updated room inspection:', { roomId, buildingInspectionId });
 
       // Invalidate relevant cache entries
-      await CacheManager.delete(`roomInspection:${roomId}`);
-      await CacheManager.delete(`roomInspections:all:${buildingInspectionId}`);
-      await CacheManager.clearPattern('roomInspections:all');
+      await invalidateNamespaces('roomInspections');
 
       return result;
     });
@@ -709,7 +942,7 @@ export const storage = {
       logger.info('Created monthly feedback:', { id: result.id, school: result.school });
 
       // Invalidate relevant cache entries
-      await CacheManager.delete('monthlyFeedback:all');
+      await invalidateNamespaces('monthlyFeedback');
 
       return result;
     });
@@ -733,7 +966,7 @@ export const storage = {
       hasPreviousPage: boolean;
     };
   }> {
-    const cacheKey = `monthlyFeedback:all:${JSON.stringify(options || {})}`;
+    const cacheKey = await CacheManager.versionedKey('monthlyFeedback', buildCacheKey('list', options));
     return executeQuery('getMonthlyFeedback', async () => {
       // Build filter conditions
       const conditions = [];
@@ -779,7 +1012,7 @@ export const storage = {
       const totalCount = Number(totalCountResult[0]?.count || 0);
       const totalPages = Math.ceil(totalCount / limit);
 
-      logger.info(`Retrieved ${feedbackData.length} monthly feedback documents (page ${page}/${totalPages})`, {
+      logger.debug(`Retrieved ${feedbackData.length} monthly feedback documents (page ${page}/${totalPages})`, {
         options,
         totalCount
       });
@@ -800,23 +1033,28 @@ export const storage = {
   },
 
   async getMonthlyFeedbackById(id: number) {
-    const cacheKey = `monthlyFeedback:${id}`;
+    const cacheKey = await CacheManager.versionedKey('monthlyFeedback', `item:${id}`);
     return executeQuery('getMonthlyFeedbackById', async () => {
       const [result] = await db.select().from(monthlyFeedback)
         .where(eq(monthlyFeedback.id, id));
-      logger.info('Retrieved monthly feedback:', { id });
+      logger.debug('Retrieved monthly feedback:', { id });
       return result;
     }, cacheKey, 300000); // 5 minutes cache for single items
   },
 
   async deleteMonthlyFeedback(id: number) {
     return executeQuery('deleteMonthlyFeedback', async () => {
-      await db.delete(monthlyFeedback).where(eq(monthlyFeedback.id, id));
+      const [deleted] = await db.delete(monthlyFeedback)
+        .where(eq(monthlyFeedback.id, id))
+        .returning({ pdfUrl: monthlyFeedback.pdfUrl });
       logger.info('Deleted monthly feedback:', { id });
 
+      if (deleted) {
+        await releaseObjectUrls([deleted.pdfUrl]);
+      }
+
       // Invalidate relevant cache entries
-      await CacheManager.delete(`monthlyFeedback:${id}`);
-      await CacheManager.clearPattern('monthlyFeedback:all');
+      await invalidateNamespaces('monthlyFeedback');
 
       return true;
     });
@@ -831,8 +1069,7 @@ export const storage = {
       logger.info('Updated monthly feedback notes:', { id });
 
       // Invalidate relevant cache entries
-      await CacheManager.delete(`monthlyFeedback:${id}`);
-      await CacheManager.clearPattern('monthlyFeedback:all');
+      await invalidateNamespaces('monthlyFeedback');
 
       return result;
     });
@@ -865,8 +1102,9 @@ export const storage = {
         await CacheManager.clearPattern(pattern);
         logger.info('Cleared cache entries matching pattern', { pattern });
       } else {
-        // Clear all cache - this would require implementation in CacheManager
-        logger.warn('Full cache clearing not implemented with Redis - use pattern-based clearing');
+        // Bumping every generation orphans all versioned keys; Redis TTLs reclaim them
+        await invalidateNamespaces(...CACHE_NAMESPACES);
+        logger.info('Invalidated all cache namespaces');
       }
     } catch (error) {
       logger.error('Failed to clear cache', { error, pattern });
@@ -881,6 +1119,7 @@ export const storage = {
       await this.getInspections({ limit: 50 });
       await this.getCustodialNotes({ limit: 50 });
       await this.getMonthlyFeedback();
+      await this.getSchoolComparison();
       logger.info('Cache warming completed');
     } catch (error) {
       logger.error('Cache warming failed', { error });
@@ -895,13 +1134,14 @@ export const storage = {
         const [photo] = await db.insert(inspectionPhotos)
           .values(photoData)
           .returning();
+        await invalidateNamespaces('inspectionPhotos');
         return photo;
-      },
-      `photo_${Date.now()}_${Math.random().toString(36).substr(2, 9)}`
+      }
     );
   },
 
   async getInspectionPhoto(photoId: number) {
+    const cacheKey = await CacheManager.versionedKey('inspectionPhotos', `item:${photoId}`);
     return executeQuery(
       'getInspectionPhoto',
       async () => {
@@ -911,11 +1151,12 @@ export const storage = {
           .limit(1);
         return photo;
       },
-      `inspection_photo_${photoId}`
+      cacheKey
     );
   },
 
   async getInspectionPhotosByInspectionId(inspectionId: number) {
+    const cacheKey = await CacheManager.versionedKey('inspectionPhotos', `inspection:${inspectionId}`);
     return executeQuery(
       'getInspectionPhotosByInspectionId',
       async () => {
@@ -925,12 +1166,13 @@ export const storage = {
           .orderBy(desc(inspectionPhotos.createdAt));
         return photos;
       },
-      `photos_inspection_${inspectionId}`,
+      cacheKey,
       10 * 60 * 1000 // 10 minute cache
     );
   },
 
   async getAllInspectionPhotos() {
+    const cacheKey = await CacheManager.versionedKey('inspectionPhotos', 'all');
     return executeQuery(
       'getAllInspectionPhotos',
       async () => {
@@ -939,11 +1181,96 @@ export const storage = {
           .orderBy(desc(inspectionPhotos.createdAt));
         return photos;
       },
-      'all_photos',
+      cacheKey,
       5 * 60 * 1000 // 5 minute cache
     );
   },
 
+  /**
+   * Photo sync counts overall, per school and per inspection. Only the
+   * inspectionLimit inspections with the most pending or failed photos are
+   * broken out, and that limit is applied in SQL, so the result stays the
+   * same size however large the backlog grows.
+   */
+  async getPhotoSyncStatus(inspectionLimit: number = 100) {
+    const cacheKey = await CacheManager.versionedKey('inspectionPhotos', buildCacheKey('sync-status', { inspectionLimit }));
+    return executeQuery(
+      'getPhotoSyncStatus',
+      async () => {
+        const [summary, inspectionRows] = await Promise.all([
+          // One row overall plus one per school
+          db.execute(sql`
+            SELECT
+              GROUPING(i.school) AS grouping_level,
+              i.school,
+              COUNT(*)::int AS total,
+              COUNT(*) FILTER (WHERE p.sync_status = 'pending')::int AS pending,
+              COUNT(*) FILTER (WHERE p.sync_status = 'synced')::int AS synced,
+              COUNT(*) FILTER (WHERE p.sync_status = 'failed')::int AS failed,
+              MAX(p.updated_at) AS last_sync_time
+            FROM inspection_photos p
+            LEFT JOIN inspections i ON i.id = p.inspection_id
+            GROUP BY GROUPING SETS ((), (i.school))
+            ORDER BY grouping_level DESC, i.school
+          `),
+          // The backlog is found through the sync_status index; only the top
+          // inspections are then counted in full
+          db.execute(sql`
+            WITH backlog AS (
+              SELECT inspection_id, COUNT(*) AS unsynced
+              FROM inspection_photos
+              WHERE sync_status IN ('pending', 'failed') AND inspection_id IS NOT NULL
+              GROUP BY inspection_id
+              ORDER BY unsynced DESC, inspection_id
+              LIMIT ${inspectionLimit}
+            )
+            SELECT
+              i.school,
+              b.inspection_id,
+              COUNT(*)::int AS total,
+              COUNT(*) FILTER (WHERE p.sync_status = 'pending')::int AS pending,
+              COUNT(*) FILTER (WHERE p.sync_status = 'synced')::int AS synced,
+              COUNT(*) FILTER (WHERE p.sync_status = 'failed')::int AS failed,
+              MAX(p.updated_at) AS last_sync_time
+            FROM backlog b
+            JOIN inspection_photos p ON p.inspection_id = b.inspection_id
+            LEFT JOIN inspections i ON i.id = b.inspection_id
+            GROUP BY i.school, b.inspection_id, b.unsynced
+            ORDER BY b.unsynced DESC, b.inspection_id
+          `),
+        ]);
+
+        const toCounts = (row: any) => ({
+          total: Number(row.total),
+          pending: Number(row.pending),
+          synced: Number(row.synced),
+          failed: Number(row.failed),
+          lastSyncTime: row.last_sync_time ? new Date(row.last_sync_time).getTime() : null,
+        });
+
+        let totals = { total: 0, pending: 0, synced: 0, failed: 0, lastSyncTime: null as number | null };
+        const bySchool: Array<ReturnType<typeof toCounts> & { school: string | null }> = [];
+        for (const row of summary.rows as any[]) {
+          if (Number(row.grouping_level) === 1) {
+            totals = toCounts(row);
+          } else {
+            bySchool.push({ school: row.school, ...toCounts(row) });
+          }
+        }
+
+        const byInspection = (inspectionRows.rows as any[]).map(row => ({
+          school: row.school as string | null,
+          inspectionId: Number(row.inspection_id),
+          ...toCounts(row),
+        }));
+
+        return { ...totals, bySchool, byInspection };
+      },
+      cacheKey,
+      30 * 1000 // Short TTL; photo writes also bump the namespace generation
+    );
+  },
+
   async updateInspectionPhoto(photoId: number, updateData: Partial<InsertInspectionPhoto>) {
     return executeQuery(
       'updateInspectionPhoto',
@@ -952,9 +1279,9 @@ export const storage = {
           .set(updateData)
           .where(eq(inspectionPhotos.id, photoId))
           .returning();
+        await invalidateNamespaces('inspectionPhotos');
         return photo;
-      },
-      `update_photo_${photoId}`
+      }
     );
   },
 
@@ -962,13 +1289,91 @@ export const storage = {
     return executeQuery(
       'deleteInspectionPhoto',
       async () => {
-        await db.delete(inspectionPhotos)
-          .where(eq(inspectionPhotos.id, photoId));
-      },
-      `delete_photo_${photoId}`
+        const [deleted] = await db.delete(inspectionPhotos)
+          .where(eq(inspectionPhotos.id, photoId))
+          .returning({ photoUrl: inspectionPhotos.photoUrl });
+        await invalidateNamespaces('inspectionPhotos');
+
+        // The thumbnail is a derivative of the photo blob and goes with it
+        if (deleted) {
+          await releaseObjectUrls([deleted.photoUrl]);
+        }
+      }
     );
   },
 
+  // Content-addressed object blobs
+  async acquireObjectBlob(blob: { sha256: string; path: string; size: number; contentType: string }) {
+    return executeQuery('acquireObjectBlob', async () => {
+      const [row] = await db.insert(objectBlobs)
+        .values({ ...blob, refCount: 1 })
+        .onConflictDoUpdate({
+          target: objectBlobs.sha256,
+          set: { refCount: sql`${objectBlobs.refCount} + 1`, updatedAt: new Date() }
+        })
+        .returning();
+      return row;
+    });
+  },
+
+  async releaseObjectUrls(urls: Array<string | null | undefined>) {
+    return releaseObjectUrls(urls);
+  },
+
+  /**
+   * Visit every object URL or storage path the database references, paging
+   * each source table by key so memory stays flat. Returns the rows scanned.
+   */
+  async forEachObjectReference(visit: (reference: string) => void, pageSize: number = 1000): Promise<number> {
+    const scans: Array<() => Promise<number>> = [
+      () => scanReferencePages<number, { key: number; images: string[] | null }>(
+        after => db.select({ key: inspections.id, images: inspections.images }).from(inspections)
+          .where(gt(inspections.id, after ?? 0)).orderBy(asc(inspections.id)).limit(pageSize),
+        row => row.images || [],
+        visit
+      ),
+      () => scanReferencePages<number, { key: number; images: string[] | null }>(
+        after => db.select({ key: roomInspections.id, images: roomInspections.images }).from(roomInspections)
+          .where(gt(roomInspections.id, after ?? 0)).orderBy(asc(roomInspections.id)).limit(pageSize),
+        row => row.images || [],
+        visit
+      ),
+      () => scanReferencePages<number, { key: number; images: string[] | null }>(
+        after => db.select({ key: custodialNotes.id, images: custodialNotes.images }).from(custodialNotes)
+          .where(gt(custodialNotes.id, after ?? 0)).orderBy(asc(custodialNotes.id)).limit(pageSize),
+        row => row.images || [],
+        visit
+      ),
+      () => scanReferencePages<number, { key: number; photoUrl: string; thumbnailUrl: string | null }>(
+        after => db.select({ key: inspectionPhotos.id, photoUrl: inspectionPhotos.photoUrl, thumbnailUrl: inspectionPhotos.thumbnailUrl })
+          .from(inspectionPhotos)
+          .where(gt(inspectionPhotos.id, after ?? 0)).orderBy(asc(inspectionPhotos.id)).limit(pageSize),
+        row => [row.photoUrl, row.thumbnailUrl],
+        visit
+      ),
+      () => scanReferencePages<number, { key: number; pdfUrl: string }>(
+        after => db.select({ key: monthlyFeedback.id, pdfUrl: monthlyFeedback.pdfUrl }).from(monthlyFeedback)
+          .where(gt(monthlyFeedback.id, after ?? 0)).orderBy(asc(monthlyFeedback.id)).limit(pageSize),
+        row => [row.pdfUrl],
+        visit
+      ),
+      // Content-addressed blobs are kept alive by their reference count
+      () => scanReferencePages<string, { key: string; path: string }>(
+        after => db.select({ key: objectBlobs.sha256, path: objectBlobs.path }).from(objectBlobs)
+          .where(after === null ? undefined : gt(objectBlobs.sha256, after)).orderBy(asc(objectBlobs.sha256)).limit(pageSize),
+        row => [row.path],
+        visit
+      ),
+    ];
+
+    // One table at a time keeps a single page in memory
+    let rows = 0;
+    for (const scan of scans) {
+      rows += await scan();
+    }
+    return rows;
+  },
+
   // Sync queue methods
   async createSyncQueue(queueData: InsertSyncQueue) {
     return executeQuery(
@@ -978,28 +1383,91 @@ export const storage = {
           .values(queueData)
           .returning();
         return queueItem;
-      },
-      `sync_queue_${Date.now()}_${Math.random().toString(36).substr(2, 9)}`
+      }
     );
   },
 
+  // Queue state changes constantly, so listings are not cached
   async getSyncQueueItems(status?: string) {
     return executeQuery(
       'getSyncQueueItems',
       async () => {
-        let query = db.select()
+        const items = await db.select()
           .from(syncQueue)
+          .where(status ? eq(syncQueue.status, status) : undefined)
           .orderBy(desc(syncQueue.createdAt));
+        return items;
+      }
+    );
+  },
 
-        if (status) {
-          query = query.where(eq(syncQueue.type, status));
-        }
+  /**
+   * Claim up to batchSize due items for this worker. SKIP LOCKED lets several
+   * workers claim concurrently without blocking; items left in 'processing'
+   * longer than staleLockMs (e.g. after a crash) are reclaimed.
+   */
+  async claimSyncQueueBatch(batchSize: number, staleLockMs: number) {
+    return executeQuery(
+      'claimSyncQueueBatch',
+      async () => {
+        const now = new Date();
+        return db.transaction(async (tx) => {
+          const due = await tx.select({ id: syncQueue.id })
+            .from(syncQueue)
+            .where(or(
+              and(
+                eq(syncQueue.status, 'pending'),
+                or(isNull(syncQueue.nextRetryAt), lte(syncQueue.nextRetryAt, now))
+              ),
+              and(
+                eq(syncQueue.status, 'processing'),
+                lt(syncQueue.lockedAt, new Date(now.getTime() - staleLockMs))
+              )
+            ))
+            .orderBy(asc(syncQueue.createdAt))
+            .limit(batchSize)
+            .for('update', { skipLocked: true });
+
+          if (due.length === 0) {
+            return [];
+          }
+
+          return tx.update(syncQueue)
+            .set({ status: 'processing', lockedAt: now })
+            .where(inArray(syncQueue.id, due.map(item => item.id)))
+            .returning();
+        });
+      }
+    );
+  },
 
-        const items = await query;
-        return items;
-      },
-      `sync_queue_${status || 'all'}`,
-      5 * 60 * 1000 // 5 minute cache
+  /**
+   * Queue depth per status and the age of the oldest due item
+   */
+  async getSyncQueueMetrics() {
+    return executeQuery(
+      'getSyncQueueMetrics',
+      async () => {
+        const result = await db.execute(sql`
+          SELECT
+            COUNT(*) FILTER (WHERE status = 'pending')::int AS pending,
+            COUNT(*) FILTER (WHERE status = 'pending' AND (next_retry_at IS NULL OR next_retry_at <= NOW()))::int AS due,
+            COUNT(*) FILTER (WHERE status = 'processing')::int AS processing,
+            COUNT(*) FILTER (WHERE status = 'failed')::int AS failed,
+            EXTRACT(EPOCH FROM NOW() - MIN(created_at) FILTER (WHERE status IN ('pending', 'processing'))) AS oldest_age_seconds
+          FROM sync_queue
+        `);
+        const row = (result.rows[0] || {}) as any;
+        return {
+          pending: Number(row.pending || 0),
+          due: Number(row.due || 0),
+          processing: Number(row.processing || 0),
+          failed: Number(row.failed || 0),
+          oldestAgeSeconds: row.oldest_age_seconds !== null && row.oldest_age_seconds !== undefined
+            ? Math.round(Number(row.oldest_age_seconds))
+            : null,
+        };
+      }
     );
   },
 
@@ -1012,8 +1480,7 @@ export const storage = {
           .where(eq(syncQueue.id, queueId))
           .returning();
         return queueItem;
-      },
-      `update_sync_queue_${queueId}`
+      }
     );
   },
 
@@ -1023,8 +1490,7 @@ export const storage = {
       async () => {
         await db.delete(syncQueue)
           .where(eq(syncQueue.id, queueId));
-      },
-      `delete_sync_queue_${queueId}`
+      }
     );
   },
 
@@ -1035,64 +1501,62 @@ export const storage = {
     avgRating: number;
     inspectionCount: number;
   }>> {
-    const cacheKey = `analytics_trends_${school}_${months}`;
-    const cached = await CacheManager.get(cacheKey);
-    if (cached !== null) return cached as any;
-
-    const rows = await db.execute(sql`
-      SELECT
-        to_char(date_trunc('month', created_at), 'YYYY-MM') AS month,
-        ROUND(
-          AVG(
-            NULLIF(
-              (
-                COALESCE(floors, 0) +
-                COALESCE(vertical_horizontal_surfaces, 0) +
-                COALESCE(ceiling, 0) +
-                COALESCE(restrooms, 0) +
-                COALESCE(customer_satisfaction, 0) +
-                COALESCE(trash, 0) +
-                COALESCE(project_cleaning, 0) +
-                COALESCE(activity_support, 0) +
-                COALESCE(safety_compliance, 0) +
-                COALESCE(equipment, 0) +
-                COALESCE(monitoring, 0)
-              )::numeric /
+    const cacheKey = await CacheManager.versionedKey('scores', buildCacheKey('trends', { school, months }));
+    return executeQuery('getSchoolTrends', async () => {
+      const rows = await db.execute(sql`
+        SELECT
+          to_char(date_trunc('month', created_at), 'YYYY-MM') AS month,
+          ROUND(
+            AVG(
               NULLIF(
-                (CASE WHEN floors IS NOT NULL THEN 1 ELSE 0 END +
-                 CASE WHEN vertical_horizontal_surfaces IS NOT NULL THEN 1 ELSE 0 END +
-                 CASE WHEN ceiling IS NOT NULL THEN 1 ELSE 0 END +
-                 CASE WHEN restrooms IS NOT NULL THEN 1 ELSE 0 END +
-                 CASE WHEN customer_satisfaction IS NOT NULL THEN 1 ELSE 0 END +
-                 CASE WHEN trash IS NOT NULL THEN 1 ELSE 0 END +
-                 CASE WHEN project_cleaning IS NOT NULL THEN 1 ELSE 0 END +
-                 CASE WHEN activity_support IS NOT NULL THEN 1 ELSE 0 END +
-                 CASE WHEN safety_compliance IS NOT NULL THEN 1 ELSE 0 END +
-                 CASE WHEN equipment IS NOT NULL THEN 1 ELSE 0 END +
-                 CASE WHEN monitoring IS NOT NULL THEN 1 ELSE 0 END
-                ), 0
-              )
-            , 0)
-          )::numeric,
-          2
-        ) AS avg_rating,
-        COUNT(*) AS inspection_count
-      FROM inspections
-      WHERE school = ${school}
-        AND status = 'completed'
-        AND created_at >= NOW() - (${months} || ' months')::interval
-      GROUP BY date_trunc('month', created_at)
-      ORDER BY date_trunc('month', created_at)
-    `);
+                (
+                  COALESCE(floors, 0) +
+                  COALESCE(vertical_horizontal_surfaces, 0) +
+                  COALESCE(ceiling, 0) +
+                  COALESCE(restrooms, 0) +
+                  COALESCE(customer_satisfaction, 0) +
+                  COALESCE(trash, 0) +
+                  COALESCE(project_cleaning, 0) +
+                  COALESCE(activity_support, 0) +
+                  COALESCE(safety_compliance, 0) +
+                  COALESCE(equipment, 0) +
+                  COALESCE(monitoring, 0)
+                )::numeric /
+                NULLIF(
+                  (CASE WHEN floors IS NOT NULL THEN 1 ELSE 0 END +
+                   CASE WHEN vertical_horizontal_surfaces IS NOT NULL THEN 1 ELSE 0 END +
+                   CASE WHEN ceiling IS NOT NULL THEN 1 ELSE 0 END +
+                   CASE WHEN restrooms IS NOT NULL THEN 1 ELSE 0 END +
+                   CASE WHEN customer_satisfaction IS NOT NULL THEN 1 ELSE 0 END +
+                   CASE WHEN trash IS NOT NULL THEN 1 ELSE 0 END +
+                   CASE WHEN project_cleaning IS NOT NULL THEN 1 ELSE 0 END +
+                   CASE WHEN activity_support IS NOT NULL THEN 1 ELSE 0 END +
+                   CASE WHEN safety_compliance IS NOT NULL THEN 1 ELSE 0 END +
+                   CASE WHEN equipment IS NOT NULL THEN 1 ELSE 0 END +
+                   CASE WHEN monitoring IS NOT NULL THEN 1 ELSE 0 END
+                  ), 0
+                )
+              , 0)
+            )::numeric,
+            2
+          ) AS avg_rating,
+          COUNT(*) AS inspection_count
+        FROM inspections
+        WHERE school = ${school}
+          AND status = 'completed'
+          AND created_at >= NOW() - (${months} || ' months')::interval
+        GROUP BY date_trunc('month', created_at)
+        ORDER BY date_trunc('month', created_at)
+      `);
+
+      const result = (rows as any[]).map((row: any) => ({
+        month: row.month as string,
+        avgRating: parseFloat(row.avg_rating ?? '0'),
+        inspectionCount: parseInt(row.inspection_count ?? '0', 10),
+      }));
 
-    const result = (rows as any[]).map((row: any) => ({
-      month: row.month as string,
-      avgRating: parseFloat(row.avg_rating ?? '0'),
-      inspectionCount: parseInt(row.inspection_count ?? '0', 10),
-    }));
-
-    await CacheManager.set(cacheKey, result, 10 * 60 * 1000);
-    return result;
+      return result;
+    }, cacheKey, 10 * 60 * 1000); // 10 minutes
   },
 
   async getSchoolComparison(startDate?: string, endDate?: string): Promise<Array<{
@@ -1101,69 +1565,67 @@ export const storage = {
     inspectionCount: number;
     completedCount: number;
   }>> {
-    const cacheKey = `analytics_comparison_${startDate ?? 'none'}_${endDate ?? 'none'}`;
-    const cached = await CacheManager.get(cacheKey);
-    if (cached !== null) return cached as any;
-
-    const startCondition = startDate ? sql`AND created_at >= ${startDate}::date` : sql``;
-    const endCondition = endDate ? sql`AND created_at <= (${endDate}::date + interval '1 day')` : sql``;
-
-    const rows = await db.execute(sql`
-      SELECT
-        school,
-        ROUND(
-          AVG(
-            NULLIF(
-              (
-                COALESCE(floors, 0) +
-                COALESCE(vertical_horizontal_surfaces, 0) +
-                COALESCE(ceiling, 0) +
-                COALESCE(restrooms, 0) +
-                COALESCE(customer_satisfaction, 0) +
-                COALESCE(trash, 0) +
-                COALESCE(project_cleaning, 0) +
-                COALESCE(activity_support, 0) +
-                COALESCE(safety_compliance, 0) +
-                COALESCE(equipment, 0) +
-                COALESCE(monitoring, 0)
-              )::numeric /
+    const cacheKey = await CacheManager.versionedKey('scores', buildCacheKey('comparison', { startDate, endDate }));
+    return executeQuery('getSchoolComparison', async () => {
+      const startCondition = startDate ? sql`AND created_at >= ${startDate}::date` : sql``;
+      const endCondition = endDate ? sql`AND created_at <= (${endDate}::date + interval '1 day')` : sql``;
+
+      const rows = await db.execute(sql`
+        SELECT
+          school,
+          ROUND(
+            AVG(
               NULLIF(
-                (CASE WHEN floors IS NOT NULL THEN 1 ELSE 0 END +
-                 CASE WHEN vertical_horizontal_surfaces IS NOT NULL THEN 1 ELSE 0 END +
-                 CASE WHEN ceiling IS NOT NULL THEN 1 ELSE 0 END +
-                 CASE WHEN restrooms IS NOT NULL THEN 1 ELSE 0 END +
-                 CASE WHEN customer_satisfaction IS NOT NULL THEN 1 ELSE 0 END +
-                 CASE WHEN trash IS NOT NULL THEN 1 ELSE 0 END +
-                 CASE WHEN project_cleaning IS NOT NULL THEN 1 ELSE 0 END +
-                 CASE WHEN activity_support IS NOT NULL THEN 1 ELSE 0 END +
-                 CASE WHEN safety_compliance IS NOT NULL THEN 1 ELSE 0 END +
-                 CASE WHEN equipment IS NOT NULL THEN 1 ELSE 0 END +
-                 CASE WHEN monitoring IS NOT NULL THEN 1 ELSE 0 END
-                ), 0
-              )
-            , 0)
-          )::numeric,
-          2
-        ) AS avg_rating,
-        COUNT(*) AS inspection_count,
-        COUNT(*) FILTER (WHERE status = 'completed') AS completed_count
-      FROM inspections
-      WHERE 1=1
-        ${startCondition}
-        ${endCondition}
-      GROUP BY school
-      ORDER BY school
-    `);
-
-    const result = (rows as any[]).map((row: any) => ({
-      school: row.school as string,
-      avgRating: parseFloat(row.avg_rating ?? '0'),
-      inspectionCount: parseInt(row.inspection_count ?? '0', 10),
-      completedCount: parseInt(row.completed_count ?? '0', 10),
-    }));
+                (
+                  COALESCE(floors, 0) +
+                  COALESCE(vertical_horizontal_surfaces, 0) +
+                  COALESCE(ceiling, 0) +
+                  COALESCE(restrooms, 0) +
+                  COALESCE(customer_satisfaction, 0) +
+                  COALESCE(trash, 0) +
+                  COALESCE(project_cleaning, 0) +
+                  COALESCE(activity_support, 0) +
+                  COALESCE(safety_compliance, 0) +
+                  COALESCE(equipment, 0) +
+                  COALESCE(monitoring, 0)
+                )::numeric /
+                NULLIF(
+                  (CASE WHEN floors IS NOT NULL THEN 1 ELSE 0 END +
+                   CASE WHEN vertical_horizontal_surfaces IS NOT NULL THEN 1 ELSE 0 END +
+                   CASE WHEN ceiling IS NOT NULL THEN 1 ELSE 0 END +
+                   CASE WHEN restrooms IS NOT NULL THEN 1 ELSE 0 END +
+                   CASE WHEN customer_satisfaction IS NOT NULL THEN 1 ELSE 0 END +
+                   CASE WHEN trash IS NOT NULL THEN 1 ELSE 0 END +
+                   CASE WHEN project_cleaning IS NOT NULL THEN 1 ELSE 0 END +
+                   CASE WHEN activity_support IS NOT NULL THEN 1 ELSE 0 END +
+                   CASE WHEN safety_compliance IS NOT NULL THEN 1 ELSE 0 END +
+                   CASE WHEN equipment IS NOT NULL THEN 1 ELSE 0 END +
+                   CASE WHEN monitoring IS NOT NULL THEN 1 ELSE 0 END
+                  ), 0
+                )
+              , 0)
+            )::numeric,
+            2
+          ) AS avg_rating,
+          COUNT(*) AS inspection_count,
+          COUNT(*) FILTER (WHERE status = 'completed') AS completed_count
+        FROM inspections
+        WHERE 1=1
+          ${startCondition}
+          ${endCondition}
+        GROUP BY school
+        ORDER BY school
+      `);
+
+      const result = (rows as any[]).map((row: any) => ({
+        school: row.school as string,
+        avgRating: parseFloat(row.avg_rating ?? '0'),
+        inspectionCount: parseInt(row.inspection_count ?? '0', 10),
+        completedCount: parseInt(row.completed_count ?? '0', 10),
+      }));
 
-    await CacheManager.set(cacheKey, result, 10 * 60 * 1000);
-    return result;
+      return result;
+    }, cacheKey, 10 * 60 * 1000); // 10 minutes
   },
 
   async getInspectionsCsvRows(school?: string, startDate?: string, endDate?: string): Promise<Array<Record<string, any>>> {
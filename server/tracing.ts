@@ -0,0 +1,365 @@
+import { AsyncLocalStorage } from 'async_hooks';
+import { randomBytes } from 'crypto';
+import { promises as fs } from 'fs';
+import * as path from 'path';
+import { performance } from 'perf_hooks';
+import type { Request, Response, NextFunction } from 'express';
+import { logger } from './logger';
+import { getRouteTemplate } from './monitoring';
+
+/**
+ * Lightweight request tracing in OpenTelemetry format
+ *
+ * A request span is started for sampled requests (TRACE_SAMPLE_RATIO, or the
+ * sampled flag of an incoming W3C traceparent header) and carried through
+ * AsyncLocalStorage. Child spans come from instrumented middleware, cache
+ * calls, pool queries, object storage and image work. Unsampled requests
+ * skip all span bookkeeping. Finished spans are batched and exported as
+ * OTLP/JSON, either appended to a local NDJSON file or POSTed to an OTLP
+ * HTTP collector.
+ */
+
+const TRACE_EXPORTER = (process.env.TRACE_EXPORTER || 'none') as 'none' | 'file' | 'otlp';
+const TRACE_SAMPLE_RATIO = Math.min(1, Math.max(0, parseFloat(process.env.TRACE_SAMPLE_RATIO || '0.1')));
+const TRACE_FILE = process.env.TRACE_FILE || path.join(process.cwd(), 'logs', 'traces.ndjson');
+const TRACE_OTLP_ENDPOINT = process.env.TRACE_OTLP_ENDPOINT || 'http://localhost:4318/v1/traces';
+const SERVICE_NAME = process.env.TRACE_SERVICE_NAME || 'custodial-command';
+const FLUSH_INTERVAL_MS = 5000;
+const MAX_BATCH_SIZE = 512;
+const MAX_BUFFERED_SPANS = 5000;
+
+const TRACEPARENT_PATTERN = /^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$/;
+
+// OTLP SpanKind / StatusCode values
+const SPAN_KIND = { internal: 1, server: 2, client: 3 } as const;
+type SpanKind = keyof typeof SPAN_KIND;
+type AttributeValue = string | number | boolean | undefined;
+
+interface FinishedSpan {
+  traceId: string;
+  spanId: string;
+  parentSpanId?: string;
+  name: string;
+  kind: SpanKind;
+  startTimeUnixNano: bigint;
+  endTimeUnixNano: bigint;
+  attributes: Record<string, AttributeValue>;
+  error?: string;
+}
+
+function nowUnixNano(): bigint {
+  return BigInt(Math.round((performance.timeOrigin + performance.now()) * 1e6));
+}
+
+export class Span {
+  readonly traceId: string;
+  readonly spanId: string;
+  readonly parentSpanId?: string;
+  readonly name: string;
+  readonly kind: SpanKind;
+  readonly attributes: Record<string, AttributeValue>;
+  private readonly start = nowUnixNano();
+  private ended = false;
+
+  constructor(traceId: string, parentSpanId: string | undefined, name: string, kind: SpanKind, attributes: Record<string, AttributeValue> = {}) {
+    this.traceId = traceId;
+    this.spanId = randomBytes(8).toString('hex');
+    this.parentSpanId = parentSpanId;
+    this.name = name;
+    this.kind = kind;
+    this.attributes = attributes;
+  }
+
+  setAttribute(key: string, value: AttributeValue): void {
+    this.attributes[key] = value;
+  }
+
+  /**
+   * Finish the span; later calls are ignored
+   */
+  end(error?: unknown, name?: string): void {
+    if (this.ended) return;
+    this.ended = true;
+    exporter.enqueue({
+      traceId: this.traceId,
+      spanId: this.spanId,
+      parentSpanId: this.parentSpanId,
+      name: name || this.name,
+      kind: this.kind,
+      startTimeUnixNano: this.start,
+      endTimeUnixNano: nowUnixNano(),
+      attributes: this.attributes,
+      error: error ? (error instanceof Error ? error.message : String(error)) : undefined,
+    });
+  }
+}
+
+function toOtlpAttributes(attributes: Record<string, AttributeValue>) {
+  const result: Array<{ key: string; value: Record<string, unknown> }> = [];
+  for (const [key, value] of Object.entries(attributes)) {
+    if (value === undefined) continue;
+    if (typeof value === 'boolean') result.push({ key, value: { boolValue: value } });
+    else if (typeof value === 'number') {
+      result.push({ key, value: Number.isInteger(value) ? { intValue: String(value) } : { doubleValue: value } });
+    } else result.push({ key, value: { stringValue: value } });
+  }
+  return result;
+}
+
+class SpanExporter {
+  private buffer: FinishedSpan[] = [];
+  private timer: NodeJS.Timeout | null = null;
+  private flushing: Promise<void> | null = null;
+  private stats = { exported: 0, dropped: 0, failures: 0 };
+
+  enqueue(span: FinishedSpan): void {
+    if (this.buffer.length >= MAX_BUFFERED_SPANS) {
+      this.stats.dropped++;
+      return;
+    }
+    this.buffer.push(span);
+    if (this.buffer.length >= MAX_BATCH_SIZE) {
+      this.flushBatch().catch(() => undefined);
+    } else if (!this.timer) {
+      this.timer = setTimeout(() => {
+        this.timer = null;
+        this.flush().catch(() => undefined);
+      }, FLUSH_INTERVAL_MS);
+      this.timer.unref();
+    }
+  }
+
+  getStats() {
+    return { ...this.stats, buffered: this.buffer.length };
+  }
+
+  /**
+   * Export everything buffered (used on shutdown)
+   */
+  async flush(): Promise<void> {
+    while (this.buffer.length > 0 || this.flushing) {
+      await this.flushBatch();
+    }
+  }
+
+  private flushBatch(): Promise<void> {
+    if (this.flushing) return this.flushing;
+    if (this.buffer.length === 0) return Promise.resolve();
+
+    const batch = this.buffer.splice(0, MAX_BATCH_SIZE);
+    this.flushing = this.export(batch)
+      .then(() => {
+        this.stats.exported += batch.length;
+      })
+      .catch((error) => {
+        this.stats.failures++;
+        this.stats.dropped += batch.length;
+        logger.warn('Trace export failed', {
+          exporter: TRACE_EXPORTER,
+          spans: batch.length,
+          error: error instanceof Error ? error.message : 'Unknown error',
+        });
+      })
+      .finally(() => {
+        this.flushing = null;
+      });
+    return this.flushing;
+  }
+
+  private async export(batch: FinishedSpan[]): Promise<void> {
+    const body = JSON.stringify({
+      resourceSpans: [{
+        resource: { attributes: toOtlpAttributes({ 'service.name': SERVICE_NAME, 'process.pid': process.pid }) },
+        scopeSpans: [{
+          scope: { name: 'custodial-command.tracing' },
+          spans: batch.map(span => ({
+            traceId: span.traceId,
+            spanId: span.spanId,
+            parentSpanId: span.parentSpanId,
+            name: span.name,
+            kind: SPAN_KIND[span.kind],
+            startTimeUnixNano: span.startTimeUnixNano.toString(),
+            endTimeUnixNano: span.endTimeUnixNano.toString(),
+            attributes: toOtlpAttributes(span.attributes),
+            status: span.error ? { code: 2, message: span.error } : { code: 1 },
+          })),
+        }],
+      }],
+    });
+
+    if (TRACE_EXPORTER === 'otlp') {
+      const response = await fetch(TRACE_OTLP_ENDPOINT, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body,
+        signal: AbortSignal.timeout(5000),
+      });
+      if (!response.ok) {
+        throw new Error(`Collector responded ${response.status}`);
+      }
+      return;
+    }
+
+    await fs.mkdir(path.dirname(TRACE_FILE), { recursive: true });
+    await fs.appendFile(TRACE_FILE, body + '\n');
+  }
+}
+
+const exporter = new SpanExporter();
+const activeSpan = new AsyncLocalStorage<Span>();
+
+class Tracer {
+  readonly enabled = TRACE_EXPORTER !== 'none' && TRACE_SAMPLE_RATIO > 0;
+
+  /**
+   * Span of the current async context, if the request is sampled
+   */
+  currentSpan(): Span | undefined {
+    return this.enabled ? activeSpan.getStore() : undefined;
+  }
+
+  /**
+   * Start a child of the current span without making it current (for leaf work)
+   */
+  startSpan(name: string, attributes?: Record<string, AttributeValue>, kind: SpanKind = 'internal'): Span | null {
+    const parent = this.currentSpan();
+    if (!parent) return null;
+    return new Span(parent.traceId, parent.spanId, name, kind, attributes);
+  }
+
+  /**
+   * Run fn inside a child span of the current one; a plain call when unsampled
+   */
+  async withSpan<T>(
+    name: string,
+    attributes: Record<string, AttributeValue> | undefined,
+    fn: () => Promise<T>,
+    kind: SpanKind = 'internal',
+  ): Promise<T> {
+    const span = this.startSpan(name, attributes, kind);
+    if (!span) return fn();
+    try {
+      const result = await activeSpan.run(span, fn);
+      span.end();
+      return result;
+    } catch (error) {
+      span.end(error);
+      throw error;
+    }
+  }
+
+  /**
+   * Express middleware that opens the request span; must run before anything traced
+   */
+  middleware() {
+    return (req: Request, res: Response, next: NextFunction) => {
+      if (!this.enabled) return next();
+
+      const parent = TRACEPARENT_PATTERN.exec(String(req.headers.traceparent || ''));
+      const sampled = parent ? (parseInt(parent[3], 16) & 1) === 1 : Math.random() < TRACE_SAMPLE_RATIO;
+      if (!sampled) return next();
+
+      const traceId = parent ? parent[1] : randomBytes(16).toString('hex');
+      const span = new Span(traceId, parent?.[2], `${req.method} request`, 'server', {
+        'http.method': req.method,
+        'http.target': req.originalUrl.split('?')[0],
+        'http.user_agent': req.headers['user-agent'],
+        'request.id': (req as any).requestId,
+      });
+      res.setHeader('traceresponse', `00-${traceId}-${span.spanId}-01`);
+
+      const finish = () => {
+        span.setAttribute('http.status_code', res.statusCode);
+        span.setAttribute('http.route', getRouteTemplate(req));
+        span.end(res.statusCode >= 500 ? `HTTP ${res.statusCode}` : undefined, `${req.method} ${getRouteTemplate(req)}`);
+      };
+      res.once('finish', finish);
+      res.once('close', finish);
+      activeSpan.run(span, next);
+    };
+  }
+
+  /**
+   * Wrap a middleware in a span that ends when it calls next() or the response ends.
+   * Downstream middleware runs as a sibling, under the request span.
+   */
+  wrapMiddleware(name: string, middleware: Function): Function {
+    if (!this.enabled) return middleware;
+    const tracer = this;
+
+    if (middleware.length === 4) {
+      const wrappedErrorHandler = (error: unknown, req: Request, res: Response, next: NextFunction) => {
+        const span = tracer.startSpan(`middleware ${name}`, { 'middleware.name': name });
+        if (!span) return middleware(error, req, res, next);
+        return tracer.runMiddleware(span, res, next, (wrappedNext) => middleware(error, req, res, wrappedNext));
+      };
+      return wrappedErrorHandler;
+    }
+
+    const wrapped = (req: Request, res: Response, next: NextFunction) => {
+      const span = tracer.startSpan(`middleware ${name}`, { 'middleware.name': name });
+      if (!span) return middleware(req, res, next);
+      return tracer.runMiddleware(span, res, next, (wrappedNext) => middleware(req, res, wrappedNext));
+    };
+    return wrapped;
+  }
+
+  /**
+   * Replace async methods on an object (or a class, for static methods) with traced versions
+   */
+  traceMethods(target: any, prefix: string, methods: readonly string[]): void {
+    if (!this.enabled) return;
+    for (const method of methods) {
+      const original = target[method];
+      if (typeof original !== 'function') continue;
+      const spanName = `${prefix}.${method}`;
+      const tracer = this;
+      target[method] = function traced(this: unknown, ...args: any[]) {
+        if (!tracer.currentSpan()) return original.apply(this, args);
+        const key = typeof args[0] === 'string' ? args[0].slice(0, 200) : undefined;
+        return tracer.withSpan(spanName, { [`${prefix}.key`]: key }, () => original.apply(this, args), 'client');
+      };
+    }
+  }
+
+  getStats() {
+    return {
+      enabled: this.enabled,
+      exporter: TRACE_EXPORTER,
+      sampleRatio: TRACE_SAMPLE_RATIO,
+      ...exporter.getStats(),
+    };
+  }
+
+  flush(): Promise<void> {
+    return exporter.flush();
+  }
+
+  private runMiddleware(span: Span, res: Response, next: NextFunction, invoke: (next: NextFunction) => unknown) {
+    const parent = activeSpan.getStore();
+    // Middleware that responds instead of calling next() ends with the response
+    const onEnd = () => span.end();
+    res.once('finish', onEnd);
+    res.once('close', onEnd);
+
+    const wrappedNext: NextFunction = ((error?: unknown) => {
+      res.removeListener('finish', onEnd);
+      res.removeListener('close', onEnd);
+      span.end(error && error !== 'route' && error !== 'router' ? error : undefined);
+      if (parent) {
+        activeSpan.run(parent, () => next(error as any));
+      } else {
+        next(error as any);
+      }
+    }) as NextFunction;
+
+    try {
+      return activeSpan.run(span, () => invoke(wrappedNext));
+    } catch (error) {
+      span.end(error);
+      throw error;
+    }
+  }
+}
+
+export const tracer = new Tracer();
@@ -7,6 +7,13 @@ declare global {
       adminSession?: SessionData;
       requestId?: string;
     }
+
+    namespace Multer {
+      interface File {
+        /** SHA-256 of the content, set by the disk-streaming upload storage */
+        sha256?: string;
+      }
+    }
   }
 }
 
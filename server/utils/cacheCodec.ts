@@ -0,0 +1,100 @@
+import { createHash } from "crypto";
+import { promisify } from "util";
+import { brotliCompress, brotliDecompress, constants as zlibConstants } from "zlib";
+
+const brotliCompressAsync = promisify(brotliCompress);
+const brotliDecompressAsync = promisify(brotliDecompress);
+
+// Canonical params longer than this are replaced by a hash
+const MAX_INLINE_KEY_LENGTH = 96;
+// Serialized values larger than this are brotli-compressed before storage
+export const COMPRESSION_THRESHOLD_BYTES = 2 * 1024;
+// Marks a compressed payload (format version 1: brotli + base64)
+const BROTLI_PREFIX = "br1:";
+
+/**
+ * Order object keys so that option objects built in a different order
+ * produce the same key. Values are kept exactly as the query sees them
+ * (no trimming, no dropping of empty strings or array entries): two inputs
+ * share a key only if they filter the same rows. Undefined properties are
+ * omitted, as JSON.stringify would.
+ */
+export function canonicalize(value: unknown): unknown {
+  if (value instanceof Date) {
+    return value.toISOString();
+  }
+
+  if (Array.isArray(value)) {
+    return value.map(canonicalize);
+  }
+
+  if (value !== null && typeof value === "object") {
+    const result: Record<string, unknown> = {};
+    for (const key of Object.keys(value).sort()) {
+      const normalized = canonicalize((value as Record<string, unknown>)[key]);
+      if (normalized !== undefined) {
+        result[key] = normalized;
+      }
+    }
+    return result;
+  }
+
+  return value;
+}
+
+/**
+ * Build a stable cache key from a prefix and optional query params
+ * @example buildCacheKey("list", { school: "ASA", page: 1 }) // list:{"page":1,"school":"ASA"}
+ */
+export function buildCacheKey(prefix: string, params?: Record<string, unknown>): string {
+  const canonical = JSON.stringify(canonicalize(params ?? {}));
+
+  if (canonical === "{}") {
+    return `${prefix}:all`;
+  }
+
+  if (canonical.length > MAX_INLINE_KEY_LENGTH) {
+    const digest = createHash("sha256").update(canonical).digest("base64url").slice(0, 22);
+    return `${prefix}:h:${digest}`;
+  }
+
+  return `${prefix}:${canonical}`;
+}
+
+/**
+ * Serialize a cache value, compressing it when it exceeds the threshold
+ */
+export async function encodeCacheValue(value: unknown): Promise<string> {
+  const json = JSON.stringify(value);
+
+  if (json.length < COMPRESSION_THRESHOLD_BYTES) {
+    return json;
+  }
+
+  const compressed = await brotliCompressAsync(Buffer.from(json), {
+    params: {
+      // Favour speed: level 4 gets most of the ratio on JSON at a fraction of the CPU
+      [zlibConstants.BROTLI_PARAM_QUALITY]: 4,
+      [zlibConstants.BROTLI_PARAM_MODE]: zlibConstants.BROTLI_MODE_TEXT,
+      [zlibConstants.BROTLI_PARAM_SIZE_HINT]: json.length,
+    },
+  });
+
+  const encoded = BROTLI_PREFIX + compressed.toString("base64");
+  // Incompressible payloads are kept as plain JSON
+  return encoded.length < json.length ? encoded : json;
+}
+
+/**
+ * Deserialize a value written by encodeCacheValue (or legacy plain JSON)
+ */
+export async function decodeCacheValue<T = any>(raw: string): Promise<T> {
+  if (raw.startsWith(BROTLI_PREFIX)) {
+    const decompressed = await brotliDecompressAsync(
+      Buffer.from(raw.slice(BROTLI_PREFIX.length), "base64"),
+    );
+    return JSON.parse(decompressed.toString("utf8"));
+  }
+
+  return JSON.parse(raw);
+}
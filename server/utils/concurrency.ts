@@ -0,0 +1,52 @@
+/**
+ * Run an async mapper over items with at most `limit` calls in flight.
+ * Results keep the input order; the first rejection rejects the whole call.
+ */
+export async function mapWithConcurrency<T, R>(
+  items: readonly T[],
+  limit: number,
+  mapper: (item: T, index: number) => Promise<R>,
+): Promise<R[]> {
+  const results = new Array<R>(items.length);
+  let nextIndex = 0;
+
+  const worker = async () => {
+    while (nextIndex < items.length) {
+      const index = nextIndex++;
+      results[index] = await mapper(items[index], index);
+    }
+  };
+
+  const workerCount = Math.max(1, Math.min(limit, items.length));
+  await Promise.all(Array.from({ length: workerCount }, worker));
+  return results;
+}
+
+/**
+ * Create a limiter that runs at most `limit` tasks at once across all callers.
+ * Tasks beyond the limit wait in FIFO order.
+ */
+export function createLimiter(limit: number): <T>(task: () => Promise<T>) => Promise<T> {
+  const maxActive = Math.max(1, limit);
+  const waiting: Array<() => void> = [];
+  let active = 0;
+
+  const release = () => {
+    active--;
+    const next = waiting.shift();
+    if (next) next();
+  };
+
+  return <T>(task: () => Promise<T>) =>
+    new Promise<T>((resolve, reject) => {
+      const start = () => {
+        active++;
+        task().then(resolve, reject).finally(release);
+      };
+      if (active < maxActive) {
+        start();
+      } else {
+        waiting.push(start);
+      }
+    });
+}
@@ -1,12 +1,90 @@
-import { ObjectStorageService } from "../objectStorage";
+import { objectStorageService } from "../objectStorage";
+import { storeUpload, type StoredUpload } from "../services/contentStore";
+import { imagePool } from "../services/imagePool";
+import { storage } from "../storage";
+import { createLimiter } from "./concurrency";
 import { logger } from "../logger";
 import { FILE_UPLOAD } from "../config/constants";
 import type { Express } from "express";
 import type { Request, Response, NextFunction } from "express";
 import fileType from "file-type";
 
+// Shared by every upload route so a burst of multi-photo submissions
+// cannot start unbounded concurrent writes and re-encodes
+const limitUpload = createLimiter(FILE_UPLOAD.UPLOAD_CONCURRENCY);
+
+/**
+ * Sniff the file type from memory or, for disk-streamed uploads, from the file header
+ */
+function detectFileType(file: Express.Multer.File) {
+  return file.buffer
+    ? fileType.fromBuffer(file.buffer)
+    : fileType.fromFile(file.path);
+}
+
+/**
+ * Store a disk-streamed file once an upload slot is free
+ */
+export function storeUploadLimited(file: Express.Multer.File): Promise<StoredUpload> {
+  return limitUpload(() => storeUpload(file));
+}
+
+async function storeOne(file: Express.Multer.File, logPrefix: string): Promise<StoredUpload> {
+  let uploadResult: StoredUpload;
+  try {
+    uploadResult = await storeUploadLimited(file);
+  } catch (error) {
+    uploadResult = {
+      success: false,
+      error: error instanceof Error ? error.message : "Unknown error",
+    };
+  }
+
+  if (uploadResult.success) {
+    logger.info(`${logPrefix} File uploaded to object storage`, {
+      filename: uploadResult.filename,
+      url: uploadResult.url,
+      size: uploadResult.size,
+      deduplicated: uploadResult.deduplicated,
+    });
+  } else {
+    logger.error(`${logPrefix} Failed to upload file to object storage`, {
+      originalName: file.originalname,
+      error: uploadResult.error,
+    });
+  }
+  return uploadResult;
+}
+
 /**
- * Upload files in parallel with validation
+ * Store a request's disk-streamed files in parallel (bounded by
+ * FILE_UPLOAD.UPLOAD_CONCURRENCY across all requests) and queue their image
+ * derivatives. Files that fail are logged and skipped; the URLs of the stored
+ * files are returned in upload order.
+ */
+export async function storeUploads(
+  files: Express.Multer.File[] | undefined,
+  logPrefix = "[UPLOAD]",
+): Promise<string[]> {
+  if (!files || files.length === 0) {
+    return [];
+  }
+
+  const results = await Promise.all(files.map((file) => storeOne(file, logPrefix)));
+  const urls: string[] = [];
+  for (const result of results) {
+    if (!result.success) continue;
+    urls.push(result.url);
+    // Stored by content hash: a re-sent image already has its derivatives
+    if (!result.deduplicated) {
+      imagePool.scheduleDerivatives(result.filePath, result.filename);
+    }
+  }
+  return urls;
+}
+
+/**
+ * Upload files in parallel with validation; fails if any file fails
  */
 export async function uploadFiles(
   files: Express.Multer.File[],
@@ -18,7 +96,7 @@ export async function uploadFiles(
 
   const uploadPromises = files.map(async (file) => {
     // Validate file type with magic number check
-    const type = await fileType.fromBuffer(file.buffer);
+    const type = await detectFileType(file);
     const allowedTypes = FILE_UPLOAD.ALLOWED_TYPES as readonly string[];
     if (!type || !allowedTypes.includes(type.mime)) {
       throw new Error(
@@ -26,12 +104,18 @@ export async function uploadFiles(
       );
     }
 
+    // Disk-streamed uploads go to the content-addressed store
+    if (!file.buffer) {
+      const stored = await storeOne(file, "[UPLOAD]");
+      if (!stored.success) {
+        throw new Error(`Upload failed for ${file.originalname}: ${stored.error}`);
+      }
+      return stored.url;
+    }
+
     const filename = `${prefix}/${Date.now()}-${Math.round(Math.random() * 1e9)}-${file.originalname}`;
-    const storageService = new ObjectStorageService();
-    const uploadResult = await storageService.uploadLargeFile(
-      file.buffer,
-      filename,
-      file.mimetype,
+    const uploadResult = await limitUpload(() =>
+      objectStorageService.uploadLargeFile(file.buffer, filename, file.mimetype),
     );
 
     if (uploadResult.success) {
@@ -53,13 +137,21 @@ export async function uploadFiles(
     }
   });
 
-  try {
-    const results = await Promise.all(uploadPromises);
-    return results.filter((url): url is string => url !== null);
-  } catch (error) {
-    logger.error("[UPLOAD] Batch upload failed", { error });
-    throw error;
+  // Wait for every file: when one fails, the references the others took
+  // are given back instead of being left on blobs nothing points to
+  const results = await Promise.allSettled(uploadPromises);
+  const failure = results.find(
+    (result): result is PromiseRejectedResult => result.status === "rejected",
+  );
+  if (failure) {
+    const stored = results.flatMap((result) =>
+      result.status === "fulfilled" ? [result.value] : [],
+    );
+    await storage.releaseObjectUrls(stored);
+    logger.error("[UPLOAD] Batch upload failed", { error: failure.reason });
+    throw failure.reason;
   }
+  return results.map((result) => (result as PromiseFulfilledResult<string>).value);
 }
 
 /**
@@ -77,7 +169,7 @@ export async function validateImageFiles(
   }
 
   for (const file of files) {
-    const type = await fileType.fromBuffer(file.buffer);
+    const type = await detectFileType(file);
     const allowedTypes = FILE_UPLOAD.ALLOWED_TYPES as readonly string[];
     if (!type || !allowedTypes.includes(type.mime)) {
       res.status(400).json({
@@ -0,0 +1,130 @@
+/**
+ * Log-bucketed histogram for latency and size distributions
+ *
+ * Buckets grow geometrically (4 per doubling by default, ~19% apart), so
+ * percentiles have bounded relative error over many orders of magnitude
+ * with a small, fixed memory footprint.
+ */
+
+export interface HistogramSnapshot {
+  count: number;
+  sum: number;
+  mean: number;
+  min: number;
+  max: number;
+  p50: number;
+  p90: number;
+  p95: number;
+  p99: number;
+}
+
+export class LogHistogram {
+  private readonly min: number;
+  private readonly growth: number;
+  private readonly logGrowth: number;
+  // counts[0] is underflow (< min); last bucket is overflow (>= max)
+  private counts: Uint32Array;
+  private total = 0;
+  private sum = 0;
+  private minSeen = Infinity;
+  private maxSeen = 0;
+
+  constructor(min: number = 0.01, max: number = 10 * 60 * 1000, bucketsPerDoubling: number = 4) {
+    this.min = min;
+    this.growth = Math.pow(2, 1 / bucketsPerDoubling);
+    this.logGrowth = Math.log(this.growth);
+    const buckets = Math.ceil(Math.log(max / min) / this.logGrowth);
+    this.counts = new Uint32Array(buckets + 2);
+  }
+
+  record(value: number): void {
+    if (!Number.isFinite(value) || value < 0) return;
+
+    this.counts[this.bucketIndex(value)]++;
+    this.total++;
+    this.sum += value;
+    if (value < this.minSeen) this.minSeen = value;
+    if (value > this.maxSeen) this.maxSeen = value;
+  }
+
+  get count(): number {
+    return this.total;
+  }
+
+  /**
+   * Approximate value at percentile p (0-100), reported as the bucket's geometric midpoint
+   */
+  percentile(p: number): number {
+    if (this.total === 0) return 0;
+
+    const rank = Math.ceil((p / 100) * this.total);
+    let seen = 0;
+    for (let i = 0; i < this.counts.length; i++) {
+      seen += this.counts[i];
+      if (seen >= rank) {
+        return Math.min(Math.max(this.midpoint(i), this.minSeen), this.maxSeen);
+      }
+    }
+    return this.maxSeen;
+  }
+
+  /**
+   * Number of recorded values at or below `value` (bucket resolution)
+   */
+  countAtOrBelow(value: number): number {
+    const index = this.bucketIndex(value);
+    let seen = 0;
+    for (let i = 0; i <= index && i < this.counts.length; i++) {
+      seen += this.counts[i];
+    }
+    return seen;
+  }
+
+  /**
+   * Fold another histogram with the same layout into this one
+   */
+  merge(other: LogHistogram): void {
+    if (other.counts.length !== this.counts.length) return;
+    for (let i = 0; i < this.counts.length; i++) {
+      this.counts[i] += other.counts[i];
+    }
+    this.total += other.total;
+    this.sum += other.sum;
+    this.minSeen = Math.min(this.minSeen, other.minSeen);
+    this.maxSeen = Math.max(this.maxSeen, other.maxSeen);
+  }
+
+  snapshot(): HistogramSnapshot {
+    const round = (n: number) => Math.round(n * 100) / 100;
+    return {
+      count: this.total,
+      sum: round(this.sum),
+      mean: this.total > 0 ? round(this.sum / this.total) : 0,
+      min: this.total > 0 ? round(this.minSeen) : 0,
+      max: round(this.maxSeen),
+      p50: round(this.percentile(50)),
+      p90: round(this.percentile(90)),
+      p95: round(this.percentile(95)),
+      p99: round(this.percentile(99)),
+    };
+  }
+
+  reset(): void {
+    this.counts.fill(0);
+    this.total = 0;
+    this.sum = 0;
+    this.minSeen = Infinity;
+    this.maxSeen = 0;
+  }
+
+  private bucketIndex(value: number): number {
+    if (value < this.min) return 0;
+    const index = Math.floor(Math.log(value / this.min) / this.logGrowth) + 1;
+    return Math.min(index, this.counts.length - 1);
+  }
+
+  private midpoint(index: number): number {
+    if (index === 0) return this.min;
+    return this.min * Math.pow(this.growth, index - 0.5);
+  }
+}
@@ -0,0 +1,191 @@
+import type { Request } from "express";
+import type { StorageEngine } from "multer";
+import { Transform, type TransformCallback } from "stream";
+import { pipeline } from "stream/promises";
+import { createWriteStream, promises as fs } from "fs";
+import { createHash, randomBytes, type Hash } from "crypto";
+import * as path from "path";
+import fileType from "file-type";
+import { UPLOAD_TEMP_DIR } from "../objectStorage";
+import { tracer } from "../tracing";
+import { createValidationError } from "../performanceErrorHandler";
+
+/**
+ * Disk-streaming multer storage engine
+ *
+ * Uploads are piped to a temp file under uploads/.tmp while the first bytes
+ * are sniffed for the real file type and the content is SHA-256 hashed.
+ * Only the sniff window and the chunk in flight are held in memory; routes
+ * then move the temp file to its content-addressed name (services/contentStore).
+ */
+
+// file-type needs at most this many bytes to identify a format
+const SNIFF_BYTES = 4100;
+
+interface StreamingStorageOptions {
+  // Exact MIME types, or "type/*" for a whole family (e.g. "image/*")
+  allowedTypes: readonly string[];
+}
+
+function isAllowedType(mime: string, allowedTypes: readonly string[]): boolean {
+  return allowedTypes.some((allowed) =>
+    allowed.endsWith("/*") ? mime.startsWith(allowed.slice(0, -1)) : mime === allowed,
+  );
+}
+
+type UploadRequest = Request & { uploadTempFiles?: Set<string> };
+
+/**
+ * Pass-through stream that hashes every chunk and holds back the first
+ * SNIFF_BYTES until the detected type has been checked
+ */
+class SniffingHashStream extends Transform {
+  readonly hash: Hash = createHash("sha256");
+  bytes = 0;
+  detectedMime: string | null = null;
+  private head: Buffer[] = [];
+  private headLength = 0;
+  private sniffed = false;
+  private readonly allowedTypes: readonly string[];
+  private readonly originalName: string;
+
+  constructor(allowedTypes: readonly string[], originalName: string) {
+    super();
+    this.allowedTypes = allowedTypes;
+    this.originalName = originalName;
+  }
+
+  _transform(chunk: Buffer, _encoding: BufferEncoding, callback: TransformCallback): void {
+    this.hash.update(chunk);
+    this.bytes += chunk.length;
+
+    if (this.sniffed) {
+      callback(null, chunk);
+      return;
+    }
+
+    this.head.push(chunk);
+    this.headLength += chunk.length;
+    if (this.headLength < SNIFF_BYTES) {
+      callback();
+      return;
+    }
+    this.releaseHead(callback);
+  }
+
+  _flush(callback: TransformCallback): void {
+    if (this.sniffed) {
+      callback();
+      return;
+    }
+    this.releaseHead(callback);
+  }
+
+  private releaseHead(callback: TransformCallback): void {
+    const head = Buffer.concat(this.head, this.headLength);
+    this.head = [];
+    this.sniffed = true;
+
+    fileType
+      .fromBuffer(head)
+      .then((type) => {
+        if (!type || !isAllowedType(type.mime, this.allowedTypes)) {
+          // 400, not 500: the client sent content we do not accept
+          callback(
+            createValidationError(
+              `Invalid file type: ${this.originalName} (${type?.mime || "unknown"})`,
+            ),
+          );
+          return;
+        }
+        this.detectedMime = type.mime;
+        callback(null, head);
+      })
+      .catch((error) => callback(error));
+  }
+}
+
+class DiskStreamingStorage implements StorageEngine {
+  private readonly options: StreamingStorageOptions;
+
+  constructor(options: StreamingStorageOptions) {
+    this.options = options;
+  }
+
+  _handleFile(
+    req: Request,
+    file: Express.Multer.File,
+    cb: (error?: any, info?: Partial<Express.Multer.File>) => void,
+  ): void {
+    tracer
+      .withSpan("upload.stream", { "upload.field": file.fieldname }, () =>
+        this.streamToTemp(req as UploadRequest, file),
+      )
+      .then((info) => cb(null, info))
+      .catch((error) => cb(error));
+  }
+
+  _removeFile(
+    req: Request,
+    file: Express.Multer.File,
+    cb: (error: Error | null) => void,
+  ): void {
+    (req as UploadRequest).uploadTempFiles?.delete(file.path);
+    fs.unlink(file.path)
+      .catch(() => undefined)
+      .then(() => cb(null));
+  }
+
+  private async streamToTemp(
+    req: UploadRequest,
+    file: Express.Multer.File,
+  ): Promise<Partial<Express.Multer.File>> {
+    await fs.mkdir(UPLOAD_TEMP_DIR, { recursive: true });
+    const tempPath = path.join(
+      UPLOAD_TEMP_DIR,
+      `${Date.now()}-${randomBytes(8).toString("hex")}.part`,
+    );
+    this.trackTempFile(req, tempPath);
+
+    const sniffer = new SniffingHashStream(this.options.allowedTypes, file.originalname);
+    try {
+      await pipeline(file.stream, sniffer, createWriteStream(tempPath));
+    } catch (error) {
+      await fs.unlink(tempPath).catch(() => undefined);
+      req.uploadTempFiles?.delete(tempPath);
+      throw error;
+    }
+
+    return {
+      path: tempPath,
+      size: sniffer.bytes,
+      // Trust the sniffed type over the client-supplied header
+      mimetype: sniffer.detectedMime || file.mimetype,
+      sha256: sniffer.hash.digest("hex"),
+    };
+  }
+
+  /**
+   * Remove temp files the route did not move into place once the response ends
+   */
+  private trackTempFile(req: UploadRequest, tempPath: string): void {
+    if (!req.uploadTempFiles) {
+      const tempFiles = new Set<string>();
+      req.uploadTempFiles = tempFiles;
+      req.res?.once("close", () => {
+        for (const leftover of tempFiles) {
+          fs.unlink(leftover).catch(() => undefined);
+        }
+        tempFiles.clear();
+      });
+    }
+    req.uploadTempFiles.add(tempPath);
+  }
+}
+
+/**
+ * Create a multer storage engine that streams uploads to disk
+ */
+export function diskStreamingStorage(options: StreamingStorageOptions): StorageEngine {
+  return new DiskStreamingStorage(options);
+}
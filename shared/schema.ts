@@ -263,8 +263,26 @@ export const syncQueue = pgTable("sync_queue", {
   retryCount: integer("retry_count").default(0),
   nextRetryAt: timestamp("next_retry_at"),
   errorMessage: text("error_message"),
+  status: text("status").default('pending').notNull(), // 'pending', 'processing', 'failed'
+  lockedAt: timestamp("locked_at"), // Set when a worker claims the item
   createdAt: timestamp("created_at").defaultNow().notNull(),
-});
+}, (table) => ({
+  statusNextRetryIdx: index("sync_queue_status_next_retry_idx").on(table.status, table.nextRetryAt),
+}));
+
+// Content-addressed upload blobs (uploads/cas/..). refCount tracks how many
+// records reference the blob; it is deleted when the count drops to zero.
+export const objectBlobs = pgTable("object_blobs", {
+  sha256: text("sha256").primaryKey(),
+  path: text("path").notNull(), // Storage path relative to uploads/, e.g. cas/ab/<sha256>.jpeg
+  size: integer("size").notNull(),
+  contentType: text("content_type").notNull(),
+  refCount: integer("ref_count").default(0).notNull(),
+  createdAt: timestamp("created_at").defaultNow().notNull(),
+  updatedAt: timestamp("updated_at").defaultNow().notNull(),
+}, (table) => ({
+  refCountIdx: index("object_blobs_ref_count_idx").on(table.refCount),
+}));
 
 export const insertInspectionPhotoSchema = createInsertSchema(inspectionPhotos).omit({
   id: true,
@@ -307,9 +325,12 @@ export const insertSyncQueueSchema = createInsertSchema(syncQueue).omit({
   retryCount: z.number().int().default(0),
   nextRetryAt: z.date().nullable().optional(),
   errorMessage: z.string().max(1000).nullable().optional(),
+  status: z.enum(['pending', 'processing', 'failed']).default('pending'),
+  lockedAt: z.date().nullable().optional(),
 });
 
 export type InsertInspectionPhoto = z.infer<typeof insertInspectionPhotoSchema>;
 export type InspectionPhoto = typeof inspectionPhotos.$inferSelect;
 export type InsertSyncQueue = z.infer<typeof insertSyncQueueSchema>;
-export type SyncQueue = typeof syncQueue.$inferSelect;
\ No newline at end of file
+export type SyncQueue = typeof syncQueue.$inferSelect;
+export type ObjectBlob = typeof objectBlobs.$inferSelect;
\ No newline at end of file